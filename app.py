@@ -5,12 +5,31 @@ Streamlit web UI for the LlamaIndex Multi-PDF RAG pipeline.
 
 Run:
     streamlit run app.py
+
+The heavy objects are process-wide st.cache_resource entries shared by
+every tab and rerun: one embedding model, one LLM client per model, one
+index per corpus fingerprint and chunk settings (in one store folder per
+PDF source and settings, see store_dir), and per query setting just a
+light pipeline (retriever + chat engine) on top of it. A tab only owns its
+chat messages and a ChatSession in pipeline.sessions, so reloading with
+unchanged settings is instant and ten tabs load one model.
 """
 
+import hashlib
+import json
 import os
+import shutil
+import threading
 import time
+import uuid
 import streamlit as st
 
+DOCS_DIR = "docs"             # default folder source; uploads are saved here too
+CORPORA_DIR = "corpora"       # per-source stores, under chroma_db
+MAX_STORES = 8                # corpora stores kept on disk (see prune_stores)
+# (chunk_size, overlap, vector_backend, vector_format) of a default main.py run
+DEFAULT_INDEX_SETTINGS = (1000, 150, "chroma", "float32")
+
 # ── Page config ────────────────────────────────────────────────────────────────
 st.set_page_config(
     page_title="MemoryRAG",
@@ -259,13 +278,212 @@ html, body, [class*="css"] {
 """, unsafe_allow_html=True)
 
 
+# ── Chat bubbles ───────────────────────────────────────────────────────────────
+def user_bubble(content: str) -> str:
+    return f"""
+            <div class="chat-row user">
+                <div class="avatar user-av">👤</div>
+                <div class="bubble user-bubble">{content}</div>
+            </div>"""
+
+
+def bot_bubble(content: str, sources: list[dict] | None = None) -> str:
+    sources_html = ""
+    if sources:
+        pills = "".join(
+            f'<span class="source-pill" title="{s["preview"]}">📄 {s["file"]} · p{s["page"]}</span>'
+            for s in sources
+        )
+        sources_html = f'<div class="sources-wrap">{pills}</div>'
+    return f"""
+            <div class="chat-row">
+                <div class="avatar bot-av">🧠</div>
+                <div class="bubble bot-bubble">
+                    {content}
+                    {sources_html}
+                </div>
+            </div>"""
+
+
+# ── Shared resources (one per process, not per tab) ───────────────────────────
+@st.cache_resource(show_spinner=False)
+def shared_embed_model():
+    """The embedding model behind every pipeline; loads in the background."""
+    from rag.embedder import get_embeddings
+
+    embed_model = get_embeddings(lazy=True)
+    embed_model.warm()
+    return embed_model
+
+
+@st.cache_resource(show_spinner=False)
+def shared_llm(provider: str, model: str, credential: str):
+    """One LLM client per (provider, model); credential keys a changed API key."""
+    from rag.llm import get_llm
+
+    return get_llm(provider=provider, model=model)
+
+
+def store_dir(source: str, folder: str, index_settings: tuple) -> str:
+    """
+    Store folder of one PDF source ("folder" or "upload" + its directory)
+    and index settings.
+
+    Keyed on the source, not on the files in it: added, removed or edited
+    PDFs update the same store incrementally (see stale_sources), while
+    other sources or chunking never rebuild each other's store. The docs/
+    folder with default settings uses chroma_db itself, the store
+    `python main.py` builds, so the CLI and the app share that index.
+    """
+    from rag.vector_store import CHROMA_DIR
+
+    folder = os.path.abspath(folder)
+    if (source, folder, index_settings) == ("folder", os.path.abspath(DOCS_DIR), DEFAULT_INDEX_SETTINGS):
+        return CHROMA_DIR
+    key = json.dumps([source, folder, list(index_settings)])
+    return os.path.join(CHROMA_DIR, CORPORA_DIR, hashlib.sha256(key.encode()).hexdigest()[:16])
+
+
+def prune_stores(keep: str) -> None:
+    """
+    Delete chroma_db/corpora stores beyond the MAX_STORES most recently
+    loaded ones. Stores loaded by this process are kept: their indexes
+    may still be cached and in use by other tabs.
+    """
+    from rag.vector_store import CHROMA_DIR
+
+    root = os.path.join(CHROMA_DIR, CORPORA_DIR)
+    if not os.path.isdir(root):
+        return
+    in_use = store_owners()
+    folders = sorted(
+        (os.path.join(root, name) for name in os.listdir(root)),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for folder in folders[MAX_STORES:]:
+        if folder != keep and folder not in in_use:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+@st.cache_resource(show_spinner=False)
+def store_owners() -> dict:
+    """Store folder → corpus fingerprint it was last brought up to date with."""
+    return {}
+
+
+@st.cache_resource(show_spinner=False)
+def build_lock(persist_dir: str) -> threading.Lock:
+    """Serialises builds of one store folder (two tabs loading at once)."""
+    return threading.Lock()
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def shared_index(persist_dir: str, corpus: tuple, index_settings: tuple) -> tuple:
+    """
+    (index, index_version) for one corpus fingerprint + index settings.
+
+    corpus is ((path, size, mtime_ns), ...): an edited, added or removed
+    PDF changes the key, and the next load brings the same store folder up
+    to date, re-indexing just what changed.
+    """
+    from rag.ingest import index_pdfs
+    from rag.vector_store import index_version
+
+    chunk_size, overlap, vector_backend, vector_format = index_settings
+    with build_lock(persist_dir):
+        index = index_pdfs(
+            [path for path, _, _ in corpus],
+            shared_embed_model(),
+            persist_dir,
+            chunking={"chunk_size": chunk_size, "overlap": overlap},
+            vector_backend=vector_backend,
+            vector_format=vector_format,
+        )
+        return index, index_version(persist_dir)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def shared_bm25(persist_dir: str, corpus: tuple, index_settings: tuple):
+    """BM25 index of one store, shared by every hybrid pipeline on it."""
+    from rag.vector_store import open_bm25
+
+    index, _ = shared_index(persist_dir, corpus, index_settings)
+    return open_bm25(index, persist_dir)
+
+
+@st.cache_resource(show_spinner=False)
+def shared_reranker():
+    """One cross-encoder; pipelines with another Top-K share it via with_top_n."""
+    from rag.rerank import CrossEncoderReranker
+
+    return CrossEncoderReranker()
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def shared_pipeline(persist_dir: str, corpus: tuple, index_settings: tuple, query_settings: tuple,
+                    provider: str, model: str, credential: str):
+    """
+    Pipeline for one corpus + settings, shared by all tabs.
+
+    Only the cheap query-side objects (retriever, postprocessors, chat
+    engine) are built here; the index, BM25 index and models come from the
+    caches above, so changing Top-K or retrieval mode never re-indexes.
+    """
+    from rag import RAGPipeline
+    from rag.compress import ContextCompressor
+
+    top_k, retrieval_mode, rerank, compress, context_budget = query_settings
+    index, version = shared_index(persist_dir, corpus, index_settings)
+    return RAGPipeline.from_index(
+        index,
+        shared_llm(provider, model, credential),
+        top_k=top_k,
+        retrieval_mode=retrieval_mode,
+        persist_dir=persist_dir,
+        reranker=shared_reranker().with_top_n(top_k) if rerank else None,
+        compressor=ContextCompressor(token_budget=context_budget) if compress else None,
+        bm25=shared_bm25(persist_dir, corpus, index_settings) if retrieval_mode == "hybrid" else None,
+        index_version=version,
+    )
+
+
+def corpus_fingerprint(pdf_input: str | list[str]) -> tuple:
+    """((path, size, mtime_ns), ...) for every PDF — stat() only, no hashing."""
+    from rag.loader import resolve_pdf_paths
+
+    fingerprint = []
+    for path in resolve_pdf_paths(pdf_input):
+        stat = os.stat(path)
+        fingerprint.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+def current_pipeline():
+    """This tab's pipeline (a cache hit on every rerun), or None before Load."""
+    key = st.session_state.pipeline_key
+    if key is None:
+        return None
+    persist_dir, corpus = key[0], key[1]
+    if store_owners().get(persist_dir) != corpus:
+        # Another tab re-indexed these PDFs after they were edited
+        st.session_state.pipeline_key = None
+        st.sidebar.warning("The PDFs changed and were re-indexed — click Load to continue.")
+        return None
+    return shared_pipeline(*key)
+
+
 # ── Session state init ─────────────────────────────────────────────────────────
-if "pipeline" not in st.session_state:
-    st.session_state.pipeline = None
+if "pipeline_key" not in st.session_state:
+    st.session_state.pipeline_key = None
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "pipeline_info" not in st.session_state:
     st.session_state.pipeline_info = {}
+if "last_timings" not in st.session_state:
+    st.session_state.last_timings = {}
 
 
 # ── Sidebar ────────────────────────────────────────────────────────────────────
@@ -331,6 +549,33 @@ with st.sidebar:
     # ── Advanced ──
     with st.expander("⚙️ Advanced"):
         top_k = st.slider("Top-K chunks", 1, 10, 5)
+        retrieval_mode = st.selectbox(
+            "Retrieval",
+            ["vector", "hybrid"],
+            help="hybrid adds BM25 keyword search — better for part numbers, clause IDs and codes",
+        )
+        rerank = st.checkbox(
+            "Cross-encoder rerank",
+            help="retrieve 20 candidates and keep the Top-K most relevant (smaller prompts)",
+        )
+        compress = st.checkbox(
+            "Compress context",
+            help="drop repeated overlaps and keep only query-relevant sentences",
+        )
+        context_budget = st.slider("Context budget (tokens)", 500, 4000, 1500, step=250,
+                                   disabled=not compress)
+        vector_backend = st.selectbox(
+            "Vector store",
+            ["chroma", "native"],
+            help="native = in-process memory-mapped store with an HNSW index (fast cold start)",
+        )
+        vector_format = st.selectbox(
+            "Vector storage",
+            ["float32", "float16", "pq"],
+            disabled=vector_backend != "native",
+            help="float16 halves vector memory; pq keeps 48-byte codes in RAM and re-scores "
+                 "the best candidates exactly (rebuilds the index when changed)",
+        )
         chunk_size = st.slider("Chunk size", 256, 2048, 1000, step=128)
         overlap = st.slider("Overlap", 0, 300, 150, step=50)
 
@@ -344,51 +589,70 @@ with st.sidebar:
 
         # Handle uploads
         if pdf_source == "Upload PDFs" and uploaded_files:
-            os.makedirs("docs", exist_ok=True)
+            os.makedirs(DOCS_DIR, exist_ok=True)
+            source, folder = "upload", DOCS_DIR
             for f in uploaded_files:
-                save_path = os.path.join("docs", f.name)
-                with open(save_path, "wb") as out:
-                    out.write(f.read())
+                save_path = os.path.join(DOCS_DIR, f.name)
+                data = f.getvalue()
+                # Rewriting an unchanged file would bump its mtime and miss the cache
+                unchanged = False
+                if os.path.exists(save_path) and os.path.getsize(save_path) == len(data):
+                    with open(save_path, "rb") as existing:
+                        unchanged = existing.read() == data
+                if not unchanged:
+                    with open(save_path, "wb") as out:
+                        out.write(data)
                 pdf_paths.append(save_path)
         elif pdf_source == "Folder (docs/)":
             pdf_paths = pdf_folder
+            source, folder = "folder", pdf_folder
         else:
             st.error("Please select or upload PDF files.")
             st.stop()
 
         with st.spinner("Initialising pipeline..."):
             try:
-                from rag import RAGPipeline
-                import shutil, gc
-
-                # Windows fix: release Chroma file handles before deleting
-                if st.session_state.pipeline is not None:
-                    try:
-                        st.session_state.pipeline = None
-                        gc.collect()
-                    except Exception:
-                        pass
-
-                # Now safe to delete chroma_db on Windows
-                if os.path.exists("chroma_db"):
-                    try:
-                        shutil.rmtree("chroma_db")
-                    except PermissionError:
-                        pass  # If still locked, reuse existing store
-
-                st.session_state.pipeline = RAGPipeline(
-                    pdf_path=pdf_paths,
-                    top_k=top_k,
-                    chunk_size=chunk_size,
-                    overlap=overlap,
-                    provider=provider,
-                    model=model,
+                credential = ""
+                if provider == "openai":
+                    key = os.environ.get("OPENAI_API_KEY", "")
+                    credential = hashlib.sha256(key.encode()).hexdigest()[:16]
+                index_settings = (
+                    chunk_size,
+                    overlap,
+                    vector_backend,
+                    vector_format if vector_backend == "native" else "float32",
+                )
+                query_settings = (top_k, retrieval_mode, rerank, compress, context_budget)
+                corpus = corpus_fingerprint(pdf_paths)
+                persist_dir = store_dir(source, folder, index_settings)
+                pipeline_key = (
+                    persist_dir,
+                    corpus,
+                    index_settings,
+                    query_settings,
+                    provider,
+                    model,
+                    credential,
                 )
+
+                # Stores are kept: the index manifest tells the pipeline
+                # which PDFs are new or changed, so only those are re-parsed
+                shared_pipeline(*pipeline_key)
+                # Tabs still on an older fingerprint of these PDFs now read
+                # an updated store; current_pipeline() sends them to Load
+                store_owners()[persist_dir] = corpus
+                os.utime(persist_dir)     # last loaded, for prune_stores
+                prune_stores(keep=persist_dir)
+                st.session_state.pipeline_key = pipeline_key
+                # Fresh conversation; the old session idles out of its manager
+                st.session_state.session_id = uuid.uuid4().hex
                 st.session_state.messages = []
+                st.session_state.last_timings = {}
                 st.session_state.pipeline_info = {
                     "provider": provider,
                     "model": model,
                     "top_k": top_k,
+                    "retrieval": retrieval_mode + (" + rerank" if rerank else ""),
                     "source": pdf_source,
                 }
                 st.success("✓ Pipeline ready!")
@@ -402,8 +666,10 @@ with st.sidebar:
     col1, col2 = st.columns(2)
     with col1:
         if st.button("🗑 Clear", use_container_width=True):
-            if st.session_state.pipeline:
-                st.session_state.pipeline.clear_memory()
+            pipeline = current_pipeline()
+            if pipeline:
+                # Only this tab's memory; other tabs keep their conversations
+                pipeline.sessions.drop(st.session_state.session_id)
                 st.session_state.messages = []
                 st.rerun()
     with col2:
@@ -429,16 +695,25 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+pipeline = current_pipeline()
+
 # Status bar
-if st.session_state.pipeline:
+if pipeline:
+    from rag.tracing import format_timings
+
     info = st.session_state.pipeline_info
+    latency = ""
+    if st.session_state.last_timings:
+        latency = f"<span>LAST TURN: {format_timings(st.session_state.last_timings)}</span>"
     st.markdown(f"""
     <div class="status-bar">
         <span><span class="status-dot dot-green"></span>PIPELINE READY</span>
         <span>MODEL: {info.get('model','–')}</span>
         <span>PROVIDER: {info.get('provider','–').upper()}</span>
         <span>TOP-K: {info.get('top_k','–')}</span>
+        <span>RETRIEVAL: {info.get('retrieval','–').upper()}</span>
         <span>SOURCE: {info.get('source','–')}</span>
+        {latency}
     </div>
     """, unsafe_allow_html=True)
 else:
@@ -450,7 +725,7 @@ else:
 
 
 # ── Chat area ─────────────────────────────────────────────────────────────────
-if not st.session_state.pipeline:
+if not pipeline:
     st.markdown("""
     <div class="welcome-card">
         <h2>Get Started</h2>
@@ -467,27 +742,9 @@ else:
     chat_html = '<div class="chat-container" id="chat-bottom">'
     for msg in st.session_state.messages:
         if msg["role"] == "user":
-            chat_html += f"""
-            <div class="chat-row user">
-                <div class="avatar user-av">👤</div>
-                <div class="bubble user-bubble">{msg['content']}</div>
-            </div>"""
+            chat_html += user_bubble(msg["content"])
         else:
-            sources_html = ""
-            if msg.get("sources"):
-                pills = "".join(
-                    f'<span class="source-pill" title="{s["preview"]}">📄 {s["file"]} · p{s["page"]}</span>'
-                    for s in msg["sources"]
-                )
-                sources_html = f'<div class="sources-wrap">{pills}</div>'
-            chat_html += f"""
-            <div class="chat-row">
-                <div class="avatar bot-av">🧠</div>
-                <div class="bubble bot-bubble">
-                    {msg['content']}
-                    {sources_html}
-                </div>
-            </div>"""
+            chat_html += bot_bubble(msg["content"], msg.get("sources"))
     chat_html += '</div>'
     st.markdown(chat_html, unsafe_allow_html=True)
 
@@ -510,20 +767,31 @@ else:
         # Add user message
         st.session_state.messages.append({"role": "user", "content": question})
 
-        # Get answer
-        with st.spinner("Thinking..."):
-            try:
-                result = st.session_state.pipeline.ask(question)
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": result["answer"],
-                    "sources": result["sources"],
-                })
-            except Exception as e:
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": f"⚠️ Error: {e}",
-                    "sources": [],
-                })
+        # Stream the answer into a live bubble below the chat
+        live = st.empty()
+        answer, sources = "", []
+        try:
+            session = pipeline.sessions.get(st.session_state.session_id)
+            for event in session.ask_stream(question):
+                if event["type"] == "sources":
+                    sources = event["sources"]
+                elif event["type"] == "token":
+                    answer += event["text"]
+                else:
+                    st.session_state.last_timings = event.get("timings", {})
+                    continue
+                live.markdown(user_bubble(question) + bot_bubble(answer + " ▌", sources),
+                              unsafe_allow_html=True)
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": answer,
+                "sources": sources,
+            })
+        except Exception as e:
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": f"⚠️ Error: {e}",
+                "sources": [],
+            })
 
         st.rerun()
\ No newline at end of file
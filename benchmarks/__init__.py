@@ -0,0 +1,12 @@
+"""
+benchmarks/
+-----------
+Offline performance benchmarks for the RAG pipeline.
+
+Every benchmark runs on CPU without network access: the LLM and (where the
+real model is not the thing being measured) the embedding model are
+replaced by deterministic stubs from benchmarks/stubs.py.
+
+Run one with:
+    python -m benchmarks.bench_async
+"""
@@ -0,0 +1,92 @@
+"""
+bench_async.py
+--------------
+Throughput of RAGPipeline.aask vs. ask with 1, 8 and 32 concurrent sessions
+sharing one index, against the local StubLLM.
+
+Each session is a separate conversation (a ChatSession from the pipeline's
+SessionManager, so all of them share one index and LLM client) asking
+`--turns` questions in a row. The sync baseline runs the same
+conversations one after another, which is what a blocking server does.
+
+Usage:
+    python -m benchmarks.bench_async
+    python -m benchmarks.bench_async --sessions 1 8 32 --turns 3 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from llama_index.core import VectorStoreIndex
+
+from benchmarks.stubs import StubEmbedding, StubLLM, synthetic_nodes
+from rag.pipeline import RAGPipeline
+from rag.sessions import ChatSession
+
+QUESTIONS = [
+    "What does the contract say about payment and delivery?",
+    "Tell me more about the first point",
+    "Which report mentions latency and memory?",
+    "Summarise the security audit findings",
+]
+
+
+def run_sync(pipeline: RAGPipeline, sessions: int, turns: int) -> float:
+    chats = [pipeline.sessions.get(f"sync-{sessions}-{i}") for i in range(sessions)]
+    start = time.perf_counter()
+    for chat in chats:
+        for question in QUESTIONS[:turns]:
+            chat.ask(question)
+    return time.perf_counter() - start
+
+
+async def run_async(pipeline: RAGPipeline, sessions: int, turns: int) -> float:
+    chats = [pipeline.sessions.get(f"async-{sessions}-{i}") for i in range(sessions)]
+
+    async def converse(chat: ChatSession) -> None:
+        for question in QUESTIONS[:turns]:
+            await chat.aask(question)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(converse(c) for c in chats))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Async vs sync RAGPipeline throughput")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--nodes", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM time-to-first-token (s)")
+    parser.add_argument("--skip-sync", action="store_true", help="only run the async variant")
+    args = parser.parse_args()
+
+    index = VectorStoreIndex(synthetic_nodes(args.nodes), embed_model=StubEmbedding())
+    # No answer cache: every session asks the same questions
+    pipeline = RAGPipeline.from_index(index, StubLLM(latency=args.latency), answer_cache=False)
+
+    results = []
+    for sessions in args.sessions:
+        answers = sessions * args.turns
+        row = {"sessions": sessions, "answers": answers}
+        if not args.skip_sync:
+            elapsed = run_sync(pipeline, sessions, args.turns)
+            row["sync_s"] = round(elapsed, 3)
+            row["sync_answers_per_s"] = round(answers / elapsed, 2)
+        elapsed = asyncio.run(run_async(pipeline, sessions, args.turns))
+        row["async_s"] = round(elapsed, 3)
+        row["async_answers_per_s"] = round(answers / elapsed, 2)
+        results.append(row)
+
+    print()
+    print(f"{'sessions':>8}  {'sync ans/s':>10}  {'async ans/s':>11}")
+    for row in results:
+        print(f"{row['sessions']:>8}  {row.get('sync_answers_per_s', '-'):>10}  "
+              f"{row['async_answers_per_s']:>11}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+bench_e2e.py
+------------
+End-to-end regression benchmark: synthetic PDFs in, answers out.
+
+A corpus of real PDF files is generated (stubs.synthetic_corpus), then
+every stage is timed through the public functions the app uses:
+
+    load_pdfs            parse the PDFs
+    split_documents      chunk the pages
+    embed                StubEmbedding over every chunk (--real-embed: the
+                         actual HuggingFace model, needs it downloaded)
+    build cold           build_vector_store into an empty store
+    build warm           build_vector_store again — nothing changed, so
+                         this is the restart path (manifest check only)
+    ask                  RAGPipeline.ask p50/p95 against the StubLLM, one
+                         fresh session per question, answer cache off
+
+Everything runs offline on CPU. Results are printed and written as JSON
+(--out); --compare against an earlier file prints the change per metric
+and exits with status 1 if any time got worse by more than --tolerance.
+
+Usage:
+    python -m benchmarks.bench_e2e --out results.json
+    python -m benchmarks.bench_e2e --files 50 --pages 20 --questions 100
+    python -m benchmarks.bench_e2e --out new.json --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.stubs import WORDS, StubEmbedding, StubLLM, synthetic_corpus
+from rag.loader import load_pdfs
+from rag.pipeline import RAGPipeline
+from rag.splitter import split_documents
+from rag.vector_store import build_vector_store
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[int(q * (len(sorted_values) - 1))]
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def run(args) -> dict:
+    metrics: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "docs")
+        paths = synthetic_corpus(corpus, args.files, args.pages, args.words, seed=args.seed)
+        metrics["corpus_mib"] = round(sum(os.path.getsize(p) for p in paths) / 2**20, 2)
+
+        docs, seconds = timed(load_pdfs, corpus, num_workers=args.workers)
+        metrics["load_pdfs_s"] = round(seconds, 3)
+
+        nodes, seconds = timed(split_documents, docs, args.chunk_size, args.overlap)
+        metrics["split_s"] = round(seconds, 3)
+        metrics["chunks"] = len(nodes)
+
+        if args.real_embed:
+            from rag.embedder import load_embedding_model
+
+            embed_model = load_embedding_model()
+        else:
+            embed_model = StubEmbedding()
+        texts = [node.get_content() for node in nodes]
+        _, seconds = timed(embed_model.get_text_embedding_batch, texts)
+        metrics["embed_s"] = round(seconds, 3)
+        metrics["embed_chunks_per_s"] = round(len(texts) / seconds, 1) if seconds else 0.0
+
+        store = os.path.join(tmp, "store")
+        chunking = {"chunk_size": args.chunk_size, "overlap": args.overlap}
+        build_args = (nodes, embed_model, store, paths, chunking, args.vector_backend)
+        _, seconds = timed(build_vector_store, *build_args)
+        metrics["build_cold_s"] = round(seconds, 3)
+        index, seconds = timed(build_vector_store, *build_args)
+        metrics["build_warm_s"] = round(seconds, 3)
+
+        llm = StubLLM(latency=args.latency, token_latency=args.token_latency)
+        pipeline = RAGPipeline.from_index(
+            index, llm, top_k=args.top_k, answer_cache=False, persist_dir=store
+        )
+        rng = random.Random(args.seed + 1)
+        latencies, stages = [], {}
+        for i in range(args.questions):
+            question = "What does the report say about " + " and ".join(rng.sample(WORDS, 2)) + "?"
+            result, seconds = timed(pipeline.sessions.get(f"bench-{i}").ask, question)
+            latencies.append(seconds * 1000)
+            for key, ms in result.get("timings", {}).items():
+                stages.setdefault(key, []).append(ms)
+            pipeline.sessions.drop(f"bench-{i}")
+        latencies.sort()
+        metrics["ask_p50_ms"] = round(statistics.median(latencies), 2)
+        metrics["ask_p95_ms"] = round(percentile(latencies, 0.95), 2)
+        for key, values in stages.items():
+            if key != "total_ms":
+                metrics[f"ask_{key[:-3]}_p50_ms"] = round(statistics.median(values), 2)
+    return metrics
+
+
+def compare(old: dict, new: dict, tolerance: float) -> list[str]:
+    """Print old vs new per metric; return the time metrics that regressed."""
+    regressions = []
+    print(f"\n{'metric':>24}  {'before':>10}  {'after':>10}  {'change':>8}")
+    for key, after in new["metrics"].items():
+        before = old["metrics"].get(key)
+        if before is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        # Only durations are judged; counts and throughput are context
+        worse = key.endswith(("_s", "_ms")) and change > tolerance
+        flag = "  ← slower" if worse else ""
+        print(f"{key:>24}  {before:>10}  {after:>10}  {change:>+8.1%}{flag}")
+        if worse:
+            regressions.append(key)
+    if old.get("config") != new.get("config"):
+        print("\nNote: the two runs used different settings — compare with care.")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end ingestion + query benchmark")
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20, help="pages per PDF")
+    parser.add_argument("--words", type=int, default=400, help="words per page")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=150)
+    parser.add_argument("--workers", type=int, default=1, help="PDF parsing processes")
+    parser.add_argument("--vector-backend", default="chroma", choices=["chroma", "native"])
+    parser.add_argument("--real-embed", action="store_true",
+                        help="use the real embedding model instead of the stub")
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub LLM time to first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="stub LLM seconds per token")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, metavar="JSON", help="write results here")
+    parser.add_argument("--compare", default=None, metavar="JSON",
+                        help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "compare", "tolerance")}
+    results = {
+        "config": config,
+        "env": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "metrics": run(args),
+    }
+
+    print()
+    for key, value in results["metrics"].items():
+        print(f"{key:>24}  {value}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to '{args.out}'")
+    else:
+        print(json.dumps(results))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) over {args.tolerance:.0%}: "
+                  f"{', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\n✓ No regressions over {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+bench_embed.py
+--------------
+Embedding throughput (chunks/s) of the PyTorch and ONNX Runtime backends,
+with a parity check of the ONNX vectors against PyTorch.
+
+Unlike the other benchmarks this one loads the real embedding model
+(BAAI/bge-small-en-v1.5), since the model *is* what is being measured.
+The embedding cache is bypassed. Chunks are synthetic, ~1000 characters
+like the default splitter output.
+
+Usage:
+    python -m benchmarks.bench_embed
+    python -m benchmarks.bench_embed --chunks 512 --batch-size 32 --threads 1 4 8
+"""
+
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+from benchmarks.stubs import synthetic_text
+from rag.embedder import DEFAULT_MODEL
+from rag.onnx_embedding import OnnxEmbedding, parity_check
+
+
+def throughput(embed_model, texts: list[str]) -> float:
+    embed_model.get_text_embedding_batch(texts[:embed_model.embed_batch_size])  # warm-up
+    start = time.perf_counter()
+    embed_model.get_text_embedding_batch(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PyTorch vs ONNX embedding throughput")
+    parser.add_argument("--chunks", type=int, default=256)
+    parser.add_argument("--words", type=int, default=170, help="words per chunk (~1000 chars)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, nargs="+", default=[None],
+                        help="onnxruntime intra-op thread counts to try")
+    parser.add_argument("--skip-fp32", action="store_true", help="only benchmark the int8 model")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [synthetic_text(rng, args.words) for _ in range(args.chunks)]
+
+    results = []
+    torch_model = HuggingFaceEmbedding(
+        model_name=DEFAULT_MODEL, device="cpu", embed_batch_size=args.batch_size
+    )
+    results.append({"backend": "torch", "threads": None,
+                    "chunks_per_s": round(throughput(torch_model, texts), 1)})
+    reference = np.asarray(torch_model.get_text_embedding_batch(texts[:32]))
+
+    variants = [True] if args.skip_fp32 else [False, True]
+    for quantize in variants:
+        for threads in args.threads:
+            model = OnnxEmbedding(
+                DEFAULT_MODEL,
+                quantize=quantize,
+                num_threads=threads,
+                embed_batch_size=args.batch_size,
+            )
+            vectors = np.asarray(model.get_text_embedding_batch(texts[:32]))
+            cosines = np.sum(reference * vectors, axis=1)   # both L2-normalised
+            results.append({
+                "backend": f"onnx-{'int8' if quantize else 'fp32'}",
+                "threads": threads,
+                "chunks_per_s": round(throughput(model, texts), 1),
+                "mean_cosine": round(float(cosines.mean()), 5),
+                "min_cosine": round(float(cosines.min()), 5),
+            })
+
+    # Same check export_onnx() prints, on real sentences instead of filler
+    sample_parity = parity_check(OnnxEmbedding(DEFAULT_MODEL), DEFAULT_MODEL)
+
+    print()
+    print(f"{'backend':>10}  {'threads':>7}  {'chunks/s':>9}  {'min cos':>8}")
+    for row in results:
+        print(f"{row['backend']:>10}  {str(row['threads'] or 'all'):>7}  "
+              f"{row['chunks_per_s']:>9}  {row.get('min_cosine', '-'):>8}")
+    print(f"\nint8 parity on sample sentences: mean {sample_parity['mean_cosine']:.4f}, "
+          f"min {sample_parity['min_cosine']:.4f}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+bench_embed_pool.py
+-------------------
+Scaling of the multi-process embedding pool: chunks/s with 1, 2, 4, … N
+worker processes, each pinned to cores / N threads (or --threads).
+
+Loads the real embedding model in every worker (like bench_embed); the
+embedding cache is bypassed. The 1-worker row runs in-process, as
+get_embeddings(num_procs=1) does.
+
+Usage:
+    python -m benchmarks.bench_embed_pool
+    python -m benchmarks.bench_embed_pool --workers 1 2 4 8 --chunks 1024 --backend onnx
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from benchmarks.stubs import synthetic_text
+from rag.embed_pool import PooledEmbedding
+from rag.embedder import DEFAULT_MODEL, load_embedding_model
+
+
+def main() -> None:
+    cores = os.cpu_count() or 1
+    default_workers = [n for n in (1, 2, 4, 8, 16) if n <= cores]
+    parser = argparse.ArgumentParser(description="Embedding pool scaling")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--threads", type=int, default=None,
+                        help="threads per worker (default: cores / workers)")
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--words", type=int, default=170, help="words per chunk (~1000 chars)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx"])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [synthetic_text(rng, args.words) for _ in range(args.chunks)]
+
+    results = []
+    for workers in args.workers:
+        threads = args.threads or max(1, cores // workers)
+        if workers == 1:
+            model = load_embedding_model(DEFAULT_MODEL, args.backend, args.batch_size, threads)
+            if args.backend == "torch":
+                import torch
+
+                torch.set_num_threads(threads)
+        else:
+            model = PooledEmbedding(
+                DEFAULT_MODEL,
+                backend=args.backend,
+                num_workers=workers,
+                threads_per_worker=threads,
+                embed_batch_size=args.batch_size,
+            )
+        model.get_text_embedding_batch(texts[:args.batch_size * workers])  # warm-up
+        start = time.perf_counter()
+        model._get_text_embeddings(texts)
+        elapsed = time.perf_counter() - start
+        if isinstance(model, PooledEmbedding):
+            model.close()
+        results.append({
+            "workers": workers,
+            "threads_per_worker": threads,
+            "chunks_per_s": round(len(texts) / elapsed, 1),
+        })
+
+    base = results[0]["chunks_per_s"]
+    print()
+    print(f"{'workers':>7}  {'threads':>7}  {'chunks/s':>9}  {'speed-up':>8}")
+    for row in results:
+        row["speedup"] = round(row["chunks_per_s"] / base, 2)
+        print(f"{row['workers']:>7}  {row['threads_per_worker']:>7}  "
+              f"{row['chunks_per_s']:>9}  {row['speedup']:>7}x")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+bench_import.py
+---------------
+Start-up cost: wall time to import each entry point and which heavy
+packages it drags in.
+
+Every measurement runs in a fresh interpreter (imports are cached per
+process), best of --repeat runs:
+
+    import rag              package surface only (lazy __getattr__)
+    import rag.tracing      what app.py needs for its first render
+    import rag.pipeline     llama_index + chromadb, but no torch
+    main.py --help          argparse only
+    RAGPipeline imported    `from rag import RAGPipeline`
+    lazy embeddings         get_embeddings(lazy=True), i.e. --embed-backend
+                            torch / onnx before the first cache miss: must
+                            load neither torch nor onnxruntime
+
+Usage:
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --repeat 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HEAVY = ("torch", "sentence_transformers", "transformers", "onnxruntime", "chromadb",
+         "llama_index", "numpy")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "import rag": "import rag",
+    "import rag.tracing": "import rag.tracing",
+    "import rag.pipeline": "import rag.pipeline",
+    "from rag import RAGPipeline": "from rag import RAGPipeline",
+    "main.py --help": None,
+    "lazy embeddings (torch)": "from rag.embedder import get_embeddings; get_embeddings(lazy=True)",
+    "lazy embeddings (onnx)": "from rag.embedder import get_embeddings; "
+                              "get_embeddings(backend='onnx', lazy=True)",
+}
+PROBE = "import sys, json; print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+
+
+def measure(code: str | None) -> tuple[float, list[str]]:
+    """Seconds to run the case in a new interpreter, and the heavy modules it loaded."""
+    if code is None:
+        cmd = [sys.executable, os.path.join(ROOT, "main.py"), "--help"]
+        probe = [sys.executable, "-c",
+                 "import runpy, sys; sys.argv = ['main.py', '--help']\n"
+                 "try: runpy.run_path('main.py', run_name='__main__')\n"
+                 "except SystemExit: pass\n" + PROBE.format(heavy=HEAVY)]
+    else:
+        cmd = [sys.executable, "-c", code]
+        probe = [sys.executable, "-c", code + "\n" + PROBE.format(heavy=HEAVY)]
+
+    t0 = time.perf_counter()
+    subprocess.run(cmd, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    seconds = time.perf_counter() - t0
+    out = subprocess.run(probe, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return seconds, json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import time of the package entry points")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    baseline = min(measure("pass")[0] for _ in range(args.repeat))
+    results = []
+    for name, code in CASES.items():
+        runs = [measure(code) for _ in range(args.repeat)]
+        seconds = min(r[0] for r in runs) - baseline
+        results.append({"case": name, "ms": round(seconds * 1000, 1), "loaded": runs[0][1]})
+
+    print(f"\n(interpreter start-up of {baseline * 1000:.0f} ms subtracted)")
+    print(f"{'case':>28}  {'ms':>8}  heavy modules loaded")
+    for row in results:
+        print(f"{row['case']:>28}  {row['ms']:>8}  {', '.join(row['loaded']) or '—'}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+bench_retrieval.py
+------------------
+Latency and recall@k of vector-only vs hybrid (vector + BM25, RRF) retrieval.
+
+Every synthetic chunk carries a unique part number ("PN-48213-K"). Two
+query sets are run against an in-memory Chroma collection:
+
+    identifier — "What is the status of part PN-48213-K?"  (exact lookups)
+    passage    — a sentence copied from the chunk            (topical lookups)
+
+A query is a hit when its source chunk is in the top k. Dense vectors of
+random part numbers are nearly identical, so identifier recall is where
+BM25 earns its keep; passage recall checks that fusion does not hurt.
+
+Usage:
+    python -m benchmarks.bench_retrieval
+    python -m benchmarks.bench_retrieval --nodes 5000 --queries 200 --top-k 5
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+import chromadb
+from llama_index.core import VectorStoreIndex
+from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core.schema import MetadataMode
+from llama_index.vector_stores.chroma import ChromaVectorStore
+
+from benchmarks.stubs import StubEmbedding, synthetic_nodes
+from rag.bm25 import BM25Index
+from rag.hybrid import HybridRetriever
+from rag.vector_store import backend_of
+
+
+def part_number(rng: random.Random) -> str:
+    return f"PN-{rng.randint(10000, 99999)}-{rng.choice('ABCDEFGHJK')}"
+
+
+def build(num_nodes: int, seed: int):
+    rng = random.Random(seed)
+    nodes = synthetic_nodes(num_nodes, seed=seed)
+    parts = []
+    for node in nodes:
+        part = part_number(rng)
+        parts.append(part)
+        node.set_content(f"Part {part}. " + node.get_content())
+
+    embed_model = StubEmbedding()
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    for node, embedding in zip(nodes, embed_model.get_text_embedding_batch(texts)):
+        node.embedding = embedding
+
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"bench_{seed}")
+    vector_store = ChromaVectorStore(chroma_collection=collection)
+    vector_store.add(nodes)
+    bm25 = BM25Index()
+    bm25.add([n.node_id for n in nodes], [n.get_content() for n in nodes])
+    index = VectorStoreIndex.from_vector_store(vector_store, embed_model=embed_model)
+    return nodes, parts, index, bm25
+
+
+def queries(nodes, parts, count: int, seed: int) -> dict[str, list[tuple[str, str]]]:
+    rng = random.Random(seed + 1)
+    picked = rng.sample(range(len(nodes)), min(count, len(nodes)))
+    passage = []
+    for i in picked:
+        sentences = [s for s in nodes[i].get_content().split(". ") if len(s.split()) >= 8]
+        passage.append((rng.choice(sentences or [nodes[i].get_content()]), nodes[i].node_id))
+    return {
+        "identifier": [(f"What is the status of part {parts[i]}?", nodes[i].node_id) for i in picked],
+        "passage": passage,
+    }
+
+
+def measure(retriever, query_set: list[tuple[str, str]]) -> dict:
+    latencies, hits = [], 0
+    for query, expected in query_set:
+        t0 = time.perf_counter()
+        results = retriever.retrieve(query)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        hits += any(r.node.node_id == expected for r in results)
+    latencies.sort()
+    return {
+        "recall": round(hits / len(query_set), 3),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vector vs hybrid retrieval latency/recall")
+    parser.add_argument("--nodes", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    nodes, parts, index, bm25 = build(args.nodes, args.seed)
+    query_sets = queries(nodes, parts, args.queries, args.seed)
+    retrievers = {
+        "vector": VectorIndexRetriever(index=index, similarity_top_k=args.top_k),
+        "hybrid": HybridRetriever(index, bm25, backend_of(index), top_k=args.top_k),
+    }
+
+    results = []
+    for mode, retriever in retrievers.items():
+        for name, query_set in query_sets.items():
+            row = {"mode": mode, "queries": name, "top_k": args.top_k}
+            row.update(measure(retriever, query_set))
+            results.append(row)
+
+    print()
+    print(f"{'mode':>7}  {'queries':>10}  {f'recall@{args.top_k}':>9}  {'p50 ms':>7}  {'p95 ms':>7}")
+    for row in results:
+        print(f"{row['mode']:>7}  {row['queries']:>10}  {row['recall']:>9}  "
+              f"{row['p50_ms']:>7}  {row['p95_ms']:>7}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+bench_vector_store.py
+---------------------
+Chroma vs the native store: cold open time, query latency, footprint and
+recall@k against exact float32 search.
+
+Synthetic chunks are embedded with the stub embedding and written to each
+store through the same backend interface IndexWriter uses, then every
+store is re-opened from disk (cold start) and queried with raw vectors, so
+the numbers cover the store alone — no embedding, no LLM.
+
+    chroma            float32 in a persistent Chroma collection
+    native            float32, brute-force BLAS
+    native-hnsw       float32, HNSW graph (skipped without hnswlib)
+    native-float16    float16 scan
+    native-pq         PQ codes + exact re-score of --rescore-k candidates
+
+Usage:
+    python -m benchmarks.bench_vector_store
+    python -m benchmarks.bench_vector_store --nodes 100000 --queries 500 --top-k 5
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from llama_index.core.schema import MetadataMode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from benchmarks.stubs import StubEmbedding, synthetic_nodes
+from rag.native_store import NativeVectorStore
+from rag.vector_store import ChromaBackend
+
+BATCH = 1000
+NATIVE = {                           # store → (vector_format, flat_limit)
+    "native": ("float32", 10 ** 12),
+    "native-hnsw": ("float32", 0),
+    "native-float16": ("float16", 10 ** 12),
+    "native-pq": ("pq", 10 ** 12),
+}
+
+
+def dir_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def open_store(kind: str, path: str, rescore_k: int):
+    if kind == "chroma":
+        # Drop Chroma's per-path client cache so re-opening is a real cold start
+        cache = getattr(chromadb.api.client.SharedSystemClient, "clear_system_cache", None)
+        if cache is not None:
+            cache()
+        return ChromaBackend.open(path)
+    vector_format, flat_limit = NATIVE[kind]
+    return NativeVectorStore(path, vector_format, rescore_k=rescore_k, flat_limit=flat_limit)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Chroma vs native vector store")
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rescore-k", type=int, default=100,
+                        help="PQ candidates re-scored exactly")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    nodes = synthetic_nodes(args.nodes, words_per_node=60, seed=args.seed)
+    embed_model = StubEmbedding()
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    for node, embedding in zip(nodes, embed_model.get_text_embedding_batch(texts)):
+        node.embedding = embedding
+
+    rng = random.Random(args.seed + 1)
+    queries = []
+    for node in rng.sample(nodes, min(args.queries, len(nodes))):
+        sentences = [s for s in node.get_content().split(". ") if len(s.split()) >= 8]
+        queries.append(embed_model.get_query_embedding(rng.choice(sentences or [node.get_content()])))
+
+    # Ground truth: exact float32 top k
+    matrix = np.asarray([node.embedding for node in nodes], dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    truth = [set(np.argsort(-(matrix @ np.asarray(q, dtype=np.float32)))[:args.top_k]) for q in queries]
+    position = {node.node_id: i for i, node in enumerate(nodes)}
+
+    kinds = ["chroma", *NATIVE]
+    if importlib.util.find_spec("hnswlib") is None:
+        print("hnswlib not installed — skipping native-hnsw")
+        kinds.remove("native-hnsw")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in kinds:
+            path = os.path.join(tmp, kind)
+            store = open_store(kind, path, args.rescore_k)
+            t0 = time.perf_counter()
+            for start in range(0, len(nodes), BATCH):
+                store.vector_store.add(nodes[start:start + BATCH])
+                store.commit()
+            store.commit(complete=True)
+            build_s = time.perf_counter() - t0
+            del store
+
+            t0 = time.perf_counter()
+            store = open_store(kind, path, args.rescore_k)
+            open_ms = (time.perf_counter() - t0) * 1000
+
+            found, latencies = 0, []
+            for q, expected in zip(queries, truth):
+                t0 = time.perf_counter()
+                result = store.vector_store.query(
+                    VectorStoreQuery(query_embedding=q, similarity_top_k=args.top_k)
+                )
+                latencies.append((time.perf_counter() - t0) * 1000)
+                found += len({position[i] for i in result.ids} & expected)
+            latencies.sort()
+
+            row = {
+                "store": kind,
+                "build_s": round(build_s, 2),
+                "open_ms": round(open_ms, 2),
+                "p50_ms": round(statistics.median(latencies), 3),
+                "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+                "recall": round(found / (len(queries) * args.top_k), 3),
+                "disk_mib": round(dir_size(path) / 2**20, 2),
+            }
+            if isinstance(store, NativeVectorStore):
+                row["ram_mib"] = round(store.footprint()["resident_bytes"] / 2**20, 2)
+            else:
+                row["ram_mib"] = round(matrix.nbytes / 2**20, 2)   # float32 vectors, HNSW not counted
+            results.append(row)
+
+    print()
+    print(f"{'store':>15}  {'build s':>7}  {'open ms':>8}  {'p50 ms':>7}  {'p95 ms':>7}  "
+          f"{f'recall@{args.top_k}':>9}  {'RAM MiB':>8}  {'disk MiB':>8}")
+    for row in results:
+        print(f"{row['store']:>15}  {row['build_s']:>7}  {row['open_ms']:>8}  {row['p50_ms']:>7}  "
+              f"{row['p95_ms']:>7}  {row['recall']:>9}  {row['ram_mib']:>8}  {row['disk_mib']:>8}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
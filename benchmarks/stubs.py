@@ -0,0 +1,268 @@
+"""
+stubs.py
+--------
+Deterministic stand-ins for the LLM and embedding model, plus a synthetic
+corpus, so benchmarks measure the pipeline and not Ollama or PyTorch.
+
+    StubLLM        — fixed time-to-first-token + per-token delay, real
+                     asyncio sleeps in the async methods
+    StubEmbedding  — hashed bag-of-words vectors (similar texts → similar
+                     vectors, so retrieval still behaves sensibly)
+    synthetic_corpus — real PDF files (written by a tiny built-in PDF
+                     writer, no extra dependency) for end-to-end runs
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import random
+import re
+import textwrap
+import time
+from typing import Any
+
+from llama_index.core.base.llms.generic_utils import (
+    astream_completion_response_to_chat_response,
+    completion_response_to_chat_response,
+    stream_completion_response_to_chat_response,
+)
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.llms import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    CustomLLM,
+    LLMMetadata,
+)
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.schema import TextNode
+
+WORDS = (
+    "invoice contract clause warranty payment delivery schedule python model "
+    "training dataset latency memory index vector retrieval report revenue "
+    "quarter growth customer support policy security audit compliance budget "
+    "engineer project milestone release testing deployment network storage"
+).split()
+
+
+class StubLLM(CustomLLM):
+    """
+    Fake LLM with Ollama-like timing: `latency` seconds before the first
+    token, then `token_latency` seconds per token. The answer is derived
+    from a hash of the prompt, so it is deterministic.
+    """
+
+    latency: float = Field(default=0.2, description="Seconds to first token.")
+    token_latency: float = Field(default=0.01, description="Seconds per token.")
+    num_tokens: int = Field(default=32, description="Tokens per answer.")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "StubLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="stub-llm", context_window=8192, num_output=256)
+
+    def _tokens(self, prompt: str) -> list[str]:
+        rng = random.Random(hashlib.md5(prompt.encode("utf-8")).hexdigest())
+        return [rng.choice(WORDS) + " " for _ in range(self.num_tokens)]
+
+    # ── Sync ─────────────────────────────────────────────────────────
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        tokens = self._tokens(prompt)
+        time.sleep(self.latency + self.token_latency * len(tokens))
+        return CompletionResponse(text="".join(tokens))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        tokens = self._tokens(prompt)
+
+        def gen() -> CompletionResponseGen:
+            time.sleep(self.latency)
+            text = ""
+            for token in tokens:
+                time.sleep(self.token_latency)
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+
+        return gen()
+
+    @llm_chat_callback()
+    def chat(self, messages: list[ChatMessage], **kwargs: Any) -> ChatResponse:
+        prompt = self.messages_to_prompt(messages)
+        return completion_response_to_chat_response(self.complete(prompt, formatted=True))
+
+    @llm_chat_callback()
+    def stream_chat(self, messages: list[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        prompt = self.messages_to_prompt(messages)
+        return stream_completion_response_to_chat_response(
+            self.stream_complete(prompt, formatted=True)
+        )
+
+    # ── Async (real awaits, so concurrent sessions overlap) ─────────
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        tokens = self._tokens(prompt)
+        await asyncio.sleep(self.latency + self.token_latency * len(tokens))
+        return CompletionResponse(text="".join(tokens))
+
+    @llm_completion_callback()
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        tokens = self._tokens(prompt)
+
+        async def gen() -> CompletionResponseAsyncGen:
+            await asyncio.sleep(self.latency)
+            text = ""
+            for token in tokens:
+                await asyncio.sleep(self.token_latency)
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+
+        return gen()
+
+    @llm_chat_callback()
+    async def achat(self, messages: list[ChatMessage], **kwargs: Any) -> ChatResponse:
+        prompt = self.messages_to_prompt(messages)
+        return completion_response_to_chat_response(await self.acomplete(prompt, formatted=True))
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: list[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        prompt = self.messages_to_prompt(messages)
+        return astream_completion_response_to_chat_response(
+            await self.astream_complete(prompt, formatted=True)
+        )
+
+
+class StubEmbedding(BaseEmbedding):
+    """Hashed bag-of-words embedding: each word bumps one of `embed_dim` buckets."""
+
+    embed_dim: int = Field(default=384, description="Vector size.")
+
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault("model_name", "stub-embedding")
+        super().__init__(**kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "StubEmbedding"
+
+    def _vector(self, text: str) -> list[float]:
+        vec = [0.0] * self.embed_dim
+        for word in re.findall(r"\w+", text.lower()):
+            bucket = int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16)
+            vec[bucket % self.embed_dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return self._vector(query)
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._vector(text)
+
+
+def synthetic_text(rng: random.Random, num_words: int) -> str:
+    """Sentence-shaped filler text drawn from WORDS."""
+    sentences = []
+    while num_words > 0:
+        n = min(num_words, rng.randint(8, 20))
+        words = [rng.choice(WORDS) for _ in range(n)]
+        sentences.append(" ".join(words).capitalize() + ".")
+        num_words -= n
+    return " ".join(sentences)
+
+
+def synthetic_nodes(num_nodes: int, words_per_node: int = 150, seed: int = 0) -> list[TextNode]:
+    """Chunks with the same metadata shape as split_documents() output."""
+    rng = random.Random(seed)
+    return [
+        TextNode(
+            text=synthetic_text(rng, words_per_node),
+            metadata={"file_name": f"doc{i // 20:03d}.pdf", "page_label": str(i % 20 + 1)},
+        )
+        for i in range(num_nodes)
+    ]
+
+
+# ── Synthetic PDFs ────────────────────────────────────────────────────────────
+
+PDF_LINE_CHARS = 95    # Helvetica 10pt fits ~95 characters on an A4 line
+PDF_PAGE_LINES = 60
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: list[str]) -> None:
+    """
+    Write a minimal PDF 1.4 file: one Helvetica text page per string.
+
+    Lines are wrapped at PDF_LINE_CHARS and cut at PDF_PAGE_LINES, so keep
+    each page under ~5000 characters.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,   # page tree, filled in once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for text in pages:
+        lines = textwrap.wrap(text, PDF_LINE_CHARS)[:PDF_PAGE_LINES]
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 790 Td"]
+        ops += [f"({_pdf_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def synthetic_corpus(
+    folder: str,
+    num_files: int = 10,
+    pages_per_file: int = 20,
+    words_per_page: int = 400,
+    seed: int = 0,
+) -> list[str]:
+    """Write num_files synthetic PDFs into folder; returns their paths."""
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(num_files):
+        path = os.path.join(folder, f"doc{i:04d}.pdf")
+        write_pdf(path, [synthetic_text(rng, words_per_page) for _ in range(pages_per_file)])
+        paths.append(path)
+    return paths
@@ -7,10 +7,30 @@ Usage:
     python main.py --pdf docs/
     python main.py --pdf docs/resume.pdf docs/report.pdf
     python main.py --pdf docs/ --provider openai --model gpt-4o-mini
+    python main.py --pdf docs/ --workers 0      ← parse PDFs on all cores
+    python main.py --pdf docs/ --embed-backend onnx --embed-threads 4
+    python main.py --pdf docs/ --embed-procs 4 --embed-threads 2
+    python main.py --pdf docs/ --condense-model qwen2.5:0.5b
+    python main.py --pdf docs/ --retrieval hybrid   ← vector + BM25 keyword search
+    python main.py --pdf docs/ --rerank             ← cross-encoder picks the top-k of 20
+    python main.py --pdf docs/ --compress           ← trim context to ~1500 tokens per turn
+    python main.py --pdf docs/ --vector-backend native   ← in-process mmap + HNSW store
+    python main.py --pdf docs/ --vectors pq         ← PQ-coded vectors, exact re-score
+    python main.py --pdf docs/ --batch questions.jsonl --concurrency 8
+    python main.py --pdf docs/ --trace traces.jsonl  ← per-stage spans as JSON lines
+    python main.py --help                           ← instant: nothing heavy is imported
 """
 
+from __future__ import annotations
+
 import argparse
-from rag import RAGPipeline
+import os
+from typing import TYPE_CHECKING
+
+from rag.tracing import format_timings
+
+if TYPE_CHECKING:   # the pipeline (llama_index, chromadb) is imported after parse_args
+    from rag import RAGPipeline
 
 DEMO_QUESTIONS = [
     "What documents have been loaded and what are they about?",
@@ -19,16 +39,51 @@ DEMO_QUESTIONS = [
 ]
 
 
-def print_result(result: dict) -> None:
-    sources = result["sources"]
+def print_sources(sources: list[dict]) -> None:
     print(f"\nRetrieved {len(sources)} chunks:")
     for i, s in enumerate(sources):
         print(f"  {i + 1}. [{s['file']} | Page {s['page']}] {s['preview']}...")
-    print(f"\nAnswer:\n{result['answer']}")
+
+
+def turn_label(result: dict) -> str:
+    calls = result["llm_calls"]
+    label = f"{calls} LLM call{'' if calls == 1 else 's'}"
+    if result.get("tokens_saved"):
+        label += f" · {result['tokens_saved']} context tokens saved"
+    if result.get("timings"):
+        label += f" · {format_timings(result['timings'])}"
+    return label
+
+
+def print_result(result: dict) -> None:
+    print_sources(result["sources"])
+    cached = "  (cached)" if result.get("cached") else ""
+    print(f"\nAnswer:{cached}\n{result['answer']}")
+    print(f"\n[{turn_label(result)}]")
     print("=" * 70)
 
 
-def run_demo(pipeline: RAGPipeline) -> None:
+def stream_result(pipeline: RAGPipeline, question: str) -> None:
+    """Print sources as soon as retrieval is done, then tokens as they arrive."""
+    for event in pipeline.ask_stream(question):
+        if event["type"] == "sources":
+            print_sources(event["sources"])
+            print("\nAnswer:")
+        elif event["type"] == "token":
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "done":
+            print(f"\n\n[{turn_label(event)}]", end="")
+    print("\n" + "=" * 70)
+
+
+def answer(pipeline: RAGPipeline, question: str, stream: bool) -> None:
+    if stream:
+        stream_result(pipeline, question)
+    else:
+        print_result(pipeline.ask(question))
+
+
+def run_demo(pipeline: RAGPipeline, stream: bool = True) -> None:
     print("\n" + "=" * 70)
     print("DEMO MODE — watch how memory works across questions")
     print("=" * 70)
@@ -36,14 +91,13 @@ def run_demo(pipeline: RAGPipeline) -> None:
         print(f"\n{'=' * 70}")
         print(f"Question: {question}")
         print("=" * 70)
-        result = pipeline.ask(question)
-        print_result(result)
+        answer(pipeline, question, stream)
         input("\nPress Enter for next question...")
 
 
-def run_interactive(pipeline: RAGPipeline) -> None:
+def run_interactive(pipeline: RAGPipeline, stream: bool = True) -> None:
     print("\n" + "=" * 70)
-    print("INTERACTIVE MODE — type 'exit' to quit, 'clear' to reset memory")
+    print("INTERACTIVE MODE — type 'exit' to quit, 'clear' to reset memory, 'stats' for cache hits")
     print("=" * 70 + "\n")
 
     while True:
@@ -62,6 +116,13 @@ def run_interactive(pipeline: RAGPipeline) -> None:
             pipeline.clear_memory()
             print("✓ Memory cleared\n")
             continue
+        if question.lower() == "stats":
+            for name, stats in pipeline.cache_stats().items():
+                avg = f", avg {stats['avg_ms']:.0f} ms" if "avg_ms" in stats else ""
+                print(f"{name} cache: {stats['hits']} hits / {stats['misses']} misses  "
+                      f"(hit rate {stats['hit_rate']:.0%}, {stats['entries']} entries{avg})")
+            print()
+            continue
         if question.lower() == "history":
             history = pipeline.get_history()
             if not history:
@@ -74,33 +135,116 @@ def run_interactive(pipeline: RAGPipeline) -> None:
 
         try:
             print(f"\n{'=' * 70}\nQuestion: {question}\n{'=' * 70}")
-            result = pipeline.ask(question)
-            print_result(result)
+            answer(pipeline, question, stream)
         except Exception as e:
             print(f"Error: {e}\n")
 
 
+def run_batch(pipeline: RAGPipeline, path: str, out_path: str | None, concurrency: int) -> None:
+    from rag.batch import load_questions
+
+    questions = load_questions(path)
+    out_path = out_path or os.path.splitext(path)[0] + ".answers.jsonl"
+    print("\n" + "=" * 70)
+    print(f"BATCH MODE — {len(questions)} questions, {concurrency} at a time → {out_path}")
+    print("=" * 70)
+    summary = pipeline.ask_batch(questions, out_path, concurrency)
+    print(f"\n✓ {summary['questions']} answered in {summary['wall_s']}s  "
+          f"({summary['questions_per_s']} q/s, {summary['distinct']} distinct, "
+          f"{summary['cached']} cached, {summary['errors']} errors)")
+    print(f"  latency p50 {summary['p50_ms']} ms · p95 {summary['p95_ms']} ms")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="LlamaIndex Multi-PDF RAG")
     parser.add_argument("--pdf", nargs="+", default=["docs/"], metavar="PATH")
     parser.add_argument("--provider", default="ollama", choices=["ollama", "openai"])
     parser.add_argument("--model", default="mistral")
     parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--retrieval", default="vector", choices=["vector", "hybrid"],
+                        help="hybrid = vector + BM25 keyword search (finds exact IDs and codes)")
+    parser.add_argument("--rerank", action="store_true",
+                        help="over-fetch candidates and keep the top-k by cross-encoder score")
+    parser.add_argument("--rerank-candidates", type=int, default=20,
+                        help="candidates retrieved before reranking")
+    parser.add_argument("--compress", action="store_true",
+                        help="dedupe chunks and keep only query-relevant sentences in the prompt")
+    parser.add_argument("--context-budget", type=int, default=1500, metavar="TOKENS",
+                        help="max context tokens per turn with --compress")
+    parser.add_argument("--vector-backend", default=None, choices=["chroma", "native"],
+                        help="native = in-process mmap'd NumPy + HNSW store (default: chroma, "
+                             "or native for --vectors float16/pq)")
+    parser.add_argument("--vectors", default="float32", choices=["float32", "float16", "pq"],
+                        help="float16 halves vector memory, pq stores 48-byte codes (native store)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for parallel PDF parsing (0 = all cores)")
+    parser.add_argument("--embed-backend", default="torch", choices=["torch", "onnx"],
+                        help="onnx = int8-quantized ONNX Runtime (needs onnxruntime + onnx)")
+    parser.add_argument("--embed-batch-size", type=int, default=32)
+    parser.add_argument("--embed-threads", type=int, default=None,
+                        help="onnx intra-op threads, or threads per process with --embed-procs")
+    parser.add_argument("--embed-procs", type=int, default=1,
+                        help="embedding worker processes, one model copy each")
     parser.add_argument("--no-demo", action="store_true")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="wait for the full answer instead of streaming tokens")
+    parser.add_argument("--no-answer-cache", action="store_true",
+                        help="always run retrieval + generation, even for repeated questions")
+    parser.add_argument("--condense-model", default=None, metavar="MODEL",
+                        help="smaller model for rewriting follow-up questions (e.g. qwen2.5:0.5b)")
+    parser.add_argument("--always-condense", action="store_true",
+                        help="rewrite every follow-up, even self-contained ones")
+    parser.add_argument("--trace", default=None, metavar="JSONL",
+                        help="append per-stage timing spans (load … generate) to a JSONL file")
+    parser.add_argument("--batch", default=None, metavar="JSONL",
+                        help="answer every question in a JSONL file (no memory) and exit")
+    parser.add_argument("--batch-out", default=None, metavar="JSONL",
+                        help="where --batch writes answers (default: <input>.answers.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="questions retrieved / generated at once with --batch")
+    parser.add_argument("--eager-embed", action="store_true",
+                        help="load the embedding model up front instead of on first use")
+    parser.add_argument("--no-prewarm", action="store_true",
+                        help="don't load the embedding model / Ollama model in the background during indexing")
     args = parser.parse_args()
 
+    from rag import RAGPipeline
+
     pdf_input = args.pdf[0] if len(args.pdf) == 1 else args.pdf
 
     pipeline = RAGPipeline(
         pdf_path=pdf_input,
         top_k=args.top_k,
+        retrieval_mode=args.retrieval,
+        vector_backend=args.vector_backend,
+        vector_format=args.vectors,
+        rerank=args.rerank,
+        rerank_candidates=args.rerank_candidates,
+        compress_context=args.compress,
+        context_budget=args.context_budget,
         provider=args.provider,
         model=args.model,
+        num_workers=args.workers,
+        embed_backend=args.embed_backend,
+        embed_batch_size=args.embed_batch_size,
+        embed_threads=args.embed_threads,
+        embed_procs=args.embed_procs,
+        answer_cache=not args.no_answer_cache,
+        adaptive_condense=not args.always_condense,
+        condense_model=args.condense_model,
+        trace_path=args.trace,
+        lazy_embed=not args.eager_embed,
+        prewarm=not args.no_prewarm,
     )
 
+    if args.batch:
+        run_batch(pipeline, args.batch, args.batch_out, args.concurrency)
+        return
+
+    stream = not args.no_stream
     if not args.no_demo:
-        run_demo(pipeline)
-    run_interactive(pipeline)
+        run_demo(pipeline, stream)
+    run_interactive(pipeline, stream)
 
 
 if __name__ == "__main__":
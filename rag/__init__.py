@@ -5,8 +5,31 @@ LlamaIndex RAG package.
 
 Public surface:
     from rag import RAGPipeline
+    from rag import ChatSession, SessionManager
+
+The names are imported on first access (PEP 562 module __getattr__), so
+`import rag` — or importing a light submodule such as rag.tracing — does
+not pull in llama_index, chromadb or PyTorch.
 """
 
-from rag.pipeline import RAGPipeline
+import importlib
+
+_EXPORTS = {
+    "RAGPipeline": "rag.pipeline",
+    "ChatSession": "rag.sessions",
+    "SessionManager": "rag.sessions",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module 'rag' has no attribute '{name}'")
+
 
-__all__ = ["RAGPipeline"]
\ No newline at end of file
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,140 @@
+"""
+answer_cache.py
+---------------
+Semantic answer cache for repeated and near-duplicate questions.
+
+Entries are keyed by the embedding of the *condensed* standalone question
+(so "tell me more about it" after different histories maps to different
+entries) plus the index version. A lookup returns the stored answer when
+the cosine similarity to a cached question is at least `threshold`.
+
+    - TTL:        entries older than ttl seconds are ignored and dropped
+    - Size bound: least recently used entries are evicted past max_entries
+    - Index changes: a lookup/store with a new index version clears the
+      cache, so answers never outlive the documents they came from
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_TTL = 24 * 3600.0
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class AnswerCache:
+    """
+    In-process cache of {answer, sources} results, searched by embedding
+    similarity. Thread-safe; one instance is shared by all sessions of a
+    pipeline.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        ttl: float | None = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._version: str | None = None
+        self._entries: OrderedDict[int, dict] = OrderedDict()
+        self._next_id = 0
+        self._matrix: np.ndarray | None = None   # rows follow self._ids
+        self._ids: list[int] = []
+        self._lock = threading.Lock()
+
+    def lookup(self, embedding: list[float], index_version: str) -> dict | None:
+        """
+        Return the cached result for the most similar question, or None.
+
+        Returns:
+            {"answer": str, "sources": [...], "question": str} on a hit.
+        """
+        query = _unit(embedding)
+        with self._lock:
+            self._check_version(index_version)
+            self._drop_expired()
+            best_id, best_score = None, -1.0
+            if self._ids:
+                if self._matrix is None:
+                    self._matrix = np.stack([self._entries[i]["vector"] for i in self._ids])
+                scores = self._matrix @ query
+                best = int(np.argmax(scores))
+                best_id, best_score = self._ids[best], float(scores[best])
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return dict(self._entries[best_id]["result"])
+
+    def store(self, embedding: list[float], index_version: str, question: str, result: dict) -> None:
+        """Cache the {answer, sources} result for a condensed question."""
+        with self._lock:
+            self._check_version(index_version)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "vector": _unit(embedding),
+                "created": time.monotonic(),
+                "result": {
+                    "answer": result["answer"],
+                    "sources": result["sources"],
+                    "question": question,
+                },
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._reindex()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._reindex()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+    # ── Internals (lock held) ────────────────────────────────────────
+
+    def _check_version(self, index_version: str) -> None:
+        if index_version != self._version:
+            self._entries.clear()
+            self._reindex()
+            self._version = index_version
+
+    def _drop_expired(self) -> None:
+        if self.ttl is None:
+            return
+        cutoff = time.monotonic() - self.ttl
+        expired = [i for i, e in self._entries.items() if e["created"] < cutoff]
+        for i in expired:
+            del self._entries[i]
+        if expired:
+            self._reindex()
+
+    def _reindex(self) -> None:
+        self._ids = list(self._entries)
+        self._matrix = None
+
+
+def _unit(embedding: list[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
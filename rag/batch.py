@@ -0,0 +1,243 @@
+"""
+batch.py
+--------
+Bulk question answering: thousands of independent questions, one pipeline.
+
+Batch questions have no conversation, so there is nothing to condense and
+no memory to keep. Instead of one ChatSession turn per question, a batch
+runs in three stages over the shared index, retriever and LLM:
+
+    1. embed     every question through the batched query path
+                 (batching.embed_queries — cached, length-bucketed)
+    2. retrieve  per distinct question, with the precomputed vector, then
+                 rerank / compress like a chat turn
+    3. generate  one LLM call per distinct question, at most `concurrency`
+                 questions in flight
+
+Repeated questions are answered once, and the answer cache serves anything
+already answered interactively (and is filled for later). Results are
+appended to the output JSONL as each question finishes, one line each:
+
+    {"id": "q1", "question": "...", "answer": "...", "sources": [...],
+     "cached": false, "tokens_saved": 0,
+     "timings": {"embed_ms": .., "queue_ms": .., "retrieve_ms": ..,
+                 "generate_ms": .., "total_ms": ..}}
+
+embed_ms is the batch embedding time divided over the distinct questions;
+queue_ms is time spent waiting for a concurrency slot (not in total_ms).
+
+A failed question gets an "error" field instead of an answer; the rest of
+the batch carries on.
+
+    questions = load_questions("questions.jsonl")
+    summary = run_batch(pipeline, questions, "answers.jsonl", concurrency=8)
+"""
+
+import asyncio
+import json
+import statistics
+import time
+
+from llama_index.core.chat_engine.condense_plus_context import DEFAULT_CONTEXT_PROMPT_TEMPLATE
+from llama_index.core.llms import ChatMessage, MessageRole
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+from rag import tracing
+from rag.batching import embed_queries, estimate_tokens
+from rag.compress import take_compression_stats
+from rag.sessions import format_sources
+
+DEFAULT_CONCURRENCY = 8
+EMBED_CHUNK = 512   # questions embedded per call, so progress shows on huge batches
+
+
+def load_questions(path: str) -> list[dict]:
+    """
+    Read questions from a JSONL file.
+
+    Each line is either {"id": ..., "question": "..."} or a bare JSON
+    string. Lines without an id are numbered by position; blank lines are
+    skipped.
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            if not isinstance(item, dict) or not str(item.get("question", "")).strip():
+                raise ValueError(f"{path}:{line_no}: expected a string or an object with 'question'")
+            questions.append({
+                "id": item.get("id", len(questions)),
+                "question": str(item["question"]).strip(),
+            })
+    return questions
+
+
+def _context_messages(question: str, nodes: list[NodeWithScore]) -> list[ChatMessage]:
+    """The prompt a first chat turn would send: context system prompt + question."""
+    context_str = "\n\n".join(
+        n.node.get_content(metadata_mode=MetadataMode.LLM).strip() for n in nodes
+    )
+    return [
+        ChatMessage(
+            role=MessageRole.SYSTEM,
+            content=DEFAULT_CONTEXT_PROMPT_TEMPLATE.format(context_str=context_str),
+        ),
+        ChatMessage(role=MessageRole.USER, content=question),
+    ]
+
+
+def _timings(embed_ms: float, queue_s: float, retrieve_s: float, generate_s: float) -> dict:
+    """Per-question stage timings in ms; total_ms is the work done, without queueing."""
+    timings = {
+        "embed_ms": embed_ms,
+        "queue_ms": queue_s * 1000,
+        "retrieve_ms": retrieve_s * 1000,
+        "generate_ms": generate_s * 1000,
+    }
+    timings["total_ms"] = embed_ms + timings["retrieve_ms"] + timings["generate_ms"]
+    return {k: round(v, 2) for k, v in timings.items()}
+
+
+class BatchRunner:
+    """
+    Answers a list of independent questions against a RAGPipeline.
+
+    Args:
+        pipeline:    A ready RAGPipeline (or one built with from_index).
+        concurrency: Max questions retrieving/generating at once.
+    """
+
+    def __init__(self, pipeline, concurrency: int = DEFAULT_CONCURRENCY):
+        self.pipeline = pipeline
+        self.concurrency = max(1, concurrency)
+        self.postprocessors = [p for p in (pipeline.reranker, pipeline.compressor) if p]
+
+    def _embed(self, questions: list[str]) -> tuple[list[list[float]], float]:
+        """All query vectors plus the amortised embed time per question (ms)."""
+        t0 = time.perf_counter()
+        vectors = []
+        for start in range(0, len(questions), EMBED_CHUNK):
+            chunk = questions[start:start + EMBED_CHUNK]
+            with tracing.span("embed", kind="query", questions=len(chunk)):
+                vectors += embed_queries(self.pipeline.embed_model, chunk)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        return vectors, elapsed_ms / max(1, len(questions))
+
+    def _retrieve(self, question: str, embedding: list[float]) -> tuple[list[NodeWithScore], int]:
+        """Retrieve + postprocess in one worker thread; returns (nodes, tokens saved)."""
+        take_compression_stats()
+        bundle = QueryBundle(query_str=question, embedding=embedding)
+        nodes = self.pipeline.retriever.retrieve(bundle)
+        for postprocessor in self.postprocessors:
+            nodes = postprocessor.postprocess_nodes(nodes, bundle)
+        stats = take_compression_stats()
+        return nodes, stats["tokens_saved"] if stats else 0
+
+    async def _answer(
+        self, question: str, embedding: list[float], embed_ms: float, limit: asyncio.Semaphore
+    ) -> dict:
+        cache = self.pipeline.answer_cache
+        version = self.pipeline.index_version
+        queued = time.perf_counter()
+        async with limit:
+            t0 = time.perf_counter()
+            hit = cache.lookup(embedding, version) if cache is not None else None
+            if hit is not None:
+                return {
+                    "answer": hit["answer"],
+                    "sources": hit["sources"],
+                    "cached": True,
+                    "tokens_saved": 0,
+                    "timings": _timings(embed_ms, t0 - queued, 0.0, 0.0),
+                }
+
+            with tracing.trace("batch"):
+                nodes, tokens_saved = await asyncio.to_thread(self._retrieve, question, embedding)
+                t1 = time.perf_counter()
+                with tracing.span("generate") as span:
+                    response = await self.pipeline.llm.achat(_context_messages(question, nodes))
+                    span["tokens_out"] = estimate_tokens(str(response.message.content or ""))
+                t2 = time.perf_counter()
+
+        result = {
+            "answer": str(response.message.content or ""),
+            "sources": format_sources(nodes),
+            "cached": False,
+            "tokens_saved": tokens_saved,
+            "timings": _timings(embed_ms, t0 - queued, t1 - t0, t2 - t1),
+        }
+        if cache is not None and result["answer"]:
+            cache.store(embedding, version, question, {**result, "llm_calls": 1})
+        return result
+
+    async def arun(self, questions: list[dict], out_path: str) -> dict:
+        """
+        Answer every question and write one JSONL line per question.
+
+        Returns:
+            {"questions", "distinct", "errors", "cached", "wall_s",
+             "questions_per_s", "p50_ms", "p95_ms"}
+        """
+        start = time.perf_counter()
+        distinct = list(dict.fromkeys(q["question"] for q in questions))
+        print(f"Embedding {len(distinct)} distinct question(s)...")
+        vectors, embed_ms = await asyncio.to_thread(self._embed, distinct)
+
+        # One task per distinct question; duplicates share its result
+        limit = asyncio.Semaphore(self.concurrency)
+        tasks = {
+            text: asyncio.ensure_future(self._answer(text, vector, embed_ms, limit))
+            for text, vector in zip(distinct, vectors)
+        }
+
+        async def finish(item: dict) -> dict:
+            row = {"id": item["id"], "question": item["question"]}
+            try:
+                row.update(await tasks[item["question"]])
+            except Exception as e:
+                row["error"] = f"{type(e).__name__}: {e}"
+            return row
+
+        totals, errors, cached = [], 0, 0
+        with open(out_path, "w", encoding="utf-8") as out:
+            for done, future in enumerate(
+                asyncio.as_completed([finish(item) for item in questions]), 1
+            ):
+                row = await future
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                out.flush()
+                if "error" in row:
+                    errors += 1
+                else:
+                    totals.append(row["timings"]["total_ms"])
+                cached += bool(row.get("cached"))
+                if done % 50 == 0 or done == len(questions):
+                    print(f"  {done}/{len(questions)} answered  ({errors} errors)")
+
+        wall_s = time.perf_counter() - start
+        totals.sort()
+        return {
+            "questions": len(questions),
+            "distinct": len(distinct),
+            "errors": errors,
+            "cached": cached,
+            "wall_s": round(wall_s, 2),
+            "questions_per_s": round(len(questions) / wall_s, 2) if wall_s else 0.0,
+            "p50_ms": round(statistics.median(totals), 1) if totals else 0.0,
+            "p95_ms": round(totals[int(0.95 * (len(totals) - 1))], 1) if totals else 0.0,
+        }
+
+
+def run_batch(
+    pipeline,
+    questions: list[dict],
+    out_path: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> dict:
+    """Answer questions with bounded concurrency and write JSONL (see BatchRunner.arun)."""
+    return asyncio.run(BatchRunner(pipeline, concurrency).arun(questions, out_path))
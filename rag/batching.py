@@ -0,0 +1,119 @@
+"""
+batching.py
+-----------
+Length-bucketed, token-budget batching for embedding.
+
+An encoder pads every batch to its longest text, so a fixed batch of 32
+that mixes a 20-token trailing chunk with 1000-token chunks spends most of
+its FLOPs on padding. Here texts are sorted by (estimated) token length,
+cut into batches whose *padded* size — longest × count — stays within
+token_budget, embedded batch by batch and put back in their original
+order:
+
+    lengths   [900, 35, 880, 40, 910, 30]
+    batches   [30, 35, 40]  [880, 900]  [910]     (budget 2048)
+    result    vectors in the input order
+
+Questions get the same treatment: embed_queries() sends a whole list of
+questions through a model's batched query path (`_get_query_embeddings`)
+instead of one forward pass each.
+"""
+
+from typing import Any, Awaitable, Callable, Iterable
+
+DEFAULT_BATCH_TOKENS = 8192   # padded tokens per forward pass
+DEFAULT_MAX_BATCH = 64        # texts per forward pass, however short
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English WordPiece/BPE)."""
+    return max(1, len(text) // 4)
+
+
+def plan_batches(
+    lengths: list[int],
+    token_budget: int = DEFAULT_BATCH_TOKENS,
+    max_batch_size: int = DEFAULT_MAX_BATCH,
+) -> list[list[int]]:
+    """
+    Group indices of texts into batches of similar length.
+
+    Args:
+        lengths:        Token length of each text.
+        token_budget:   Max padded tokens (longest × count) per batch. A
+                        single text longer than the budget gets its own batch.
+        max_batch_size: Max texts per batch.
+
+    Returns:
+        Lists of indices into lengths, shortest texts first.
+    """
+    batches: list[list[int]] = []
+    current: list[int] = []
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # Sorted ascending, so lengths[i] is the longest of the batch so far
+        if current and (
+            len(current) >= max_batch_size
+            or lengths[i] * (len(current) + 1) > token_budget
+        ):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def embed_in_batches(
+    texts: list[str],
+    embed: Callable[[list[str]], list[list[float]]],
+    token_budget: int = DEFAULT_BATCH_TOKENS,
+    max_batch_size: int = DEFAULT_MAX_BATCH,
+    estimate: Callable[[str], int] = estimate_tokens,
+    map_fn: Callable[..., Iterable] = map,
+) -> list[list[float]]:
+    """
+    Embed texts in length-bucketed batches; vectors come back in input order.
+
+    map_fn applies embed to the list of batches — the builtin map runs them
+    one after another, an executor's map runs them in parallel.
+    """
+    vectors: list[list[float] | None] = [None] * len(texts)
+    batches = plan_batches([estimate(t) for t in texts], token_budget, max_batch_size)
+    results = map_fn(embed, [[texts[i] for i in batch] for batch in batches])
+    for batch, batch_vectors in zip(batches, results):
+        for i, vector in zip(batch, batch_vectors):
+            vectors[i] = vector
+    return vectors
+
+
+async def aembed_in_batches(
+    texts: list[str],
+    embed: Callable[[list[str]], Awaitable[list[list[float]]]],
+    token_budget: int = DEFAULT_BATCH_TOKENS,
+    max_batch_size: int = DEFAULT_MAX_BATCH,
+    estimate: Callable[[str], int] = estimate_tokens,
+) -> list[list[float]]:
+    """Async version of embed_in_batches()."""
+    vectors: list[list[float] | None] = [None] * len(texts)
+    for batch in plan_batches([estimate(t) for t in texts], token_budget, max_batch_size):
+        for i, vector in zip(batch, await embed([texts[i] for i in batch])):
+            vectors[i] = vector
+    return vectors
+
+
+def embed_queries(
+    embed_model: Any,
+    queries: list[str],
+    token_budget: int = DEFAULT_BATCH_TOKENS,
+    max_batch_size: int = DEFAULT_MAX_BATCH,
+) -> list[list[float]]:
+    """
+    Query vectors for many questions, in input order.
+
+    Models with a batched query path (`_get_query_embeddings`) get
+    length-bucketed batches; any other BaseEmbedding is called per query.
+    """
+    batched = getattr(embed_model, "_get_query_embeddings", None)
+    if batched is None:
+        return [embed_model.get_query_embedding(q) for q in queries]
+    return embed_in_batches(queries, batched, token_budget, max_batch_size)
@@ -0,0 +1,179 @@
+"""
+bm25.py
+-------
+Persisted BM25 keyword index that lives next to the vector store.
+
+Dense retrieval is good at meaning but poor at exact identifiers (part
+numbers, clause IDs, error codes). This inverted index keeps term
+frequencies per node in a small SQLite file (chroma_db/bm25.sqlite) and
+scores queries with Okapi BM25. IndexWriter adds and deletes nodes here in
+the same batches it writes to the vector store, so the two stay in step.
+
+Tokens keep identifiers intact ("AB-1234", "4.2.1") and also index their
+parts, so "AB-1234" matches both the full code and "1234".
+"""
+
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+BM25_NAME = "bm25.sqlite"
+
+_SQL_BATCH = 500  # stay well under SQLite's bound-parameter limit
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+_PARTS = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased word tokens; compound identifiers also yield their parts."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        parts = _PARTS.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    SQLite inverted index: postings(term, node_id, tf) + docs(node_id, length).
+
+    Safe to share between threads (all access goes through one lock).
+
+    Usage:
+        bm25 = BM25Index("chroma_db/bm25.sqlite")
+        bm25.add(["id1", "id2"], ["first chunk text", "second chunk text"])
+        bm25.search("clause 14.2", top_k=10)   → [("id1", 3.7), ...]
+    """
+
+    def __init__(self, path: str | None = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " node_id TEXT PRIMARY KEY,"
+            " length INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term TEXT NOT NULL,"
+            " node_id TEXT NOT NULL,"
+            " tf INTEGER NOT NULL,"
+            " PRIMARY KEY (term, node_id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_node ON postings (node_id)")
+        self._conn.commit()
+        self._num_docs, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs"
+        ).fetchone()
+        self._total_length = total
+
+    def count(self) -> int:
+        """Number of indexed nodes."""
+        return self._num_docs
+
+    def add(self, node_ids: list[str], texts: list[str]) -> None:
+        """Index (or re-index) nodes by id."""
+        if not node_ids:
+            return
+        with self._lock:
+            self._delete_locked(node_ids)
+            docs, postings = [], []
+            for node_id, text in zip(node_ids, texts):
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                docs.append((node_id, length))
+                postings.extend((term, node_id, tf) for term, tf in counts.items())
+                self._num_docs += 1
+                self._total_length += length
+            self._conn.executemany("INSERT INTO docs (node_id, length) VALUES (?, ?)", docs)
+            self._conn.executemany(
+                "INSERT INTO postings (term, node_id, tf) VALUES (?, ?, ?)", postings
+            )
+            self._conn.commit()
+
+    def delete(self, node_ids: list[str]) -> None:
+        """Remove nodes by id (unknown ids are ignored)."""
+        if not node_ids:
+            return
+        with self._lock:
+            self._delete_locked(node_ids)
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.commit()
+            self._num_docs = 0
+            self._total_length = 0
+
+    def sync(self, store) -> None:
+        """
+        Rebuild from a vector store backend (vector_store.open_backend) if
+        the two disagree on size (store built before this index existed,
+        or an in-memory store).
+        """
+        if self._num_docs == store.count():
+            return
+        print(f"[BM25] Rebuilding keyword index from {store.count()} stored chunks...")
+        self.clear()
+        for ids, texts in store.iter_texts(_SQL_BATCH * 4):
+            self.add(ids, texts)
+
+    def search(self, query: str, top_k: int = 10) -> list[tuple[str, float]]:
+        """
+        Okapi BM25 over the query's terms.
+
+        Returns:
+            [(node_id, score), ...] best first, at most top_k entries.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._num_docs:
+            return []
+        scores: dict[str, float] = {}
+        with self._lock:
+            num_docs = self._num_docs
+            avg_length = self._total_length / num_docs if num_docs else 1.0
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT p.node_id, p.tf, d.length FROM postings p"
+                    " JOIN docs d ON d.node_id = p.node_id WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not rows:
+                    continue
+                df = len(rows)
+                idf = math.log(1.0 + (num_docs - df + 0.5) / (df + 0.5))
+                for node_id, tf, length in rows:
+                    norm = tf + self.k1 * (1.0 - self.b + self.b * length / avg_length)
+                    scores[node_id] = scores.get(node_id, 0.0) + idf * tf * (self.k1 + 1.0) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ── Internals (lock held) ────────────────────────────────────────
+
+    def _delete_locked(self, node_ids: list[str]) -> None:
+        for start in range(0, len(node_ids), _SQL_BATCH):
+            batch = node_ids[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            removed = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs"
+                f" WHERE node_id IN ({placeholders})",
+                batch,
+            ).fetchone()
+            self._conn.execute(f"DELETE FROM postings WHERE node_id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM docs WHERE node_id IN ({placeholders})", batch)
+            self._num_docs -= removed[0]
+            self._total_length -= removed[1]
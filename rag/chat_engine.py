@@ -0,0 +1,164 @@
+"""
+chat_engine.py
+--------------
+CondensePlusContextChatEngine with an exposed, adaptive condense step.
+
+The stock engine rewrites every follow-up question (condense) with an extra
+LLM round-trip before retrieval — on a CPU-only Ollama model that can cost
+as much as the answer itself. RAGChatEngine:
+
+    - lets the caller condense first (e.g. to look the standalone question
+      up in the answer cache) and reuses that result inside
+      chat()/stream_chat() instead of condensing twice
+    - skips the rewrite on the first turn and for questions that contain
+      no pronouns or references to earlier turns (needs_condense)
+    - can run the rewrite on a smaller, faster condense_llm
+    - counts the LLM calls made per turn (llm_calls)
+
+    condensed = engine.condense("tell me more about it")
+    ... cache lookup ...
+    engine.chat("tell me more about it")      ← condense step reused
+"""
+
+import re
+
+from llama_index.core.base.llms.generic_utils import messages_to_history_str
+from llama_index.core.chat_engine import CondensePlusContextChatEngine
+from llama_index.core.llms import LLM, ChatMessage
+from llama_index.core.prompts import BasePromptTemplate, PromptTemplate
+
+from rag import tracing
+
+# Words that point back at earlier turns ("tell me more about *it*")
+_REFERENCE_WORDS = re.compile(
+    r"\b(it|its|it's|they|them|their|theirs|this|that|these|those|"
+    r"he|him|his|she|her|hers|one|ones|former|latter|above|previous|"
+    r"earlier|same|else|again|also|too|first|second|third|last)\b",
+    re.IGNORECASE,
+)
+# Openers that continue the previous turn ("and the salary?", "what about X")
+_CONTINUATIONS = re.compile(
+    r"^\s*(and|but|or|so|then|also|what about|how about|why|how come|"
+    r"more|continue|go on|elaborate|explain)\b",
+    re.IGNORECASE,
+)
+
+
+def needs_condense(message: str) -> bool:
+    """
+    Cheap heuristic: does this follow-up depend on the chat history?
+
+    True for very short messages, messages with pronouns/references, and
+    messages opening like a continuation. Erring towards True only costs
+    latency; a false False would retrieve with an ambiguous question.
+    """
+    if len(message.split()) <= 3:
+        return True
+    return bool(_REFERENCE_WORDS.search(message) or _CONTINUATIONS.search(message))
+
+
+class RAGChatEngine(CondensePlusContextChatEngine):
+    """
+    CondensePlusContextChatEngine whose condense step can run ahead of
+    chat(), is skipped when it cannot help, and is counted.
+
+    Attributes (set after from_defaults):
+        adaptive_condense: Skip the rewrite for self-contained questions.
+        condense_llm:      LLM used for the rewrite (None → the main LLM).
+        llm_calls:         LLM calls made since begin_turn().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.adaptive_condense = True
+        self.condense_llm: LLM | None = None
+        self.llm_calls = 0
+        self._condensed: tuple[str, str] | None = None
+
+    def begin_turn(self) -> None:
+        """Reset the per-turn LLM call counter."""
+        self.llm_calls = 0
+
+    def condense(self, message: str) -> str:
+        """
+        Rewrite message into a standalone question using the chat history.
+
+        The result is remembered and used by the next chat()/stream_chat()
+        call for the same message.
+        """
+        self._condensed = None
+        chat_history = self._memory.get(input=message)
+        condensed = self._run_condense(chat_history, message)
+        self._condensed = (message, condensed)
+        return condensed
+
+    async def acondense(self, message: str) -> str:
+        """Async version of condense()."""
+        self._condensed = None
+        chat_history = self._memory.get(input=message)
+        condensed = await self._arun_condense(chat_history, message)
+        self._condensed = (message, condensed)
+        return condensed
+
+    def clear_condensed(self) -> None:
+        """Forget a condensed question that will not be followed by chat()."""
+        self._condensed = None
+
+    # ── Condense step ────────────────────────────────────────────────
+
+    def _condense_prompt(self) -> BasePromptTemplate:
+        """The parent's condense prompt; some llama-index-core versions keep it as a str."""
+        template = self._condense_prompt_template
+        return PromptTemplate(template) if isinstance(template, str) else template
+
+    def _skip_condense_for(self, chat_history: list[ChatMessage], message: str) -> bool:
+        if not chat_history:
+            return True
+        return self.adaptive_condense and not needs_condense(message)
+
+    def _run_condense(self, chat_history: list[ChatMessage], message: str) -> str:
+        if self._skip_condense_for(chat_history, message):
+            return message
+        self.llm_calls += 1
+        with tracing.span("condense", history=len(chat_history),
+                          small_model=self.condense_llm is not None):
+            if self.condense_llm is None:
+                return super()._condense_question(chat_history, message)
+            return self.condense_llm.predict(
+                self._condense_prompt(),
+                question=message,
+                chat_history=messages_to_history_str(chat_history),
+            )
+
+    async def _arun_condense(self, chat_history: list[ChatMessage], message: str) -> str:
+        if self._skip_condense_for(chat_history, message):
+            return message
+        self.llm_calls += 1
+        with tracing.span("condense", history=len(chat_history),
+                          small_model=self.condense_llm is not None):
+            if self.condense_llm is None:
+                return await super()._acondense_question(chat_history, message)
+            return await self.condense_llm.apredict(
+                self._condense_prompt(),
+                question=message,
+                chat_history=messages_to_history_str(chat_history),
+            )
+
+    def _take_condensed(self, message: str) -> str | None:
+        if self._condensed is not None and self._condensed[0] == message:
+            condensed = self._condensed[1]
+            self._condensed = None
+            return condensed
+        return None
+
+    def _condense_question(self, chat_history: list[ChatMessage], latest_message: str) -> str:
+        condensed = self._take_condensed(latest_message)
+        if condensed is not None:
+            return condensed
+        return self._run_condense(chat_history, latest_message)
+
+    async def _acondense_question(self, chat_history: list[ChatMessage], latest_message: str) -> str:
+        condensed = self._take_condensed(latest_message)
+        if condensed is not None:
+            return condensed
+        return await self._arun_condense(chat_history, latest_message)
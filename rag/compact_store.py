@@ -0,0 +1,128 @@
+"""
+compact_store.py
+----------------
+Compact vector encodings: float16 rows and product quantization (PQ).
+
+Plain float32 vectors dominate disk and RSS once a corpus reaches millions
+of chunks. The native store (native_store.py) can keep them in two
+smaller forms instead:
+
+    float16  half the bytes; scanned block-wise, upcast to float32
+    pq       48 one-byte codes per 384-dim vector (32× smaller) held in
+             RAM; the scan over codes is approximate, so the best
+             candidates are re-scored exactly against the float16 rows
+
+ProductQuantizer holds the PQ codebooks: the vector is cut into m
+sub-spaces of PQ_SUBVECTOR_DIM dims, each with PQ_CENTROIDS centroids
+trained by k-means, and a vector is stored as the index of its nearest
+centroid per sub-space. A query is scored against every code with one
+lookup table per sub-space (asymmetric distance), never decoding a row.
+
+    pq = ProductQuantizer.train(vectors)
+    codes = pq.encode(vectors)                 ← (n, m) uint8
+    approx = pq.scores(codes, query)           ← (n,) inner products
+"""
+
+import numpy as np
+
+COMPACT_FORMATS = ("float16", "pq")
+PQ_SUBVECTOR_DIM = 8          # 384 dims → 48 sub-spaces → 48 bytes per vector
+PQ_CENTROIDS = 256            # one uint8 code per sub-space
+PQ_MIN_TRAIN = 1024           # below this, pq stores scan the float16 rows
+PQ_MAX_TRAIN = 20_000         # vectors sampled to train the codebooks
+SCAN_BLOCK = 65_536           # float16 rows upcast to float32 at a time
+
+
+def unit_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise each row (inner product then equals cosine similarity)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def scan_scores(vectors: np.ndarray, q: np.ndarray, start: int = 0) -> np.ndarray:
+    """Exact scores of rows start.. of float16 vectors, upcast SCAN_BLOCK rows at a time."""
+    scores = np.empty(len(vectors) - start, dtype=np.float32)
+    for lo in range(start, len(vectors), SCAN_BLOCK):
+        block = np.asarray(vectors[lo:lo + SCAN_BLOCK], dtype=np.float32)
+        scores[lo - start:lo - start + len(block)] = block @ q
+    return scores
+
+
+def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    distances = -2 * data @ centroids.T + (centroids ** 2).sum(1)
+    return distances.argmin(1)
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int = 12, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means; returns (k, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(data, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        filled = counts > 0          # empty clusters keep their old centroid
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def _subvector_dim(dim: int) -> int:
+    """Largest sub-space size ≤ PQ_SUBVECTOR_DIM that divides dim."""
+    return next(d for d in range(PQ_SUBVECTOR_DIM, 0, -1) if dim % d == 0)
+
+
+class ProductQuantizer:
+    """
+    PQ codebooks of shape (m, centroids, dsub): encodes vectors to m uint8
+    codes and scores a query against codes.
+    """
+
+    def __init__(self, codebooks: np.ndarray):
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, seed: int = 0) -> "ProductQuantizer":
+        """Train codebooks on up to PQ_MAX_TRAIN of the given vectors."""
+        rng = np.random.default_rng(seed)
+        picked = np.sort(rng.choice(len(vectors), min(len(vectors), PQ_MAX_TRAIN), replace=False))
+        sample = np.asarray(vectors[picked], dtype=np.float32)
+        dsub = _subvector_dim(sample.shape[1])
+        m, k = sample.shape[1] // dsub, min(PQ_CENTROIDS, len(sample))
+        return cls(np.stack([
+            _kmeans(sample[:, j * dsub:(j + 1) * dsub], k, seed=seed) for j in range(m)
+        ]))
+
+    @classmethod
+    def load(cls, path: str) -> "ProductQuantizer":
+        return cls(np.load(path))
+
+    def save(self, path: str) -> None:
+        np.save(path, self.codebooks)
+
+    @property
+    def m(self) -> int:
+        """Sub-spaces, i.e. bytes per encoded vector."""
+        return self.codebooks.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codebooks.nbytes
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) vectors → (n, m) uint8 codes, SCAN_BLOCK rows at a time."""
+        m, _, dsub = self.codebooks.shape
+        codes = np.empty((len(vectors), m), dtype=np.uint8)
+        for lo in range(0, len(vectors), SCAN_BLOCK):
+            block = np.asarray(vectors[lo:lo + SCAN_BLOCK], dtype=np.float32)
+            for j in range(m):
+                codes[lo:lo + len(block), j] = _nearest(
+                    block[:, j * dsub:(j + 1) * dsub], self.codebooks[j]
+                )
+        return codes
+
+    def scores(self, codes: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """Approximate inner products of q with every encoded row."""
+        m, _, dsub = self.codebooks.shape
+        tables = np.einsum("mkd,md->mk", self.codebooks, q.reshape(m, dsub))
+        return tables[np.arange(m), codes].sum(axis=1)
@@ -0,0 +1,205 @@
+"""
+compress.py
+-----------
+Context compression: shrink retrieved chunks before they reach the prompt.
+
+Prompt processing dominates CPU latency, and a top-5 query pastes ~5k
+tokens of whole chunks into it. ContextCompressor, a node postprocessor
+that runs after retrieval (and reranking), cuts that down in three steps:
+
+    1. Near-duplicates — neighbouring chunks share a 150-token overlap, so
+       sentences already seen in a better-ranked chunk are dropped, and a
+       chunk that is almost entirely repeated is dropped whole
+    2. Relevance       — sentences are scored by the query terms they
+       contain (rarer terms weigh more); matching sentences and their
+       direct neighbours are kept. A chunk with no match keeps its lead
+       sentences, since the retriever found it relevant for a reason
+    3. Token budget    — sentences are added best-first until token_budget
+       is reached, then re-assembled in document order
+
+The numbers for the current turn are available from
+take_compression_stats() (per thread / per asyncio task), so concurrent
+sessions sharing one compressor each see their own turn.
+"""
+
+import copy
+import math
+import re
+import threading
+from contextvars import ContextVar
+from typing import Any
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+from llama_index.core.utils import get_tokenizer
+
+from rag import tracing
+from rag.bm25 import tokenize
+
+DEFAULT_TOKEN_BUDGET = 1500
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it me "
+    "of on or tell that the their this to was what when where which who why "
+    "with you your about more".split()
+)
+_turn_stats: ContextVar[dict | None] = ContextVar("compression_stats", default=None)
+
+
+def take_compression_stats() -> dict | None:
+    """
+    Return and reset the stats of the last compression in this thread/task.
+
+    Returns:
+        {"chunks_before", "chunks_after", "tokens_before", "tokens_after",
+         "tokens_saved"} or None if nothing was compressed.
+    """
+    stats = _turn_stats.get()
+    _turn_stats.set(None)
+    return stats
+
+
+def _normalise(sentence: str) -> str:
+    return " ".join(sentence.lower().split())
+
+
+class ContextCompressor(BaseNodePostprocessor):
+    """
+    Node postprocessor that deduplicates, extracts query-relevant sentences
+    and enforces a token budget on the retrieved context.
+    """
+
+    token_budget: int = Field(default=DEFAULT_TOKEN_BUDGET, description="Max context tokens per turn.")
+    dedup_threshold: float = Field(default=0.8, description="Drop a chunk when this share of it was already seen.")
+    lead_sentences: int = Field(default=2, description="Sentences kept from chunks with no query match.")
+    window: int = Field(default=1, description="Neighbouring sentences kept around a match.")
+
+    _tokenizer: Any = PrivateAttr()
+    _totals: dict = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._tokenizer = get_tokenizer()
+        self._totals = {"turns": 0, "tokens_before": 0, "tokens_after": 0}
+        self._lock = threading.Lock()   # one compressor serves every session
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextCompressor"
+
+    def _count(self, text: str) -> int:
+        return len(self._tokenizer(text))
+
+    def _postprocess_nodes(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None = None,
+    ) -> list[NodeWithScore]:
+        if not nodes:
+            return nodes
+        with tracing.span("compress") as span:
+            compressed = self._compress(nodes, query_bundle)
+            span.update(_turn_stats.get() or {})
+        return compressed
+
+    def _compress(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None,
+    ) -> list[NodeWithScore]:
+        texts = [n.node.get_content(metadata_mode=MetadataMode.NONE) for n in nodes]
+        tokens_before = sum(self._count(t) for t in texts)
+
+        # ── 1. Split into sentences, dropping ones already seen ───────
+        seen: set[str] = set()
+        chunks: list[list[str]] = []
+        for text in texts:
+            sentences = [s for s in _SENTENCE_END.split(text.strip()) if s]
+            fresh = [s for s in sentences if _normalise(s) not in seen]
+            if sentences and 1 - len(fresh) / len(sentences) >= self.dedup_threshold:
+                fresh = []
+            seen.update(_normalise(s) for s in sentences)
+            chunks.append(fresh)
+
+        # ── 2. Score sentences against the query ──────────────────────
+        query_terms = {
+            t for t in tokenize(query_bundle.query_str if query_bundle else "")
+            if t not in _STOPWORDS
+        }
+        sentence_terms = [[set(tokenize(s)) & query_terms for s in chunk] for chunk in chunks]
+        total = sum(len(chunk) for chunk in chunks) or 1
+        df: dict[str, int] = {}
+        for chunk in sentence_terms:
+            for terms in chunk:
+                for term in terms:
+                    df[term] = df.get(term, 0) + 1
+        idf = {term: math.log(1 + total / count) for term, count in df.items()}
+
+        candidates = []   # (score, chunk rank, position)
+        for rank, chunk in enumerate(sentence_terms):
+            scores = [sum(idf[t] for t in terms) for terms in chunk]
+            if not any(scores):
+                candidates.extend((0.0, rank, i) for i in range(min(self.lead_sentences, len(chunk))))
+                continue
+            kept: dict[int, float] = {}
+            for i, score in enumerate(scores):
+                if not score:
+                    continue
+                kept[i] = max(kept.get(i, 0.0), score)
+                for j in range(max(0, i - self.window), min(len(chunk), i + self.window + 1)):
+                    kept.setdefault(j, score / 2)
+            candidates.extend((score, rank, i) for i, score in kept.items())
+
+        # ── 3. Fill the token budget best-first ───────────────────────
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+        selected: dict[int, list[int]] = {}
+        used = 0
+        for _, rank, i in candidates:
+            cost = self._count(chunks[rank][i])
+            if used + cost > self.token_budget:
+                continue
+            used += cost
+            selected.setdefault(rank, []).append(i)
+
+        compressed = []
+        for rank, node in enumerate(nodes):
+            if rank not in selected:
+                continue
+            positions = sorted(selected[rank])
+            parts = [chunks[rank][positions[0]]]
+            for prev, pos in zip(positions, positions[1:]):
+                parts.append(chunks[rank][pos] if pos == prev + 1 else "… " + chunks[rank][pos])
+            new_node = copy.copy(node.node)
+            new_node.set_content(" ".join(parts))
+            compressed.append(NodeWithScore(node=new_node, score=node.score))
+
+        if not compressed:
+            # Not even one sentence fits: send the best chunk as is
+            compressed = nodes[:1]
+        tokens_after = sum(self._count(n.node.get_content(metadata_mode=MetadataMode.NONE)) for n in compressed)
+        stats = {
+            "chunks_before": len(nodes),
+            "chunks_after": len(compressed),
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": tokens_before - tokens_after,
+        }
+        _turn_stats.set(stats)
+        with self._lock:
+            self._totals["turns"] += 1
+            self._totals["tokens_before"] += tokens_before
+            self._totals["tokens_after"] += tokens_after
+        return compressed
+
+    def stats(self) -> dict:
+        """Totals over all turns: tokens before/after and the share saved."""
+        with self._lock:
+            totals = dict(self._totals)
+        before = totals["tokens_before"]
+        return {
+            **totals,
+            "saved_rate": 1 - totals["tokens_after"] / before if before else 0.0,
+        }
@@ -0,0 +1,297 @@
+"""
+embed_cache.py
+--------------
+Persistent embedding cache that wraps any LlamaIndex embedding model.
+
+Vectors are stored in a small SQLite file keyed by
+sha256(model name + text kind + text), so:
+    - rebuilding the collection with different chunk settings only embeds
+      chunks whose text actually changed
+    - repeated questions skip the encoder entirely
+
+Query and document embeddings are cached separately because models like
+BGE prepend an instruction to queries, giving a different vector for the
+same text.
+
+The cache is size-bounded: when it grows past max_entries the least
+recently used vectors are evicted.
+
+Cache misses are embedded in length-bucketed batches under a padded-token
+budget (see batching.py) rather than fixed batches of embed_batch_size.
+
+The wrapped model may be a Lazy (lazy.py): it is then only loaded on the
+first cache miss, so a fully cached warm start never imports PyTorch.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from rag.batching import (
+    DEFAULT_BATCH_TOKENS,
+    DEFAULT_MAX_BATCH,
+    aembed_in_batches,
+    embed_in_batches,
+    embed_queries,
+)
+from rag import tracing
+from rag.embed_pool import PooledEmbedding
+from rag.lazy import Lazy
+
+CACHE_DIR = ".rag_cache"
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite")
+DEFAULT_MAX_ENTRIES = 500_000
+
+_SQL_BATCH = 500  # stay well under SQLite's bound-parameter limit
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed key → vector store with LRU eviction and hit/miss counters.
+
+    Safe to share between threads (all access goes through one lock).
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name: str, kind: str, text: str) -> str:
+        """Cache key for one text embedded by one model."""
+        return hashlib.sha256(f"{model_name}\x00{kind}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Look up keys; returns only the ones found and bumps their LRU time."""
+        found: dict[str, list[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        """Store vectors, then evict the least recently used if over budget."""
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                # Evict down to 90% so we don't evict on every insert
+                excess = self._count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._count,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model wrapper that serves vectors from an EmbeddingCache and
+    only calls the wrapped model for texts it has never seen.
+
+    Usage:
+        embed_model = CachedEmbedding(HuggingFaceEmbedding(...), EmbeddingCache())
+    """
+
+    _inner: BaseEmbedding | Lazy = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+    _token_budget: int = PrivateAttr()
+    _max_batch_size: int = PrivateAttr()
+
+    def __init__(
+        self,
+        inner: BaseEmbedding | Lazy,
+        cache: EmbeddingCache,
+        token_budget: int = DEFAULT_BATCH_TOKENS,
+        max_batch_size: int = DEFAULT_MAX_BATCH,
+        model_name: str | None = None,
+    ):
+        if isinstance(inner, Lazy):
+            if model_name is None:
+                raise ValueError("model_name is required when the inner model is Lazy")
+            extra = {}
+        else:
+            model_name = model_name or inner.model_name
+            extra = {"callback_manager": inner.callback_manager}
+        super().__init__(
+            model_name=model_name,
+            # Take whole writer batches at once, so misses can be bucketed
+            # by length across all of them (see _get_text_embeddings)
+            embed_batch_size=1024,
+            **extra,
+        )
+        self._inner = inner
+        self._cache = cache
+        self._token_budget = token_budget
+        self._max_batch_size = max_batch_size
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        """The wrapped model (loads it first if it is still Lazy)."""
+        if isinstance(self._inner, Lazy):
+            return self._inner.get()
+        return self._inner
+
+    @property
+    def model_loaded(self) -> bool:
+        return not isinstance(self._inner, Lazy) or self._inner.loaded
+
+    def warm(self) -> None:
+        """Start loading a Lazy inner model in the background."""
+        if isinstance(self._inner, Lazy):
+            self._inner.warm()
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    # ── Cache plumbing ───────────────────────────────────────────────
+
+    def _lookup(self, kind: str, texts: list[str]) -> tuple[list[str], dict, list[str]]:
+        """Return (keys, cached vectors by key, unique texts still to embed)."""
+        keys = [EmbeddingCache.make_key(self.model_name, kind, t) for t in texts]
+        cached = self._cache.get_many(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in cached))
+        tracing.annotate(embed_cache_hits=len(cached), embed_cache_misses=len(missing))
+        return keys, cached, missing
+
+    def _store(self, kind: str, texts: list[str], vectors: list[list[float]], cached: dict) -> None:
+        new = {
+            EmbeddingCache.make_key(self.model_name, kind, t): v
+            for t, v in zip(texts, vectors)
+        }
+        self._cache.put_many(new)
+        cached.update(new)
+
+    # ── BaseEmbedding interface ──────────────────────────────────────
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        keys, cached, missing = self._lookup("query", [query])
+        if missing:
+            self._store("query", missing, [self.inner._get_query_embedding(query)], cached)
+        return cached[keys[0]]
+
+    def _get_query_embeddings(self, queries: list[str]) -> list[list[float]]:
+        """Batched query path (see batching.embed_queries); only misses are encoded."""
+        keys, cached, missing = self._lookup("query", queries)
+        if missing:
+            if isinstance(self.inner, PooledEmbedding):
+                vectors = self.inner._get_query_embeddings(missing)
+            else:
+                vectors = embed_queries(
+                    self.inner, missing, self._token_budget, self._max_batch_size
+                )
+            self._store("query", missing, vectors, cached)
+        return [cached[k] for k in keys]
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        keys, cached, missing = self._lookup("query", [query])
+        if missing:
+            vector = await self.inner._aget_query_embedding(query)
+            self._store("query", missing, [vector], cached)
+        return cached[keys[0]]
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> list[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        keys, cached, missing = self._lookup("text", texts)
+        if missing:
+            if isinstance(self.inner, PooledEmbedding):
+                # Buckets the batches itself and spreads them over its workers
+                vectors = self.inner._get_text_embeddings(missing)
+            else:
+                vectors = embed_in_batches(
+                    missing, self.inner._get_text_embeddings,
+                    self._token_budget, self._max_batch_size,
+                )
+            self._store("text", missing, vectors, cached)
+        return [cached[k] for k in keys]
+
+    async def _aget_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        keys, cached, missing = self._lookup("text", texts)
+        if missing:
+            vectors = await aembed_in_batches(
+                missing, self.inner._aget_text_embeddings,
+                self._token_budget, self._max_batch_size,
+            )
+            self._store("text", missing, vectors, cached)
+        return [cached[k] for k in keys]
@@ -0,0 +1,158 @@
+"""
+embed_pool.py
+-------------
+Multi-process embedding: N worker processes, each with its own model copy.
+
+A single encoder stops scaling well past a handful of intra-op threads,
+so on a many-core box most cores sit idle during ingestion. PooledEmbedding
+starts num_workers processes (spawned, so no half-initialised torch state
+is forked), pins each one to threads_per_worker threads — and, on Linux,
+to its own set of cores — and loads the embedding model once per worker.
+
+Texts are cut into length-bucketed batches (batching.py) and the batches
+are fanned out over the workers; vectors are gathered back in input order,
+so callers (CachedEmbedding → IndexWriter) see no difference from a
+single in-process model.
+
+    embed_model = PooledEmbedding("BAAI/bge-small-en-v1.5", num_workers=4)
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from rag.batching import DEFAULT_BATCH_TOKENS, embed_in_batches, embed_queries
+
+# ── Worker side ───────────────────────────────────────────────────────────────
+
+_worker_model: BaseEmbedding | None = None
+
+
+def _init_worker(model_name: str, backend: str, batch_size: int, threads: int, counter) -> None:
+    """Pin threads (and cores on Linux), then load this worker's model copy."""
+    global _worker_model
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    with counter.get_lock():
+        slot = counter.value
+        counter.value += 1
+    if hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        start = (slot * threads) % len(cores)
+        mine = {cores[(start + i) % len(cores)] for i in range(threads)}
+        try:
+            os.sched_setaffinity(0, mine)
+        except OSError:
+            pass
+
+    if backend == "torch":
+        import torch   # only torch workers pay for it; onnx gets intra_op_num_threads below
+
+        torch.set_num_threads(threads)
+    from rag.embedder import load_embedding_model
+
+    # num_threads sets the onnxruntime session's intra_op_num_threads
+    _worker_model = load_embedding_model(model_name, backend, batch_size, num_threads=threads)
+
+
+def _embed_texts(texts: list[str]) -> list[list[float]]:
+    return _worker_model._get_text_embeddings(texts)
+
+
+def _embed_query(query: str) -> list[float]:
+    return _worker_model._get_query_embedding(query)
+
+
+def _embed_queries(queries: list[str]) -> list[list[float]]:
+    return embed_queries(_worker_model, queries, max_batch_size=len(queries))
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+# ── Parent side ───────────────────────────────────────────────────────────────
+
+class PooledEmbedding(BaseEmbedding):
+    """
+    BaseEmbedding that shards batches over worker processes.
+
+    Args:
+        model_name:         HuggingFace model name.
+        backend:            "torch" or "onnx" (see embedder.get_embeddings).
+        num_workers:        Worker processes (each holds one model copy).
+        threads_per_worker: Threads per worker (default: cores / workers).
+        embed_batch_size:   Max texts per forward pass.
+        token_budget:       Max padded tokens per forward pass.
+    """
+
+    backend: str = Field(default="torch")
+    num_workers: int = Field(default=2, description="Worker processes.")
+    threads_per_worker: int = Field(default=1, description="Threads pinned per worker.")
+    token_budget: int = Field(default=DEFAULT_BATCH_TOKENS, description="Padded tokens per batch.")
+
+    _pool: Any = PrivateAttr()
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = "torch",
+        num_workers: int = 2,
+        threads_per_worker: int | None = None,
+        embed_batch_size: int = 32,
+        token_budget: int = DEFAULT_BATCH_TOKENS,
+        reported_name: str | None = None,
+    ):
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        super().__init__(
+            model_name=reported_name or model_name,
+            backend=backend,
+            num_workers=num_workers,
+            threads_per_worker=threads,
+            embed_batch_size=embed_batch_size,
+            token_budget=token_budget,
+        )
+        context = multiprocessing.get_context("spawn")
+        self._pool = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_name, backend, embed_batch_size, threads, context.Value("i", 0)),
+        )
+        # Start every worker now, so model loading isn't billed to the first batch
+        pids = {f.result() for f in [self._pool.submit(_ready) for _ in range(num_workers)]}
+        print(f"✓ Embedding pool ready  ({len(pids)} workers × {threads} threads)")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "PooledEmbedding"
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self._pool.submit(_embed_query, query).result()
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return await asyncio.wrap_future(self._pool.submit(_embed_query, query))
+
+    def _get_query_embeddings(self, queries: list[str]) -> list[list[float]]:
+        """Same as _get_text_embeddings, through the workers' query path."""
+        return embed_in_batches(
+            queries, _embed_queries, self.token_budget, self.embed_batch_size, map_fn=self._pool.map
+        )
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """Length-bucket texts and embed the batches on all workers at once."""
+        return embed_in_batches(
+            texts, _embed_texts, self.token_budget, self.embed_batch_size, map_fn=self._pool.map
+        )
@@ -3,16 +3,100 @@ embedder.py
 -----------
 Creates embeddings using LlamaIndex's HuggingFaceEmbedding wrapper.
 Compatible with llama-index-embeddings-huggingface >= 0.2.x
+
+By default the model is wrapped in a persistent embedding cache
+(see embed_cache.py) so unchanged chunks and repeated questions are
+never re-encoded.
+
+Backends:
+    "torch" — HuggingFaceEmbedding on PyTorch (default)
+    "onnx"  — exported, int8-quantized ONNX Runtime session
+              (onnx_embedding.py; needs onnxruntime + onnx)
+
+With num_procs > 1 either backend runs in a pool of worker processes,
+one model copy each (embed_pool.py).
+
+Nothing here imports PyTorch at module level; the model (and torch with
+it) is only imported when load_embedding_model() runs — with lazy=True
+not until the first embedding cache miss or an explicit warm().
 """
 
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.core.embeddings import BaseEmbedding
+
+from rag.batching import DEFAULT_BATCH_TOKENS
+from rag.embed_pool import PooledEmbedding
+from rag.embed_cache import (
+    DEFAULT_CACHE_PATH,
+    DEFAULT_MAX_ENTRIES,
+    CachedEmbedding,
+    EmbeddingCache,
+)
+from rag.lazy import Lazy
 
 DEFAULT_MODEL = "BAAI/bge-small-en-v1.5"  # fast, 384-dim — same size as MiniLM
+EMBED_BACKENDS = ("torch", "onnx")
+
+
+def onnx_model_id(model_name: str, quantize: bool = True) -> str:
+    """
+    Name under which ONNX vectors are cached and recorded in the manifest —
+    distinct from the PyTorch model, so the two are never mixed in one index.
+
+    Lives here rather than in onnx_embedding.py so naming a lazy ONNX model
+    does not import onnxruntime / transformers.
+    """
+    return f"{model_name}+onnx-{'int8' if quantize else 'fp32'}"
+
+
+def embedding_id(model_name: str = DEFAULT_MODEL, backend: str = "torch") -> str:
+    """
+    The model_name the embedding model will report for this backend — what
+    the manifest records, so switching backends re-embeds the corpus.
+    """
+    if backend == "onnx":
+        return onnx_model_id(model_name)
+    return model_name
+
+
+def load_embedding_model(
+    model_name: str = DEFAULT_MODEL,
+    backend: str = "torch",
+    batch_size: int = 32,
+    num_threads: int | None = None,
+) -> BaseEmbedding:
+    """Build the bare (uncached, in-process) embedding model for a backend."""
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'. Use one of {EMBED_BACKENDS}.")
+    if backend == "onnx":
+        from rag.onnx_embedding import OnnxEmbedding
+
+        return OnnxEmbedding(
+            model_name,
+            num_threads=num_threads,
+            embed_batch_size=batch_size,
+        )
+    from rag.hf_embedding import HFEmbedding
 
+    return HFEmbedding(
+        model_name=model_name,
+        device="cpu",
+        embed_batch_size=batch_size,
+    )
 
-def get_embeddings(model_name: str = DEFAULT_MODEL) -> HuggingFaceEmbedding:
+
+def get_embeddings(
+    model_name: str = DEFAULT_MODEL,
+    cache_path: str | None = DEFAULT_CACHE_PATH,
+    max_cache_entries: int = DEFAULT_MAX_ENTRIES,
+    backend: str = "torch",
+    batch_size: int = 32,
+    num_threads: int | None = None,
+    token_budget: int = DEFAULT_BATCH_TOKENS,
+    num_procs: int = 1,
+    lazy: bool = False,
+) -> BaseEmbedding:
     """
-    Load and return a LlamaIndex HuggingFaceEmbedding object.
+    Load and return a LlamaIndex embedding model.
 
     Note: LlamaIndex uses BAAI/bge-small-en-v1.5 as default which is
     slightly better than all-MiniLM-L6-v2 on retrieval benchmarks.
@@ -20,16 +104,56 @@ def get_embeddings(model_name: str = DEFAULT_MODEL) -> HuggingFaceEmbedding:
     to keep the exact same model as the LangChain version.
 
     Args:
-        model_name: HuggingFace model name.
+        model_name:        HuggingFace model name.
+        cache_path:        SQLite file for the embedding cache
+                           (None → no cache, bare HuggingFaceEmbedding).
+        max_cache_entries: Vectors kept before LRU eviction kicks in.
+        backend:           "torch" or "onnx" (int8 ONNX Runtime).
+        batch_size:        Max texts per forward pass.
+        num_threads:       onnxruntime intra-op threads (onnx backend;
+                           None → all cores), or threads per worker
+                           process when num_procs > 1.
+        token_budget:      Max padded tokens per forward pass; chunks are
+                           grouped by length so short ones batch together.
+        num_procs:         Worker processes for embedding (1 = in-process).
+        lazy:              Defer loading the model to the first cache miss
+                           (or CachedEmbedding.warm()). Needs the cache;
+                           ignored when cache_path is None.
 
     Returns:
-        HuggingFaceEmbedding instance ready to use.
+        Embedding model ready to use (CachedEmbedding unless cache_path is None).
     """
-    print(f"Loading embedding model '{model_name}'...")
-    embed_model = HuggingFaceEmbedding(
-        model_name=model_name,
-        device="cpu",
-        embed_batch_size=32,
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'. Use one of {EMBED_BACKENDS}.")
+
+    def load() -> BaseEmbedding:
+        print(f"Loading embedding model '{model_name}' ({backend})...")
+        if num_procs > 1:
+            embed_model = PooledEmbedding(
+                model_name,
+                backend=backend,
+                num_workers=num_procs,
+                threads_per_worker=num_threads,
+                embed_batch_size=batch_size,
+                token_budget=token_budget,
+                reported_name=embedding_id(model_name, backend),
+            )
+        else:
+            embed_model = load_embedding_model(model_name, backend, batch_size, num_threads)
+        print("✓ Embedding model loaded")
+        return embed_model
+
+    if cache_path is None:
+        return load()
+
+    inner = Lazy(load, "embedding model") if lazy else load()
+    cache = EmbeddingCache(cache_path, max_entries=max_cache_entries)
+    print(f"✓ Embedding cache at '{cache_path}'  ({cache.stats()['entries']} vectors)"
+          + ("  — model loads on first use" if lazy else ""))
+    return CachedEmbedding(
+        inner,
+        cache,
+        token_budget=token_budget,
+        max_batch_size=batch_size,
+        model_name=embedding_id(model_name, backend),
     )
-    print("✓ Embedding model loaded")
-    return embed_model
\ No newline at end of file
@@ -0,0 +1,18 @@
+"""
+hf_embedding.py
+---------------
+HuggingFaceEmbedding with a batched query path.
+
+Kept out of embedder.py because importing llama-index-embeddings-huggingface
+pulls in sentence-transformers and PyTorch; embedder imports this module
+only when a torch model is actually loaded.
+"""
+
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+
+class HFEmbedding(HuggingFaceEmbedding):
+    """HuggingFaceEmbedding with a batched query path (batching.embed_queries)."""
+
+    def _get_query_embeddings(self, queries: list[str]) -> list[list[float]]:
+        return self._embed(queries, prompt_name="query")
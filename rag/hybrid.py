@@ -0,0 +1,97 @@
+"""
+hybrid.py
+---------
+Hybrid retrieval: dense vector search + BM25 keyword search, fused with
+reciprocal-rank fusion (RRF).
+
+Both searches run concurrently (BM25 in a worker thread while the query is
+embedded and Chroma is searched) and each returns candidate_k candidates.
+RRF then scores every candidate by its rank in each list,
+
+    score(node) = Σ  1 / (rrf_k + rank)
+
+which needs no score normalisation between the two very different scales,
+and keeps the top_k. Nodes found only by BM25 are fetched from the vector
+store by id.
+
+    retriever = HybridRetriever(index, BM25Index("chroma_db/bm25.sqlite"), backend, top_k=5)
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+from rag.bm25 import BM25Index
+
+DEFAULT_RRF_K = 60
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever that fuses a VectorIndexRetriever and a BM25Index with RRF.
+
+    Args:
+        index:       VectorStoreIndex over the vector store.
+        bm25:        BM25Index kept in step with the same store.
+        store:       Backend of that store (vector_store.backend_of), used to
+                     load keyword-only hits by id.
+        top_k:       Nodes returned after fusion.
+        candidate_k: Candidates taken from each search (default 4 × top_k, ≥ 20).
+        rrf_k:       RRF rank constant; larger values flatten the rank weights.
+    """
+
+    def __init__(
+        self,
+        index: VectorStoreIndex,
+        bm25: BM25Index,
+        store,
+        top_k: int = 5,
+        candidate_k: int | None = None,
+        rrf_k: int = DEFAULT_RRF_K,
+    ):
+        super().__init__()
+        self.top_k = top_k
+        self.candidate_k = candidate_k or max(4 * top_k, 20)
+        self.rrf_k = rrf_k
+        self.bm25 = bm25
+        self._vector = VectorIndexRetriever(index=index, similarity_top_k=self.candidate_k)
+        self._store = store
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bm25")
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        keyword = self._pool.submit(self.bm25.search, query_bundle.query_str, self.candidate_k)
+        dense = self._vector.retrieve(query_bundle)
+        return self._fuse(dense, keyword.result())
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        dense, keyword = await asyncio.gather(
+            self._vector.aretrieve(query_bundle),
+            asyncio.to_thread(self.bm25.search, query_bundle.query_str, self.candidate_k),
+        )
+        return await asyncio.to_thread(self._fuse, dense, keyword)
+
+    def _fuse(
+        self,
+        dense: list[NodeWithScore],
+        keyword: list[tuple[str, float]],
+    ) -> list[NodeWithScore]:
+        scores: dict[str, float] = {}
+        nodes = {hit.node.node_id: hit.node for hit in dense}
+        ranked_ids = [[hit.node.node_id for hit in dense], [node_id for node_id, _ in keyword]]
+        for ids in ranked_ids:
+            for rank, node_id in enumerate(ids, 1):
+                scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (self.rrf_k + rank)
+
+        best = sorted(scores, key=scores.get, reverse=True)[:self.top_k]
+        nodes.update(self._fetch_nodes([i for i in best if i not in nodes]))
+        return [NodeWithScore(node=nodes[i], score=scores[i]) for i in best if i in nodes]
+
+    def _fetch_nodes(self, node_ids: list[str]) -> dict:
+        """Load keyword-only hits from the vector store."""
+        if not node_ids:
+            return {}
+        return {node.node_id: node for node in self._store.get_nodes(node_ids)}
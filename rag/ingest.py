@@ -0,0 +1,207 @@
+"""
+ingest.py
+---------
+Streaming ingestion: load → split → embed → upsert, one file at a time.
+
+load_pdfs() + split_documents() + build_vector_store() materialise every
+page and every chunk of the corpus before the first vector is written, so
+peak memory grows with the corpus. ingest_pdfs() instead pulls pages from a
+generator and pushes each file's chunks straight through IndexWriter in
+bounded batches:
+
+    parse (≤ 2 × num_workers files ahead, in the background)
+        → split one file
+        → embed + upsert in batches of batch_size
+        → manifest checkpoint every checkpoint_every new chunks
+
+Memory therefore depends on the largest single file, not the folder, and
+an interrupted run resumes from the last checkpoint: files committed
+before the crash are skipped (see vector_store.stale_sources).
+
+index_pdfs() adds the scan in front: it resolves a PDF path / folder and
+hands only the new or changed files to ingest_pdfs().
+
+Usage:
+    index = ingest_pdfs(resolve_pdf_paths("docs/"), embed_model)
+    index = index_pdfs("docs/", embed_model)
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.schema import Document
+
+from rag import tracing
+from rag.loader import load_pdf_file, parse_pool, resolve_pdf_paths
+from rag.manifest import file_key, group_nodes_by_page
+from rag.splitter import get_splitter
+from rag.vector_store import (
+    CHROMA_DIR,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CHECKPOINT_EVERY,
+    IndexWriter,
+    build_status,
+    stale_sources,
+)
+
+
+def iter_documents(paths: list[str], num_workers: int = 1) -> Iterator[tuple[str, list[Document], float]]:
+    """
+    Yield (path, pages, parse seconds) file by file, in input order.
+
+    Parsing always runs ahead of the consumer, so the next file is read
+    while the current one is embedded: with num_workers == 1 in a single
+    background thread, with num_workers > 1 in a process pool. At most
+    2 × num_workers files are in flight, so parsed pages never pile up
+    faster than the consumer can index them.
+    """
+    if num_workers <= 1:
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-parse")
+    else:
+        pool = parse_pool(num_workers)
+    num_workers = max(1, num_workers)
+
+    with pool:
+        pending = deque()
+        remaining = iter(paths)
+        for path in remaining:
+            pending.append((path, pool.submit(load_pdf_file, path)))
+            if len(pending) >= 2 * num_workers:
+                break
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(remaining, None)
+            if next_path is not None:
+                pending.append((next_path, pool.submit(load_pdf_file, next_path)))
+            docs, seconds = future.result()
+            yield path, docs, seconds
+
+
+def ingest_pdfs(
+    paths: list[str],
+    embed_model: BaseEmbedding,
+    persist_dir: str = CHROMA_DIR,
+    source_files: list[str] | None = None,
+    chunking: dict | None = None,
+    num_workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    vector_backend: str = "chroma",
+    vector_format: str = "float32",
+) -> VectorStoreIndex:
+    """
+    Index PDFs into the Chroma store without holding the corpus in memory.
+
+    Args:
+        paths:            PDF files to (re-)index — typically stale_sources().
+        embed_model:      LlamaIndex embedding model.
+        persist_dir:      Folder where Chroma stores its data.
+        source_files:     Every PDF in the corpus (defaults to paths). Indexed
+                          files not listed here are deleted from the store.
+        chunking:         {"chunk_size": ..., "overlap": ...} for the splitter.
+        num_workers:      Processes parsing PDFs ahead of the indexer
+                          (1 = one background thread, 0 = one process
+                          per CPU core).
+        batch_size:       Chunks embedded and upserted per batch.
+        checkpoint_every: New chunks between manifest checkpoints.
+        vector_backend:   "chroma" or "native" (see vector_store.open_backend).
+        vector_format:    "float32", "float16" or "pq" (float16 / pq: native only).
+
+    Returns:
+        LlamaIndex VectorStoreIndex wrapping the Chroma collection.
+    """
+    chunking = chunking or {"chunk_size": 1000, "overlap": 150}
+    splitter = get_splitter(chunking["chunk_size"], chunking["overlap"])
+    if num_workers == 0:
+        num_workers = os.cpu_count() or 1
+
+    writer = IndexWriter(
+        embed_model,
+        persist_dir,
+        chunking,
+        batch_size=batch_size,
+        checkpoint_every=checkpoint_every,
+        vector_backend=vector_backend,
+        vector_format=vector_format,
+    )
+    if writer.reset and source_files:
+        # Store was rebuilt from scratch, so "unchanged" files need indexing too
+        paths = list(source_files)
+    writer.remove_missing({file_key(p) for p in (source_files or paths)})
+
+    if paths:
+        print(f"Indexing {len(paths)} file(s)  (batch_size={batch_size}, "
+              f"workers={num_workers})...")
+    start = time.perf_counter()
+    with tracing.trace("ingest", files=len(paths)):
+        for i, (path, docs, parse_seconds) in enumerate(iter_documents(paths, num_workers), 1):
+            name = os.path.basename(path)
+            # Parsing may have happened in a worker process, so it is recorded after the fact
+            tracing.record("load", parse_seconds * 1000, file=name, pages=len(docs))
+            t0 = time.perf_counter()
+            with tracing.span("split", file=name) as span:
+                nodes = splitter.get_nodes_from_documents(docs)
+                span["chunks"] = len(nodes)
+            # All nodes come from this one file, so take its single page group
+            pages = next(iter(group_nodes_by_page(nodes).values()), {})
+            added, skipped = writer.write_file(file_key(path), pages)
+            print(f"    [{i}/{len(paths)}] {name}  "
+                  f"({len(docs)} pages, {added} embedded, {skipped} unchanged, "
+                  f"parse {parse_seconds:.2f}s, index {time.perf_counter() - t0:.2f}s)")
+
+        if paths:
+            print(f"✓ Indexed {len(paths)} file(s) in {time.perf_counter() - start:.1f}s")
+        return writer.finish()
+
+
+def index_pdfs(
+    pdf_path: str | list[str],
+    embed_model: BaseEmbedding,
+    persist_dir: str = CHROMA_DIR,
+    chunking: dict | None = None,
+    num_workers: int = 1,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    vector_backend: str = "chroma",
+    vector_format: str = "float32",
+) -> VectorStoreIndex:
+    """
+    Bring the store in persist_dir up to date with pdf_path and return it.
+
+    The manifest is keyed on embed_model.model_name — the name IndexWriter
+    records — so a different model rebuilds the store instead of mixing
+    vectors from two models. Only new or changed files are parsed.
+    """
+    chunking = chunking or {"chunk_size": 1000, "overlap": 150}
+    source_files = resolve_pdf_paths(pdf_path)
+    status = build_status(persist_dir)
+    if status["exists"] and not status["complete"]:
+        print(f"Previous index build was interrupted "
+              f"({status['interrupted_files']} file(s) mid-way) — resuming")
+    stale = stale_sources(
+        source_files,
+        embed_model.model_name,
+        chunking,
+        persist_dir,
+        vector_backend,
+        vector_format,
+    )
+    if stale:
+        print(f"✓ {len(source_files)} PDF(s) found, {len(stale)} new/changed")
+    else:
+        print(f"✓ All {len(source_files)} PDF(s) already indexed — skipping parsing")
+    return ingest_pdfs(
+        stale,
+        embed_model,
+        persist_dir,
+        source_files=source_files,
+        chunking=chunking,
+        num_workers=num_workers,
+        batch_size=batch_size,
+        vector_backend=vector_backend,
+        vector_format=vector_format,
+    )
@@ -0,0 +1,74 @@
+"""
+lazy.py
+-------
+Deferred construction of expensive resources.
+
+Loading the embedding model imports PyTorch and sentence-transformers and
+reads the weights — seconds of work that a warm restart (everything
+already indexed, answers in the cache) may never need. A Lazy holds the
+factory instead and builds the object on first use. warm() starts the
+build in a background thread, so it overlaps with other start-up work
+(PDF parsing, opening the store) and is usually done before anyone asks:
+
+    model = Lazy(lambda: load_embedding_model(...), "embedding model").warm()
+    ...
+    model.get()     ← returns at once if the warm-up finished, else waits
+"""
+
+import threading
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """
+    Thread-safe, build-once holder for a value made by factory().
+
+    Exceptions raised by the factory are re-raised from every get(), also
+    when the build ran in the warm-up thread.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str = "resource"):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._built = False
+        self._value: T | None = None
+        self._error: BaseException | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def loaded(self) -> bool:
+        """True once the value exists (never blocks)."""
+        return self._built and self._error is None
+
+    def get(self) -> T:
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    try:
+                        self._value = self._factory()
+                    except BaseException as e:
+                        self._error = e
+                    self._built = True
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def warm(self) -> "Lazy[T]":
+        """Start building in a daemon thread (no-op if built or already warming)."""
+        with self._lock:
+            if self._built or self._thread is not None:
+                return self
+            self._thread = threading.Thread(
+                target=self._warm, name=f"warm-{self.name}", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def _warm(self) -> None:
+        try:
+            self.get()
+        except BaseException as e:
+            print(f"[Lazy] Warming the {self.name} failed: {e}")
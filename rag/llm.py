@@ -3,9 +3,20 @@ llm.py
 ------
 LLM setup supporting both Ollama (local) and OpenAI (cloud).
 Compatible with llama-index-llms-ollama and llama-index-llms-openai >= 0.1.x
+
+Ollama only loads a model's weights on the first request for it — several
+seconds for a 7B model on CPU, billed to whoever asks first. warm_llm()
+sends that first request in a background thread while the index is being
+built, and reports early if the Ollama server is not reachable.
 """
 
+import json
 import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
 from dotenv import load_dotenv
 from llama_index.core.llms import LLM
 
@@ -64,4 +75,43 @@ def get_llm(
     else:
         raise ValueError(
             f"Unknown provider '{provider}'. Use 'ollama' or 'openai'."
-        )
\ No newline at end of file
+        )
+
+
+def warm_llm(llm: LLM, keep_alive: str = "30m") -> threading.Thread | None:
+    """
+    Load an Ollama model into memory in a daemon thread.
+
+    An empty /api/generate request makes Ollama load the model and return
+    without generating anything. Other providers have nothing to warm.
+
+    Returns:
+        The warm-up thread (join() it to wait), or None if not an Ollama LLM.
+    """
+    base_url = getattr(llm, "base_url", None)
+    if base_url is None or type(llm).__name__ != "Ollama":
+        return None
+
+    def warm() -> None:
+        start = time.perf_counter()
+        body = json.dumps({"model": llm.model, "prompt": "", "keep_alive": keep_alive}).encode()
+        request = urllib.request.Request(
+            f"{base_url.rstrip('/')}/api/generate",
+            data=body,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=llm.request_timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            print(f"[LLM] Warm-up of '{llm.model}' failed: HTTP {e.code} "
+                  f"(is the model pulled? `ollama pull {llm.model}`)")
+            return
+        except (urllib.error.URLError, OSError) as e:
+            print(f"[LLM] Ollama not reachable at {base_url} ({e}) — is `ollama serve` running?")
+            return
+        print(f"[LLM] '{llm.model}' loaded in Ollama  ({time.perf_counter() - start:.1f}s, in background)")
+
+    thread = threading.Thread(target=warm, name=f"warm-{llm.model}", daemon=True)
+    thread.start()
+    return thread
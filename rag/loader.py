@@ -8,14 +8,83 @@ Supports:
     - Single PDF  : load_pdfs("docs/resume.pdf")
     - Multiple PDFs : load_pdfs(["docs/resume.pdf", "docs/report.pdf"])
     - Entire folder : load_pdfs("docs/")   ← loads every PDF in the folder
+    - In parallel   : load_pdfs("docs/", num_workers=8)   ← one process per file
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from llama_index.core import SimpleDirectoryReader
 from llama_index.core.schema import Document
+import multiprocessing
 import os
+import time
 
 
-def load_pdfs(pdf_input: str | list[str]) -> list[Document]:
+def resolve_pdf_paths(pdf_input: str | list[str]) -> list[str]:
+    """
+    Expand a pdf_input (file, folder or list of files) into PDF file paths.
+
+    Folders are scanned recursively for .pdf files (hidden files and folders
+    are skipped, like SimpleDirectoryReader does). Paths are returned sorted
+    so the page order is deterministic.
+
+    Args:
+        pdf_input: Same forms accepted by load_pdfs().
+
+    Returns:
+        List of PDF file paths.
+    """
+    if isinstance(pdf_input, list):
+        # Multiple explicit files
+        for path in pdf_input:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"PDF not found: '{path}'")
+        return list(pdf_input)
+
+    if os.path.isdir(pdf_input):
+        # Entire directory — picks up all .pdf files, also in sub-folders
+        paths = []
+        for root, dirs, files in os.walk(pdf_input):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if name.lower().endswith(".pdf") and not name.startswith("."):
+                    paths.append(os.path.join(root, name))
+        if not paths:
+            raise ValueError(f"No PDF files found in '{pdf_input}'")
+        return sorted(paths)
+
+    # Single file path (str)
+    if not os.path.exists(pdf_input):
+        raise FileNotFoundError(f"PDF not found: '{pdf_input}'")
+    return [pdf_input]
+
+
+def parse_pool(num_workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool for load_pdf_file. Workers are spawned, not forked: the
+    parent may be importing torch / loading the embedding model in a
+    background thread, and forking a process while another thread holds
+    import or OpenMP locks can deadlock the children.
+    """
+    return ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def load_pdf_file(path: str) -> tuple[list[Document], float]:
+    """
+    Parse a single PDF.
+
+    Top-level (picklable) so it can run in a worker process.
+
+    Returns:
+        (pages of this file in order, seconds spent parsing)
+    """
+    start = time.perf_counter()
+    docs = SimpleDirectoryReader(input_files=[path]).load_data()
+    return docs, time.perf_counter() - start
+
+
+def load_pdfs(pdf_input: str | list[str], num_workers: int = 1) -> list[Document]:
     """
     Load one or more PDF files and return a list of LlamaIndex Document objects.
 
@@ -29,45 +98,45 @@ def load_pdfs(pdf_input: str | list[str]) -> list[Document]:
             - str path to a single PDF      → "docs/resume.pdf"
             - str path to a folder          → "docs/"  (all PDFs loaded)
             - list of PDF paths             → ["docs/a.pdf", "docs/b.pdf"]
+        num_workers: Processes used to parse files in parallel
+                     (1 = serial, 0 = one per CPU core). Page order is the
+                     same either way.
 
     Returns:
         List of Document objects (pages across all PDFs).
     """
-    # ── Resolve input into a list of file paths or a directory ────────
+    # ── Resolve input into a list of file paths ───────────────────────
     if isinstance(pdf_input, list):
-        # Multiple explicit files
-        for path in pdf_input:
-            if not os.path.exists(path):
-                raise FileNotFoundError(f"PDF not found: '{path}'")
         print(f"Loading {len(pdf_input)} PDFs...")
-        reader = SimpleDirectoryReader(input_files=pdf_input)
-
     elif os.path.isdir(pdf_input):
-        # Entire directory — picks up all .pdf files automatically
         print(f"Loading all PDFs from folder: '{pdf_input}'...")
-        reader = SimpleDirectoryReader(
-            input_dir=pdf_input,
-            required_exts=[".pdf"],
-            recursive=True,          # also scan sub-folders
-        )
-
     else:
-        # Single file path (str)
-        if not os.path.exists(pdf_input):
-            raise FileNotFoundError(f"PDF not found: '{pdf_input}'")
         print(f"Loading PDF: '{pdf_input}'...")
-        reader = SimpleDirectoryReader(input_files=[pdf_input])
+    paths = resolve_pdf_paths(pdf_input)
 
-    docs = reader.load_data()
+    if num_workers == 0:
+        num_workers = os.cpu_count() or 1
+    num_workers = min(num_workers, len(paths))
+
+    # ── Parse files (serially or across a process pool) ──────────────
+    start = time.perf_counter()
+    if num_workers > 1:
+        print(f"Parsing {len(paths)} files with {num_workers} worker processes...")
+        with parse_pool(num_workers) as pool:
+            # map() yields results in input order → deterministic page order
+            results = list(pool.map(load_pdf_file, paths))
+    else:
+        results = [load_pdf_file(path) for path in paths]
+    elapsed = time.perf_counter() - start
 
-    # Print summary grouped by source file
-    sources: dict[str, int] = {}
-    for doc in docs:
-        fname = doc.metadata.get("file_name", "unknown")
-        sources[fname] = sources.get(fname, 0) + 1
+    docs: list[Document] = []
+    for file_docs, _ in results:
+        docs.extend(file_docs)
 
-    print(f"✓ Loaded {len(docs)} pages from {len(sources)} file(s):")
-    for fname, pages in sources.items():
-        print(f"    • {fname}  ({pages} pages)")
+    # Print summary per source file
+    total_pages = sum(len(file_docs) for file_docs, _ in results)
+    print(f"✓ Loaded {total_pages} pages from {len(paths)} file(s) in {elapsed:.1f}s:")
+    for path, (file_docs, seconds) in zip(paths, results):
+        print(f"    • {os.path.basename(path)}  ({len(file_docs)} pages, {seconds:.2f}s)")
 
-    return docs
\ No newline at end of file
+    return docs
@@ -0,0 +1,256 @@
+"""
+manifest.py
+-----------
+Records what is already embedded in the vector store so re-indexing only
+touches new or changed pages.
+
+The manifest is a small JSON file stored next to the Chroma data
+(chroma_db/index_manifest.json):
+
+    {
+        "embed_model": "BAAI/bge-small-en-v1.5",
+        "complete": true,              ← false while a build is in progress
+        "partial": {},                 ← committed ids of half-indexed files
+        "files": {
+            "/abs/path/docs/resume.pdf": {
+                "size": 48213, "mtime": 1718000000.0, "sha256": "...",
+                "pages": {
+                    "1": {"hash": "...", "node_ids": ["...", "..."]},
+                    "2": {"hash": "...", "node_ids": ["..."]}
+                }
+            }
+        }
+    }
+
+Pages are keyed by the `page_label` metadata that SimpleDirectoryReader
+attaches to every PDF page, so a single edited page only re-embeds its own
+chunks.
+
+Rewriting the whole manifest after every file would be O(corpus) per file,
+so writers checkpoint it periodically instead and, in between, append the
+node ids they are about to touch — and each batch once it is committed — to
+a small journal (chroma_db/index_journal.jsonl). After a crash the journal
+says exactly which files were mid-update and which of their batches made
+it into the store, so the next build resumes from the last committed batch.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+
+from llama_index.core.schema import BaseNode
+
+MANIFEST_NAME = "index_manifest.json"
+JOURNAL_NAME = "index_journal.jsonl"
+MANIFEST_VERSION = 1
+
+
+def new_manifest(embed_model_name: str) -> dict:
+    """Return an empty manifest for the given embedding model."""
+    return {
+        "version": MANIFEST_VERSION,
+        "embed_model": embed_model_name,
+        "complete": False,
+        "files": {},
+        "partial": {},
+    }
+
+
+def load_manifest(persist_dir: str) -> dict | None:
+    """
+    Load the manifest stored in persist_dir.
+
+    Returns:
+        The manifest dict, or None if it is missing or unreadable.
+    """
+    path = os.path.join(persist_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(persist_dir: str, manifest: dict) -> None:
+    """Write the manifest atomically (temp file + rename)."""
+    os.makedirs(persist_dir, exist_ok=True)
+    path = os.path.join(persist_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def manifest_node_count(manifest: dict) -> int:
+    """Total number of node ids recorded in the manifest (incl. partial files)."""
+    indexed = sum(
+        len(page["node_ids"])
+        for entry in manifest["files"].values()
+        for page in entry["pages"].values()
+    )
+    return indexed + sum(len(ids) for ids in manifest.get("partial", {}).values())
+
+
+def manifest_version(manifest: dict) -> str:
+    """
+    Fingerprint of the indexed content: changes whenever any page, the
+    embedding model or the chunking changes.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([manifest["embed_model"], manifest.get("chunking")]).encode("utf-8"))
+    for key in sorted(manifest["files"]):
+        for label, page in sorted(manifest["files"][key]["pages"].items()):
+            digest.update(f"{key}\x00{label}\x00{page['hash']}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+# ── Journal ───────────────────────────────────────────────────────────────────
+#
+# Two kinds of records, one JSON object per line:
+#   {"file": key, "node_ids": [...]}    ← intent: ids about to be deleted/added
+#   {"file": key, "committed": [...]}   ← a batch of those ids is now in the store
+
+def append_journal(
+    persist_dir: str,
+    key: str,
+    node_ids: list[str] | None = None,
+    committed: list[str] | None = None,
+) -> None:
+    """Append an intent or a committed-batch record (flushed to disk)."""
+    record: dict = {"file": key}
+    if node_ids is not None:
+        record["node_ids"] = node_ids
+    if committed is not None:
+        record["committed"] = committed
+    os.makedirs(persist_dir, exist_ok=True)
+    with open(os.path.join(persist_dir, JOURNAL_NAME), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_journal(persist_dir: str) -> dict[str, dict[str, set[str]]]:
+    """
+    Read the journal left by an interrupted writer.
+
+    Returns:
+        { file_key: {"intent": {node_id, ...}, "committed": {node_id, ...}} }
+        — empty if the last run finished cleanly.
+    """
+    path = os.path.join(persist_dir, JOURNAL_NAME)
+    if not os.path.exists(path):
+        return {}
+    touched: dict[str, dict[str, set[str]]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line from the crash
+            entry = touched.setdefault(record["file"], {"intent": set(), "committed": set()})
+            entry["intent"].update(record.get("node_ids", []))
+            entry["committed"].update(record.get("committed", []))
+    return touched
+
+
+def clear_journal(persist_dir: str) -> None:
+    """Drop the journal once the manifest has been checkpointed."""
+    path = os.path.join(persist_dir, JOURNAL_NAME)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# ── Hashing ───────────────────────────────────────────────────────────────────
+
+def file_key(path: str) -> str:
+    """Normalise a file path so the same PDF always maps to the same key."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str) -> dict:
+    """Size, mtime and content hash of a source file."""
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": hash_file(path),
+    }
+
+
+def file_changed(entry: dict, path: str) -> bool:
+    """
+    Check whether a file differs from its manifest entry.
+
+    Size and mtime are compared first; the content hash is only computed
+    when they differ (e.g. a file that was touched but not edited).
+    """
+    if not os.path.exists(path):
+        return True
+    stat = os.stat(path)
+    if stat.st_size == entry.get("size") and stat.st_mtime == entry.get("mtime"):
+        return False
+    return hash_file(path) != entry.get("sha256")
+
+
+def hash_page(nodes: list[BaseNode]) -> str:
+    """
+    Hash the chunks of one page.
+
+    Hashing the chunk texts (rather than the raw page) means a change in
+    chunk_size / overlap is also detected as a change.
+    """
+    digest = hashlib.sha256()
+    for node in nodes:
+        digest.update(node.get_content().encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def assign_stable_ids(key: str, label: str, nodes: list[BaseNode], page_hash: str) -> None:
+    """
+    Replace the splitter's random node ids with ids derived from
+    (file, page, position, page hash).
+
+    Re-parsing an unchanged page therefore yields the same ids, which is
+    what lets an interrupted build keep the batches it already committed.
+    Prev/next relationships between the nodes are remapped to the new ids.
+    """
+    new_ids = {}
+    for i, node in enumerate(nodes):
+        digest = hashlib.sha256(f"{key}\x00{label}\x00{i}\x00{page_hash}".encode("utf-8"))
+        new_ids[node.node_id] = str(uuid.UUID(hex=digest.hexdigest()[:32]))
+    for node in nodes:
+        node.id_ = new_ids[node.node_id]
+        for related in node.relationships.values():
+            if not isinstance(related, list) and related.node_id in new_ids:
+                related.node_id = new_ids[related.node_id]
+
+
+def group_nodes_by_page(nodes: list[BaseNode]) -> dict[str, dict[str, list[BaseNode]]]:
+    """
+    Group nodes by source file and page, preserving their original order.
+
+    Returns:
+        { file_key: { page_label: [node, ...] } }
+    """
+    groups: dict[str, dict[str, list[BaseNode]]] = {}
+    for node in nodes:
+        path = node.metadata.get("file_path") or node.metadata.get("file_name", "unknown")
+        page = str(node.metadata.get("page_label", node.metadata.get("page", "?")))
+        groups.setdefault(file_key(path), {}).setdefault(page, []).append(node)
+    return groups
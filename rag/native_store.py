@@ -0,0 +1,751 @@
+"""
+native_store.py
+---------------
+In-process vector store: memory-mapped NumPy vectors, optional HNSW graph.
+
+For a 100k-chunk corpus, Chroma's client start-up and per-query overhead
+cost more than the maths itself. NativeVectorStore keeps everything in
+flat files in <persist_dir>/native/ and searches in-process:
+
+    vectors.<gen>.npy     float32 or float16 rows (a valid .npy, memory-mapped)
+    nodes.<gen>.jsonl     one node (text + metadata) per row
+    offsets.<gen>.i64     byte offset of each row in nodes.jsonl
+    ids.<gen>.txt         node id of each row (read only for deletes / upserts)
+    hnsw-<n>.<gen>.bin    HNSW graph over the first n rows (float32 format)
+    codes.<gen>.u8        PQ codes, with codebooks.<gen>.npy (pq format)
+    meta.json             generation, committed row count, deleted rows, ...
+
+Opening a store reads meta.json and maps the files — no text is parsed —
+so cold start is near zero. Search depends on vector_format:
+
+    float32  one BLAS mat-vec over the mapped rows up to flat_limit rows;
+             past that an HNSW graph (hnswlib, if installed) plus an exact
+             scan of rows added since the graph was last built
+    float16  half the bytes; block-wise scan upcast to float32
+    pq       48 one-byte codes per 384-dim vector (32× smaller) scanned in
+             RAM; the best rescore_k rows are re-scored exactly against the
+             memory-mapped float16 vectors
+
+The float16 scan and the PQ codec live in compact_store.py; this module
+adds the files, memory mapping, tombstones and the HNSW graph around them.
+
+Files are append-only between commits. Rows past meta.json's count are
+ignored on load, so a crash never leaves half a batch visible. Deleted rows
+are tombstoned; once they exceed a quarter of the store, or the PQ
+codebooks are retrained, the live rows are rewritten as a new generation
+that only becomes current when meta.json is atomically replaced.
+Similarity is cosine (vectors are L2-normalised on add).
+
+Several stores can have the same folder open at once (Streamlit sessions,
+the CLI, a benchmark). Each registers the generation it has mapped in
+readers/, and a superseded generation is only deleted once no live reader
+holds it. An open store notices a newer meta.json on its next query and
+reloads, which releases the old generation.
+"""
+
+import json
+import os
+import struct
+import threading
+import uuid
+import weakref
+from typing import Any, Iterator
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+
+from rag.compact_store import (
+    COMPACT_FORMATS,
+    PQ_MIN_TRAIN,
+    SCAN_BLOCK,
+    ProductQuantizer,
+    scan_scores,
+    unit_rows,
+)
+
+NATIVE_DIR = "native"
+READERS_DIR = "readers"
+NATIVE_FORMATS = ("float32", *COMPACT_FORMATS)
+DEFAULT_FLAT_LIMIT = 20_000   # float32 rows searched by brute force before HNSW
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+_NPY_HEADER = 128             # fixed .npy header size, rewritten in place on commit
+
+
+def _npy_header(dtype: str, rows: int, dim: int) -> bytes:
+    """A version 1.0 .npy header padded to exactly _NPY_HEADER bytes."""
+    header = repr({"descr": np.dtype(dtype).str, "fortran_order": False, "shape": (rows, dim)})
+    header = header.ljust(_NPY_HEADER - 11) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def _hnswlib():
+    """hnswlib if installed, else None (float32 stores then always scan)."""
+    try:
+        import hnswlib
+    except ImportError:
+        return None
+    return hnswlib
+
+
+class NativeVectorStore(BasePydanticVectorStore):
+    """
+    LlamaIndex vector store over memory-mapped NumPy files.
+
+    Also implements the backend interface IndexWriter writes through
+    (count, delete_ids, clear, iter_texts, get_nodes, commit) — see
+    vector_store.VectorBackend. close() releases the instance's hold on
+    its generation early; otherwise that happens when it is collected.
+
+    One instance may be queried from several threads (sessions sharing an
+    index, batch mode): a reload after another store's commit swaps the
+    mapped state under _lock, which queries hold while they read it.
+
+    Args:
+        persist_dir:   Folder of the index; files go in <persist_dir>/native/.
+        vector_format: "float32", "float16" or "pq".
+        rescore_k:     PQ candidates re-scored exactly per query.
+        flat_limit:    float32 rows searched by brute force before an HNSW
+                       graph is built (needs hnswlib).
+    """
+
+    stores_text: bool = True
+    is_embedding_query: bool = True
+    label: str = "Native"
+    durable: bool = False        # rows are committed by commit(), not add()
+    persistent: bool = True
+
+    path: str
+    vector_format: str = "float32"
+    rescore_k: int = 100
+    flat_limit: int = DEFAULT_FLAT_LIMIT
+
+    _gen: int = PrivateAttr(default=0)
+    _dim: int | None = PrivateAttr(default=None)
+    _rows: int = PrivateAttr(default=0)
+    _deleted: set = PrivateAttr(default_factory=set)
+    _offsets: list = PrivateAttr(default_factory=lambda: [0])   # row starts + end
+    _ids: list | None = PrivateAttr(default=None)                # loaded lazily
+    _row_of: dict | None = PrivateAttr(default=None)
+    _vectors: Any = PrivateAttr(default=None)      # memmap over vectors.npy
+    _pq: Any = PrivateAttr(default=None)           # ProductQuantizer once trained
+    _codes: Any = PrivateAttr(default=None)        # (rows, m) uint8 in RAM
+    _trained_on: int = PrivateAttr(default=0)
+    _graph: Any = PrivateAttr(default=None)        # hnswlib.Index
+    _graph_rows: int = PrivateAttr(default=0)
+    _graph_live: int = PrivateAttr(default=0)
+    _reader: str | None = PrivateAttr(default=None)    # readers/<token> of this instance
+    _meta_stamp: Any = PrivateAttr(default=None)       # meta.json as last loaded / written
+    _dirty: bool = PrivateAttr(default=False)          # uncommitted adds / deletes
+    _appending: bool = PrivateAttr(default=False)      # files trimmed to the last commit
+    _ids_bytes: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr(default_factory=threading.RLock)   # mapped state vs. reload
+
+    def __init__(
+        self,
+        persist_dir: str,
+        vector_format: str = "float32",
+        rescore_k: int = 100,
+        flat_limit: int = DEFAULT_FLAT_LIMIT,
+    ):
+        if vector_format not in NATIVE_FORMATS:
+            raise ValueError(f"Unknown vector format '{vector_format}'. Use one of {NATIVE_FORMATS}.")
+        super().__init__(
+            path=os.path.join(persist_dir, NATIVE_DIR),
+            vector_format=vector_format,
+            rescore_k=rescore_k,
+            flat_limit=flat_limit,
+        )
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NativeVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @property
+    def vector_store(self) -> "NativeVectorStore":
+        return self
+
+    @staticmethod
+    def stored_count(persist_dir: str) -> int | None:
+        """Live vectors in a persisted store, read from meta.json only."""
+        meta = _read_meta(os.path.join(persist_dir, NATIVE_DIR))
+        return None if meta is None else meta["rows"] - len(meta["deleted"])
+
+    @property
+    def _dtype(self) -> str:
+        return "float32" if self.vector_format == "float32" else "float16"
+
+    # ── Files ────────────────────────────────────────────────────────
+
+    def _file(self, name: str) -> str:
+        """Path of a data file ("vectors.npy", ...) in the current generation."""
+        stem, ext = name.split(".", 1)
+        return os.path.join(self.path, f"{stem}.{self._gen}.{ext}")
+
+    def _graph_file(self) -> str:
+        return self._file(f"hnsw-{self._graph_rows}.bin")
+
+    def _current_files(self) -> set[str]:
+        names = ["vectors.npy", "nodes.jsonl", "offsets.i64", "ids.txt", "codes.u8", "codebooks.npy"]
+        files = {self._file(name) for name in names}
+        if self._graph_rows:
+            files.add(self._graph_file())
+        return files
+
+    def _drop_stale_files(self) -> None:
+        """
+        Remove files of superseded (or never committed) generations and
+        graphs, except generations another open store still reads.
+        """
+        keep = self._current_files() | {os.path.join(self.path, "meta.json")}
+        held = _held_generations(self.path) - {self._gen}
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if path in keep or not os.path.isfile(path):
+                continue
+            parts = name.split(".")
+            if len(parts) == 3 and parts[1].isdigit() and int(parts[1]) in held:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass   # still mapped (Windows); removed on a later open
+
+    def _register(self) -> None:
+        """Record in readers/ which generation this instance has mapped."""
+        if self._reader is None:
+            folder = os.path.join(self.path, READERS_DIR)
+            os.makedirs(folder, exist_ok=True)
+            self._reader = os.path.join(folder, uuid.uuid4().hex)
+            try:
+                weakref.finalize(self, _unregister, self._reader)
+            except TypeError:
+                pass   # not weak-referenceable: close() or the pid check cleans up
+        tmp = self._reader + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f"{os.getpid()} {self._gen}")
+        os.replace(tmp, self._reader)
+
+    def close(self) -> None:
+        """Release this instance's hold on its generation."""
+        if self._reader is not None:
+            _unregister(self._reader)
+            self._reader = None
+
+    def _refresh(self) -> None:
+        """Reload if another store committed since (never with uncommitted writes)."""
+        with self._lock:
+            if self._dirty:
+                return
+            stamp = _meta_stamp(self.path)
+            if stamp is not None and stamp != self._meta_stamp:
+                self._load(reload=True)
+
+    def _load(self, reload: bool = False) -> None:
+        """
+        Map the committed state described by meta.json. Bytes appended
+        after the last commit are ignored here, and only trimmed by the
+        first add() — a live writer in another process may still own them.
+        """
+        with self._lock:
+            stamp = _meta_stamp(self.path)
+            meta = _read_meta(self.path)
+            if meta is None or meta.get("format") != self.vector_format:
+                if reload:
+                    return   # switched format or mid-reset: keep serving what is mapped
+                self._gen = meta.get("gen", 0) if meta else 0
+                self._reset_files()
+                return
+            self._vectors = self._graph = None
+            self._gen = meta["gen"]
+            self._register()
+            self._meta_stamp = stamp
+            self._dirty = self._appending = False
+            self._ids_bytes = meta["ids_bytes"]
+            self._dim = meta["dim"]
+            self._rows = meta["rows"]
+            self._deleted = set(meta["deleted"])
+            self._trained_on = meta["trained_on"]
+            self._graph_rows = self._graph_live = meta["graph_rows"]
+            self._ids = self._row_of = None
+            self._drop_stale_files()
+
+            offsets = np.fromfile(self._file("offsets.i64"), dtype=np.int64, count=self._rows)
+            self._offsets = offsets.tolist() + [meta["nodes_bytes"]]
+
+            self._pq = self._codes = None
+            if self._trained_on:
+                self._pq = ProductQuantizer.load(self._file("codebooks.npy"))
+                m = self._pq.m
+                codes = np.fromfile(self._file("codes.u8"), dtype=np.uint8, count=self._rows * m)
+                self._codes = codes.reshape(self._rows, m)
+            self._map_vectors()
+            if self._graph_rows:
+                self._load_graph()
+
+    def _trim_uncommitted(self) -> None:
+        """Drop bytes appended after the last commit (a crashed writer's) before appending."""
+        _truncate(self._file("nodes.jsonl"), self._offsets[-1])
+        _truncate(self._file("offsets.i64"), self._rows * 8)
+        _truncate(self._file("ids.txt"), self._ids_bytes)
+        if self._dim:
+            itemsize = np.dtype(self._dtype).itemsize
+            _truncate(self._file("vectors.npy"), _NPY_HEADER + self._rows * self._dim * itemsize)
+        if self._pq is not None:
+            _truncate(self._file("codes.u8"), self._rows * self._pq.m)
+        self._appending = True
+
+    def _reset_files(self) -> None:
+        self._vectors = self._graph = None
+        self._gen += 1
+        self._register()   # before its files exist, so no other store deletes them
+        self._dirty = False
+        self._appending = True
+        for name in ("vectors.npy", "nodes.jsonl", "offsets.i64", "ids.txt", "codes.u8"):
+            open(self._file(name), "wb").close()
+        self._dim, self._rows, self._trained_on = None, 0, 0
+        self._graph_rows = self._graph_live = 0
+        self._deleted, self._offsets = set(), [0]
+        self._ids, self._row_of = [], {}
+        self._pq = self._codes = None
+        self._write_meta()
+        self._drop_stale_files()
+
+    def _map_vectors(self) -> None:
+        if self._rows and self._dim:
+            self._vectors = np.memmap(
+                self._file("vectors.npy"),
+                dtype=self._dtype,
+                mode="r",
+                offset=_NPY_HEADER,
+                shape=(self._rows, self._dim),
+            )
+        else:
+            self._vectors = None
+
+    def _load_graph(self) -> None:
+        hnswlib = _hnswlib()
+        if hnswlib is None or not os.path.exists(self._graph_file()):
+            self._graph, self._graph_rows = None, 0
+            return
+        graph = hnswlib.Index(space="ip", dim=self._dim)
+        graph.load_index(self._graph_file(), max_elements=self._graph_rows)
+        self._graph_live = self._graph_rows
+        for row in self._deleted:
+            if row < self._graph_rows:
+                graph.mark_deleted(row)
+                self._graph_live -= 1
+        self._graph = graph
+
+    def _write_meta(self) -> None:
+        meta = {
+            "gen": self._gen,
+            "format": self.vector_format,
+            "dim": self._dim,
+            "rows": self._rows,
+            "deleted": sorted(self._deleted),
+            "nodes_bytes": self._offsets[-1],
+            "ids_bytes": os.path.getsize(self._file("ids.txt")),
+            "trained_on": self._trained_on,
+            "graph_rows": self._graph_rows,
+        }
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        self._meta_stamp = _meta_stamp(self.path)
+        self._ids_bytes = meta["ids_bytes"]
+
+    # ── Backend interface ────────────────────────────────────────────
+
+    def count(self) -> int:
+        return self._rows - len(self._deleted)
+
+    def clear(self) -> None:
+        self._reset_files()
+
+    def commit(self, complete: bool = False) -> None:
+        """
+        Make appended rows and tombstones durable. Compacts / retrains PQ
+        when due; with complete=True also brings the HNSW graph up to date.
+        """
+        if self._dim:
+            with open(self._file("vectors.npy"), "r+b") as f:
+                f.write(_npy_header(self._dtype, self._rows, self._dim))
+        for name in ("vectors.npy", "nodes.jsonl", "offsets.i64", "ids.txt", "codes.u8"):
+            with open(self._file(name), "ab") as f:
+                os.fsync(f.fileno())
+
+        live = self.count()
+        rewrite = bool(self._deleted) and len(self._deleted) * 4 > self._rows
+        retrain = self.vector_format == "pq" and live >= PQ_MIN_TRAIN and live > 4 * self._trained_on
+        if rewrite or retrain:
+            self._rewrite(retrain)
+        graph = (
+            complete
+            and self.vector_format == "float32"
+            and live > self.flat_limit
+            and self._rows > self._graph_rows
+            and _hnswlib() is not None
+        )
+        if graph:
+            self._extend_graph()
+        self._write_meta()
+        self._dirty = False
+        if rewrite or retrain or graph:
+            self._drop_stale_files()
+
+    def persist(self, persist_path: str | None = None, fs: Any = None) -> None:
+        self.commit()
+
+    def delete_ids(self, node_ids: list[str]) -> None:
+        row_of = self._id_map()
+        self._dirty = True
+        for node_id in node_ids:
+            row = row_of.pop(node_id, None)
+            if row is not None:
+                self._deleted.add(row)
+                if row < self._graph_rows and self._graph is not None:
+                    self._graph.mark_deleted(row)
+                    self._graph_live -= 1
+
+    def iter_texts(self, batch_size: int = 2000) -> Iterator[tuple[list[str], list[str]]]:
+        """Yield (ids, texts) of every live node, batch by batch."""
+        ids, texts = [], []
+        with open(self._file("nodes.jsonl"), "rb") as f:
+            for row in range(self._rows):
+                record = json.loads(f.readline())
+                if row in self._deleted:
+                    continue
+                ids.append(record["id"])
+                texts.append(record["text"])
+                if len(ids) >= batch_size:
+                    yield ids, texts
+                    ids, texts = [], []
+        if ids:
+            yield ids, texts
+
+    def get_nodes(self, node_ids: list[str] | None = None, filters: Any = None) -> list[BaseNode]:
+        with self._lock:
+            self._refresh()
+            row_of = self._id_map()
+            return self._read_nodes([row_of[i] for i in (node_ids or []) if i in row_of])
+
+    def footprint(self) -> dict:
+        """Bytes on disk and held in RAM for search, vs. plain float32."""
+        disk = sum(os.path.getsize(path) for path in self._current_files() if os.path.exists(path))
+        n, dim = self.count(), self._dim or 0
+        vector_bytes = self._rows * dim * np.dtype(self._dtype).itemsize
+        if self._codes is not None:
+            resident = self._codes.nbytes + self._pq.nbytes
+        else:
+            resident = vector_bytes
+        if self._graph_rows:
+            resident = os.path.getsize(self._graph_file())
+        label = self.vector_format
+        if self.vector_format == "pq" and self._codes is None:
+            label = "pq (untrained, float16 scan)"
+        elif self._graph is not None:
+            label = "float32 + hnsw"
+        return {
+            "vectors": n,
+            "format": label,
+            "float32_bytes": n * dim * 4,
+            "vector_bytes": vector_bytes + (self._codes.nbytes if self._codes is not None else 0),
+            "resident_bytes": resident,
+            "disk_bytes": disk,
+        }
+
+    # ── VectorStore interface ────────────────────────────────────────
+
+    def add(self, nodes: list[BaseNode], **add_kwargs: Any) -> list[str]:
+        if not nodes:
+            return []
+        if not self._appending:
+            self._trim_uncommitted()
+        self._dirty = True
+        vectors = unit_rows(np.asarray([n.get_embedding() for n in nodes], dtype=np.float32))
+        if self._dim is None:
+            self._dim = vectors.shape[1]
+            with open(self._file("vectors.npy"), "wb") as f:
+                f.write(_npy_header(self._dtype, 0, self._dim))
+        self.delete_ids([n.node_id for n in nodes])   # upsert
+
+        starts = []
+        with open(self._file("nodes.jsonl"), "ab") as f:
+            for node in nodes:
+                line = (json.dumps({
+                    "id": node.node_id,
+                    "text": node.get_content(metadata_mode=MetadataMode.NONE),
+                    "meta": node_to_metadata_dict(node, remove_text=True, flat_metadata=False),
+                }) + "\n").encode("utf-8")
+                f.write(line)
+                starts.append(self._offsets[-1])
+                self._offsets.append(self._offsets[-1] + len(line))
+        with open(self._file("offsets.i64"), "ab") as f:
+            f.write(np.asarray(starts, dtype=np.int64).tobytes())
+        with open(self._file("ids.txt"), "ab") as f:
+            f.write("".join(n.node_id + "\n" for n in nodes).encode("utf-8"))
+        with open(self._file("vectors.npy"), "ab") as f:
+            f.write(vectors.astype(self._dtype).tobytes())
+        if self._pq is not None:
+            codes = self._pq.encode(vectors)
+            with open(self._file("codes.u8"), "ab") as f:
+                f.write(codes.tobytes())
+            self._codes = np.concatenate([self._codes, codes])
+
+        for node in nodes:
+            self._row_of[node.node_id] = self._rows
+            self._ids.append(node.node_id)
+            self._rows += 1
+        self._map_vectors()
+        return [n.node_id for n in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        """Delete every node of one source document."""
+        doomed = []
+        with open(self._file("nodes.jsonl"), "rb") as f:
+            for row in range(self._rows):
+                record = json.loads(f.readline())
+                if row not in self._deleted and record["meta"].get("ref_doc_id") == ref_doc_id:
+                    doomed.append(record["id"])
+        self.delete_ids(doomed)
+
+    def delete_nodes(self, node_ids: list[str] | None = None, filters: Any = None, **kwargs: Any) -> None:
+        self.delete_ids(node_ids or [])
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("NativeVectorStore does not support metadata filters")
+        with self._lock:
+            self._refresh()
+            top_k = min(query.similarity_top_k, self.count())
+            if not top_k or query.query_embedding is None:
+                return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+            q = unit_rows(np.asarray([query.query_embedding], dtype=np.float32))[0]
+
+            if self._codes is not None:
+                # Approximate scan over PQ codes, exact re-score of the best rows
+                candidates, _ = self._best(self._pq.scores(self._codes, q), 0, max(self.rescore_k, top_k))
+                exact = self._vectors[candidates].astype(np.float32) @ q
+                order = np.argsort(-exact)[:top_k]
+                rows, scores = candidates[order], exact[order]
+            elif self._graph is not None:
+                # Graph search over the indexed rows, exact scan of the tail
+                k = min(top_k, self._graph_live)
+                found_rows, found_scores = np.empty(0, np.int64), np.empty(0, np.float32)
+                if k:
+                    self._graph.set_ef(max(64, 2 * k))
+                    labels, distances = self._graph.knn_query(q, k=k)
+                    found_rows, found_scores = labels[0].astype(np.int64), 1.0 - distances[0]
+                if self._rows > self._graph_rows:
+                    tail_rows, tail_scores = self._best(self._scan(q, self._graph_rows), self._graph_rows, top_k)
+                    found_rows = np.concatenate([found_rows, tail_rows])
+                    found_scores = np.concatenate([found_scores, tail_scores])
+                order = np.argsort(-found_scores)[:top_k]
+                rows, scores = found_rows[order], found_scores[order]
+            else:
+                rows, scores = self._best(self._scan(q), 0, top_k)
+
+            nodes = self._read_nodes([int(row) for row in rows])
+            return VectorStoreQueryResult(
+                nodes=nodes,
+                similarities=[float(s) for s in scores],
+                ids=[n.node_id for n in nodes],
+            )
+
+    # ── Internals ────────────────────────────────────────────────────
+
+    def _id_map(self) -> dict:
+        """node id → row of live rows (read from ids.txt on first use)."""
+        if self._row_of is None:
+            with open(self._file("ids.txt"), "r", encoding="utf-8") as f:
+                self._ids = [next(f).rstrip("\n") for _ in range(self._rows)]
+            self._row_of = {i: row for row, i in enumerate(self._ids) if row not in self._deleted}
+        return self._row_of
+
+    def _scan(self, q: np.ndarray, start: int = 0) -> np.ndarray:
+        """Exact scores of rows start.. (float32 rows straight through BLAS)."""
+        if self.vector_format == "float32":
+            return self._vectors[start:] @ q
+        return scan_scores(self._vectors, q, start)
+
+    def _best(self, scores: np.ndarray, offset: int, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Top k (rows, scores) of scores for rows offset.., skipping deleted rows."""
+        if self._deleted:
+            scores = np.array(scores, copy=True)
+            dead = np.fromiter(self._deleted, dtype=np.int64) - offset
+            scores[dead[(dead >= 0) & (dead < len(scores))]] = -np.inf
+        k = min(k, len(scores))
+        if not k:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        best = best[np.isfinite(scores[best])]
+        return best + offset, scores[best]
+
+    def _read_nodes(self, rows: list[int]) -> list[BaseNode]:
+        nodes = []
+        with open(self._file("nodes.jsonl"), "rb") as f:
+            for row in rows:
+                f.seek(self._offsets[row])
+                record = json.loads(f.read(self._offsets[row + 1] - self._offsets[row]))
+                node = metadata_dict_to_node(record["meta"])
+                node.set_content(record["text"])
+                nodes.append(node)
+        return nodes
+
+    def _extend_graph(self) -> None:
+        """Add rows past graph_rows to the HNSW graph and save it."""
+        hnswlib = _hnswlib()
+        if self._graph is None:
+            self._graph = hnswlib.Index(space="ip", dim=self._dim)
+            self._graph.init_index(max_elements=self._rows, M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION)
+            self._graph_rows = self._graph_live = 0
+        else:
+            self._graph.resize_index(self._rows)
+        print(f"[Native] Indexing {self._rows - self._graph_rows} vectors into the HNSW graph...")
+        for lo in range(self._graph_rows, self._rows, SCAN_BLOCK):
+            hi = min(lo + SCAN_BLOCK, self._rows)
+            self._graph.add_items(np.asarray(self._vectors[lo:hi]), np.arange(lo, hi))
+        self._graph_live += self._rows - self._graph_rows
+        for row in self._deleted:
+            if row >= self._graph_rows:
+                self._graph.mark_deleted(row)
+                self._graph_live -= 1
+        self._graph_rows = self._rows
+        self._graph.save_index(self._graph_file())
+
+    def _rewrite(self, retrain: bool) -> None:
+        """
+        Write the live rows as the next generation, dropping tombstones and
+        (with retrain) re-encoding them with freshly trained PQ codebooks.
+        The new files only count once commit() writes meta.json.
+        """
+        self._id_map()
+        keep = np.array([row for row in range(self._rows) if row not in self._deleted], dtype=np.int64)
+        vectors = np.asarray(self._vectors[keep]) if len(keep) else np.empty((0, self._dim), self._dtype)
+        records = []
+        with open(self._file("nodes.jsonl"), "rb") as f:
+            for row in range(self._rows):
+                line = f.readline()
+                if row not in self._deleted:
+                    records.append(line)
+        if retrain:
+            print(f"[Native] Training PQ codebooks on {len(vectors)} vectors...")
+            self._pq = ProductQuantizer.train(vectors)
+            self._trained_on = len(vectors)
+            codes = self._pq.encode(vectors)
+        else:
+            codes = self._codes[keep] if self._codes is not None else None
+        ids = [self._ids[row] for row in keep]
+        offsets = [0]
+        for line in records:
+            offsets.append(offsets[-1] + len(line))
+
+        self._vectors = self._graph = None
+        self._gen += 1
+        self._register()   # before its files exist, so no other store deletes them
+        with open(self._file("vectors.npy"), "wb") as f:
+            f.write(_npy_header(self._dtype, len(keep), self._dim))
+            f.write(vectors.tobytes())
+        with open(self._file("nodes.jsonl"), "wb") as f:
+            f.writelines(records)
+        np.asarray(offsets[:-1], dtype=np.int64).tofile(self._file("offsets.i64"))
+        with open(self._file("ids.txt"), "w", encoding="utf-8") as f:
+            f.write("".join(i + "\n" for i in ids))
+        if codes is not None:
+            codes.tofile(self._file("codes.u8"))
+            self._pq.save(self._file("codebooks.npy"))
+        else:
+            open(self._file("codes.u8"), "wb").close()
+        for name in ("vectors.npy", "nodes.jsonl", "offsets.i64", "ids.txt", "codes.u8"):
+            with open(self._file(name), "ab") as f:
+                os.fsync(f.fileno())
+
+        self._codes = codes
+        self._ids = ids
+        self._row_of = {node_id: row for row, node_id in enumerate(ids)}
+        self._offsets = offsets
+        self._rows, self._deleted = len(keep), set()
+        self._graph_rows = self._graph_live = 0   # rows renumbered: rebuilt on the next complete commit
+        self._map_vectors()
+
+
+def _meta_stamp(path: str) -> tuple | None:
+    """Identity of the current meta.json (os.replace gives each commit a new inode)."""
+    try:
+        stat = os.stat(os.path.join(path, "meta.json"))
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid() or os.name == "nt":
+        # On Windows os.kill would terminate the process; mapped files
+        # cannot be deleted there anyway
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _held_generations(path: str) -> set[int]:
+    """Generations registered by live readers; files of dead processes are removed."""
+    folder = os.path.join(path, READERS_DIR)
+    held = set()
+    for name in os.listdir(folder) if os.path.isdir(folder) else []:
+        if name.endswith(".tmp"):
+            continue
+        reader = os.path.join(folder, name)
+        try:
+            with open(reader, "r", encoding="utf-8") as f:
+                pid, gen = (int(x) for x in f.read().split())
+        except (OSError, ValueError):
+            continue
+        if _pid_alive(pid):
+            held.add(gen)
+        else:
+            _unregister(reader)
+    return held
+
+
+def _unregister(reader: str) -> None:
+    try:
+        os.remove(reader)
+    except OSError:
+        pass
+
+
+def _read_meta(path: str) -> dict | None:
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _truncate(path: str, size: int) -> None:
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as f:
+            f.truncate(size)
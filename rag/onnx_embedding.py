@@ -0,0 +1,271 @@
+"""
+onnx_embedding.py
+-----------------
+int8-quantized ONNX Runtime backend for the embedding model.
+
+Embedding is the slowest stage of ingestion on CPU. This backend exports
+the HuggingFace encoder to ONNX once, applies dynamic int8 quantization
+to its weights and serves it from an onnxruntime InferenceSession with a
+configurable number of intra-op threads:
+
+    .rag_cache/onnx/BAAI--bge-small-en-v1.5/model.onnx        ← fp32 export
+    .rag_cache/onnx/BAAI--bge-small-en-v1.5/model-int8.onnx   ← quantized
+
+Pooling and normalisation follow HuggingFaceEmbedding for BGE (CLS token,
+L2-normalised, query instruction prepended), so the vectors match the
+PyTorch ones up to quantization error. On export, a parity check against
+the PyTorch model is printed (mean / min cosine similarity).
+
+Needs the optional packages onnxruntime and onnx (see requirements.txt).
+
+    embed_model = OnnxEmbedding("BAAI/bge-small-en-v1.5", num_threads=4)
+"""
+
+import os
+from typing import Any
+
+import numpy as np
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from rag.embed_cache import CACHE_DIR
+from rag.embedder import onnx_model_id
+
+ONNX_DIR = os.path.join(CACHE_DIR, "onnx")
+MAX_LENGTH = 512
+PARITY_TEXTS = [
+    "The contract renews automatically unless cancelled 30 days in advance.",
+    "Quarterly revenue grew 12% driven by enterprise customers.",
+    "What are the key skills listed in the resume?",
+    "Part PN-48213-K is out of stock until the next delivery.",
+]
+
+# Instruction prefixes as in llama_index.embeddings.huggingface.utils. That
+# module is not imported: it loads the package __init__ and with it
+# sentence-transformers and torch, which ONNX workers must not pay for.
+BGE_MODELS = (
+    "BAAI/bge-small-en",
+    "BAAI/bge-small-en-v1.5",
+    "BAAI/bge-base-en",
+    "BAAI/bge-base-en-v1.5",
+    "BAAI/bge-large-en",
+    "BAAI/bge-large-en-v1.5",
+    "BAAI/bge-small-zh",
+    "BAAI/bge-small-zh-v1.5",
+    "BAAI/bge-base-zh",
+    "BAAI/bge-base-zh-v1.5",
+    "BAAI/bge-large-zh",
+    "BAAI/bge-large-zh-v1.5",
+)
+INSTRUCTOR_MODELS = (
+    "hku-nlp/instructor-base",
+    "hku-nlp/instructor-large",
+    "hku-nlp/instructor-xl",
+    "hkunlp/instructor-base",
+    "hkunlp/instructor-large",
+    "hkunlp/instructor-xl",
+)
+INSTRUCTOR_TEXT_INSTRUCTION = "Represent the document for retrieval: "
+INSTRUCTOR_QUERY_INSTRUCTION = "Represent the question for retrieving supporting documents: "
+BGE_QUERY_INSTRUCTION_EN = "Represent this question for searching relevant passages: "
+BGE_QUERY_INSTRUCTION_ZH = "为这个句子生成表示以用于检索相关文章："
+
+
+def query_instruction_for(model_name: str) -> str:
+    """Prefix HuggingFaceEmbedding puts before queries for this model."""
+    if model_name in INSTRUCTOR_MODELS:
+        return INSTRUCTOR_QUERY_INSTRUCTION
+    if model_name in BGE_MODELS:
+        return BGE_QUERY_INSTRUCTION_ZH if "zh" in model_name else BGE_QUERY_INSTRUCTION_EN
+    return ""
+
+
+def text_instruction_for(model_name: str) -> str:
+    """Prefix HuggingFaceEmbedding puts before documents for this model."""
+    return INSTRUCTOR_TEXT_INSTRUCTION if model_name in INSTRUCTOR_MODELS else ""
+
+
+def _with_instruction(instruction: str | None, text: str) -> str:
+    # strip(): an empty instruction adds nothing, as in HuggingFaceEmbedding
+    return f"{instruction or ''} {text}".strip()
+
+
+def _require_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError(
+            "The ONNX embedding backend needs onnxruntime and onnx:\n"
+            "  pip install onnxruntime onnx"
+        ) from e
+    return onnxruntime
+
+
+def _cls_pool(last_hidden_state: np.ndarray) -> np.ndarray:
+    vectors = last_hidden_state[:, 0]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def export_onnx(model_name: str, out_dir: str | None = None, quantize: bool = True) -> str:
+    """
+    Export model_name to ONNX (and int8-quantize it) unless already done.
+
+    Returns:
+        Path of the model file to load (the int8 one when quantize=True).
+    """
+    out_dir = out_dir or os.path.join(ONNX_DIR, model_name.replace("/", "--"))
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    int8_path = os.path.join(out_dir, "model-int8.onnx")
+    target = int8_path if quantize else fp32_path
+    if os.path.exists(target):
+        return target
+
+    _require_onnxruntime()
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    if not os.path.exists(fp32_path):
+        print(f"[ONNX] Exporting '{model_name}'...")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        tokenizer.save_pretrained(out_dir)
+        model = AutoModel.from_pretrained(model_name).eval()
+        dummy = tokenizer(["export example"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+        dynamic = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(dummy[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic,
+                opset_version=17,
+            )
+
+    if quantize:
+        print("[ONNX] Quantizing weights to int8...")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    parity = parity_check(OnnxEmbedding(model_name, model_path=target, quantize=quantize), model_name)
+    print(f"[ONNX] Parity vs PyTorch: mean cosine {parity['mean_cosine']:.4f}, "
+          f"min {parity['min_cosine']:.4f}")
+    if parity["min_cosine"] < 0.99:
+        print("[ONNX] Warning: vectors differ noticeably from PyTorch — "
+              "consider --embed-backend torch")
+    return target
+
+
+def parity_check(embed_model: BaseEmbedding, model_name: str, texts: list[str] | None = None) -> dict:
+    """
+    Compare embed_model's document vectors with the PyTorch
+    HuggingFaceEmbedding for the same model.
+
+    Returns:
+        {"mean_cosine": float, "min_cosine": float, "texts": int}
+    """
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    texts = texts or PARITY_TEXTS
+    reference = HuggingFaceEmbedding(model_name=model_name, device="cpu")
+    expected = np.asarray(reference.get_text_embedding_batch(texts))
+    actual = np.asarray(embed_model.get_text_embedding_batch(texts))
+    cosines = np.sum(expected * actual, axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    return {
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "texts": len(texts),
+    }
+
+
+class OnnxEmbedding(BaseEmbedding):
+    """
+    BaseEmbedding served by an onnxruntime session (int8 by default).
+
+    Args:
+        model_name:  HuggingFace model name (exported on first use). The
+                     embedding's own model_name is onnx_model_id(model_name).
+        model_path:  Existing .onnx file (skips export_onnx).
+        num_threads: intra-op threads (None → onnxruntime default, all cores).
+        quantize:    Use the int8 model instead of the fp32 export.
+        embed_batch_size: Texts per session run.
+    """
+
+    source_model: str = Field(description="HuggingFace model the ONNX file was exported from.")
+    num_threads: int | None = Field(default=None, description="onnxruntime intra-op threads.")
+    quantize: bool = Field(default=True, description="Serve the int8-quantized model.")
+    query_instruction: str | None = Field(default=None)
+    text_instruction: str | None = Field(default=None)
+
+    _session: Any = PrivateAttr()
+    _tokenizer: Any = PrivateAttr()
+    _input_names: list = PrivateAttr()
+
+    def __init__(
+        self,
+        model_name: str,
+        model_path: str | None = None,
+        num_threads: int | None = None,
+        quantize: bool = True,
+        embed_batch_size: int = 32,
+        **kwargs: Any,
+    ):
+        super().__init__(
+            model_name=onnx_model_id(model_name, quantize),
+            source_model=model_name,
+            num_threads=num_threads,
+            quantize=quantize,
+            embed_batch_size=embed_batch_size,
+            query_instruction=query_instruction_for(model_name),
+            text_instruction=text_instruction_for(model_name),
+            **kwargs,
+        )
+        ort = _require_onnxruntime()
+        from transformers import AutoTokenizer
+
+        model_path = model_path or export_onnx(model_name, quantize=quantize)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = [i.name for i in self._session.get_inputs()]
+        self._tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(model_path))
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OnnxEmbedding"
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        encoded = self._tokenizer(
+            texts, padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self._input_names if name in encoded}
+        if "token_type_ids" in self._input_names and "token_type_ids" not in feeds:
+            feeds["token_type_ids"] = np.zeros_like(feeds["input_ids"])
+        last_hidden_state = self._session.run(["last_hidden_state"], feeds)[0]
+        return _cls_pool(last_hidden_state).tolist()
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self._embed([_with_instruction(self.query_instruction, query)])[0]
+
+    def _get_query_embeddings(self, queries: list[str]) -> list[list[float]]:
+        return self._embed([_with_instruction(self.query_instruction, q) for q in queries])
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return self._embed([_with_instruction(self.text_instruction, t) for t in texts])
@@ -2,18 +2,45 @@
 pipeline.py
 -----------
 Orchestrates the full LlamaIndex RAG pipeline with conversation memory.
+
+The pipeline owns the shared resources (index, retriever, embedding model,
+LLM, answer cache). Conversations live in ChatSessions (sessions.py): the pipeline has
+its own default session, and `pipeline.sessions` hands out more of them
+for multi-user serving without loading anything twice.
+
+Several pipelines (e.g. different retrieval settings in a web app) can
+also share one embedding model and LLM client by passing them in as
+embed_model= / llm= instead of letting each pipeline load its own.
 """
 
-from llama_index.core import Settings
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, Iterator
+
+from llama_index.core import Settings, VectorStoreIndex
 from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.chat_engine import CondensePlusContextChatEngine
-from llama_index.core.llms import ChatMessage
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.llms import LLM, ChatMessage
 
-from rag.loader import load_pdfs
-from rag.splitter import split_documents
-from rag.embedder import get_embeddings
-from rag.vector_store import build_vector_store, get_retriever
-from rag.llm import get_llm
+from rag import tracing
+from rag.answer_cache import AnswerCache
+from rag.batch import DEFAULT_CONCURRENCY, run_batch
+from rag.compress import DEFAULT_TOKEN_BUDGET, ContextCompressor
+from rag.embed_cache import CachedEmbedding
+from rag.bm25 import BM25Index
+from rag.embedder import DEFAULT_MODEL, get_embeddings
+from rag.ingest import index_pdfs
+from rag.vector_store import (
+    CHROMA_DIR,
+    DEFAULT_BATCH_SIZE,
+    get_retriever,
+    index_version,
+)
+from rag.llm import get_llm, warm_llm
+from rag.rerank import DEFAULT_RERANK_CANDIDATES, DEFAULT_RERANK_MODEL, CrossEncoderReranker
+from rag.sessions import ChatSession, SessionManager
 
 
 class RAGPipeline:
@@ -24,6 +51,10 @@ class RAGPipeline:
         pipeline = RAGPipeline(pdf_path="docs/resume.pdf")
         pipeline = RAGPipeline(pdf_path=["docs/a.pdf", "docs/b.pdf"])
         pipeline = RAGPipeline(pdf_path="docs/")
+
+    Serving several users from one pipeline:
+        pipeline.sessions.get("alice").ask("...")
+        pipeline.sessions.get("bob").ask("...")
     """
 
     def __init__(
@@ -35,40 +66,207 @@ class RAGPipeline:
         provider: str = "ollama",
         model: str = "mistral",
         temperature: float = 0.0,
-        persist_dir: str = "chroma_db",
+        persist_dir: str = CHROMA_DIR,
+        retrieval_mode: str = "vector",
+        vector_backend: str | None = None,
+        vector_format: str = "float32",
+        num_workers: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        answer_cache: bool = True,
+        adaptive_condense: bool = True,
+        condense_model: str | None = None,
+        rerank: bool = False,
+        rerank_candidates: int = DEFAULT_RERANK_CANDIDATES,
+        rerank_model: str = DEFAULT_RERANK_MODEL,
+        compress_context: bool = False,
+        context_budget: int = DEFAULT_TOKEN_BUDGET,
+        embed_backend: str = "torch",
+        embed_batch_size: int = 32,
+        embed_threads: int | None = None,
+        embed_procs: int = 1,
+        trace_path: str | None = None,
+        lazy_embed: bool = True,
+        prewarm: bool = True,
+        embed_model: BaseEmbedding | None = None,
+        llm: LLM | None = None,
     ):
+        if trace_path:
+            # Registered first, so the ingestion spans of this build are exported too
+            tracing.add_hook(tracing.JSONLExporter(trace_path))
+
         print("=" * 70)
         print("Initialising LlamaIndex RAG Pipeline")
         print("=" * 70)
+        start = time.perf_counter()
 
-        print("\n[1/5] Loading PDF(s)...")
-        docs = load_pdfs(pdf_path)
+        chunking = {"chunk_size": chunk_size, "overlap": overlap}
+        # float16 / PQ vectors only exist in the native store
+        vector_backend = vector_backend or ("chroma" if vector_format == "float32" else "native")
 
-        print("\n[2/5] Splitting into chunks...")
-        nodes = split_documents(docs, chunk_size=chunk_size, overlap=overlap)
-
-        print("\n[3/5] Loading embeddings...")
-        embed_model = get_embeddings()
+        print("\n[1/4] Loading embeddings and LLM...")
+        if embed_model is not None:
+            # Shared with other pipelines
+            print(f"✓ Using shared embedding model '{embed_model.model_name}'")
+        else:
+            embed_model = get_embeddings(
+                DEFAULT_MODEL,
+                backend=embed_backend,
+                batch_size=embed_batch_size,
+                num_threads=embed_threads,
+                num_procs=embed_procs,
+                lazy=lazy_embed,
+            )
+        if lazy_embed and prewarm and isinstance(embed_model, CachedEmbedding):
+            # Load in the background while PDFs are parsed instead of
+            # blocking here; the first cache miss waits only for what is left
+            embed_model.warm()
         Settings.embed_model = embed_model
+        self.embed_model = embed_model
 
-        print("\n[4/5] Building vector store...")
-        index = build_vector_store(nodes, embed_model, persist_dir)
-        self.retriever = get_retriever(index, top_k=top_k)
-
-        print("\n[5/5] Setting up LLM and memory...")
-        llm = get_llm(provider=provider, model=model, temperature=temperature)
+        # The LLM clients are cheap to create; what is slow is Ollama loading
+        # the weights on the first request, so that too overlaps with indexing
+        if llm is None:
+            llm = get_llm(provider=provider, model=model, temperature=temperature)
         Settings.llm = llm
+        condense_llm = None
+        if condense_model and condense_model != model:
+            condense_llm = get_llm(provider=provider, model=condense_model, temperature=0.0)
+            print(f"✓ Follow-up questions condensed with {condense_model}")
+        if prewarm:
+            for client in (llm, condense_llm):
+                if client is not None and warm_llm(client) is not None:
+                    print(f"✓ Loading '{client.model}' in Ollama in the background")
+
+        print("\n[2/4] Indexing (scan → load → split → embed → upsert)...")
+        index = index_pdfs(
+            pdf_path,
+            embed_model,
+            persist_dir,
+            chunking=chunking,
+            num_workers=num_workers,
+            batch_size=batch_size,
+            vector_backend=vector_backend,
+            vector_format=vector_format,
+        )
+        self.index = index
+        self.index_version = index_version(persist_dir) or uuid.uuid4().hex
+        self.answer_cache = AnswerCache() if answer_cache else None
+
+        print("\n[3/4] Setting up retriever...")
+        self._setup_retrieval(
+            top_k,
+            retrieval_mode,
+            persist_dir,
+            reranker=CrossEncoderReranker(model_name=rerank_model, top_n=top_k) if rerank else None,
+            rerank_candidates=rerank_candidates,
+            compressor=ContextCompressor(token_budget=context_budget) if compress_context else None,
+        )
+
+        print("\n[4/4] Setting up chat memory...")
+        self._setup_chat(llm, adaptive_condense, condense_llm)
+
+        print(f"\n✓ Pipeline ready!  ({time.perf_counter() - start:.1f}s)\n")
+
+    @classmethod
+    async def acreate(cls, *args, **kwargs) -> "RAGPipeline":
+        """
+        Async constructor: loads PDFs and builds the index in a worker
+        thread so the event loop keeps serving other requests meanwhile.
+
+        Usage:
+            pipeline = await RAGPipeline.acreate(pdf_path="docs/")
+        """
+        return await asyncio.to_thread(cls, *args, **kwargs)
+
+    @classmethod
+    def from_index(
+        cls,
+        index: VectorStoreIndex,
+        llm: LLM,
+        top_k: int = 5,
+        answer_cache: bool = True,
+        adaptive_condense: bool = True,
+        condense_llm: LLM | None = None,
+        retrieval_mode: str = "vector",
+        persist_dir: str = CHROMA_DIR,
+        reranker: CrossEncoderReranker | None = None,
+        rerank_candidates: int = DEFAULT_RERANK_CANDIDATES,
+        compressor: ContextCompressor | None = None,
+        bm25: BM25Index | None = None,
+        index_version: str | None = None,
+    ) -> "RAGPipeline":
+        """
+        Build a pipeline around an already-built index and LLM
+        (no PDF loading, no embedding model load).
 
-        self.memory = ChatMemoryBuffer.from_defaults(token_limit=4096)
+        Everything passed in is shared, not copied: several pipelines with
+        different query settings can sit on one index, BM25 index and
+        reranker model (see CrossEncoderReranker.with_top_n).
+        """
+        pipeline = cls.__new__(cls)
+        pipeline.embed_model = index._embed_model
+        pipeline.index = index
+        pipeline.index_version = index_version or uuid.uuid4().hex
+        pipeline.answer_cache = AnswerCache() if answer_cache else None
+        pipeline._setup_retrieval(
+            top_k,
+            retrieval_mode,
+            persist_dir,
+            reranker=reranker,
+            rerank_candidates=rerank_candidates,
+            compressor=compressor,
+            bm25=bm25,
+        )
+        pipeline._setup_chat(llm, adaptive_condense, condense_llm)
+        return pipeline
 
-        self.chat_engine = CondensePlusContextChatEngine.from_defaults(
-            retriever=self.retriever,
-            memory=self.memory,
-            llm=llm,
-            verbose=False,
+    def _setup_retrieval(
+        self,
+        top_k: int,
+        retrieval_mode: str,
+        persist_dir: str,
+        reranker: CrossEncoderReranker | None = None,
+        rerank_candidates: int = DEFAULT_RERANK_CANDIDATES,
+        compressor: ContextCompressor | None = None,
+        bm25: BM25Index | None = None,
+    ) -> None:
+        """Create the retriever over self.index and attach the postprocessors."""
+        # With reranking, over-fetch candidates and let the cross-encoder pick top_k
+        fetch_k = max(rerank_candidates, top_k) if reranker is not None else top_k
+        self.retriever = get_retriever(
+            self.index, top_k=fetch_k, mode=retrieval_mode, persist_dir=persist_dir, bm25=bm25
         )
+        self.reranker = reranker
+        self.compressor = compressor
+        if compressor is not None:
+            print(f"✓ Context compression on  (budget {compressor.token_budget} tokens)")
+
+    def _setup_chat(
+        self,
+        llm: LLM,
+        adaptive_condense: bool = True,
+        condense_llm: LLM | None = None,
+    ) -> None:
+        """Create the session manager and this pipeline's own conversation."""
+        self.llm = llm
+        shared = {
+            "embed_model": self.embed_model,
+            "answer_cache": self.answer_cache,
+            "index_version": self.index_version,
+            "adaptive_condense": adaptive_condense,
+            "condense_llm": condense_llm,
+            "node_postprocessors": [p for p in (self.reranker, self.compressor) if p] or None,
+        }
+        self.sessions = SessionManager(self.retriever, llm, **shared)
+        self.session = ChatSession("default", self.retriever, llm, **shared)
+
+    @property
+    def memory(self) -> ChatMemoryBuffer:
+        return self.session.memory
 
-        print("\n✓ Pipeline ready!\n")
+    @property
+    def chat_engine(self) -> CondensePlusContextChatEngine:
+        return self.session.chat_engine
 
     def ask(self, question: str) -> dict:
         """
@@ -77,29 +275,54 @@ class RAGPipeline:
         Returns:
             {
                 "answer": str,
-                "sources": [{"file": str, "page": str, "preview": str}, ...]
+                "sources": [{"file": str, "page": str, "preview": str}, ...],
+                "cached": bool,
+                "llm_calls": int,
+                "timings": {"retrieve_ms": float, ..., "total_ms": float}
             }
         """
-        response = self.chat_engine.chat(question)
-
-        raw_sources = response.source_nodes if hasattr(response, "source_nodes") else []
-        sources = []
-        for node in raw_sources:
-            sources.append({
-                "file": node.metadata.get("file_name", "unknown"),
-                "page": node.metadata.get("page_label", node.metadata.get("page", "?")),
-                "preview": node.get_content().replace("\n", " ")[:120],
-            })
-
-        return {
-            "answer": str(response),
-            "sources": sources,
-        }
+        return self.session.ask(question)
+
+    def ask_stream(self, question: str) -> Iterator[dict]:
+        """Stream the answer: sources first, then tokens (see ChatSession.ask_stream)."""
+        return self.session.ask_stream(question)
+
+    async def aask(self, question: str) -> dict:
+        """Async version of ask(), built on the chat engine's achat."""
+        return await self.session.aask(question)
+
+    def aask_stream(self, question: str) -> AsyncIterator[dict]:
+        """Async version of ask_stream()."""
+        return self.session.aask_stream(question)
+
+    def ask_batch(
+        self,
+        questions: list[dict],
+        out_path: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> dict:
+        """
+        Answer independent questions ({"id", "question"} dicts, see
+        batch.load_questions) without chat memory, writing one JSONL line
+        per question to out_path. Returns throughput / latency totals.
+        """
+        return run_batch(self, questions, out_path, concurrency)
+
+    def cache_stats(self) -> dict:
+        """Hit/miss statistics of the embedding, answer and rerank-score caches."""
+        stats = {}
+        if isinstance(self.embed_model, CachedEmbedding):
+            stats["embeddings"] = self.embed_model.stats()
+        if self.answer_cache is not None:
+            stats["answers"] = self.answer_cache.stats()
+        if self.reranker is not None:
+            stats["rerank"] = self.reranker.stats()
+        return stats
 
     def clear_memory(self) -> None:
         """Reset conversation history."""
-        self.memory.reset()
+        self.session.clear_memory()
 
     def get_history(self) -> list[ChatMessage]:
         """Return the full conversation history."""
-        return self.memory.get_all()
\ No newline at end of file
+        return self.session.get_history()
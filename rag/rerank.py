@@ -0,0 +1,158 @@
+"""
+rerank.py
+---------
+Cross-encoder reranking between retrieval and generation.
+
+Vector similarity is a cheap first pass; a cross-encoder reads the query
+and each chunk together and is much better at telling which chunks
+actually answer the question. The pipeline over-fetches candidates from
+the retriever (e.g. 20), the reranker scores all of them in one batched
+forward pass on CPU and only the best top_n reach the LLM prompt — fewer,
+better chunks means fewer prompt tokens for Ollama to process.
+
+Scores are cached per (query, node id): node ids are derived from page
+content (manifest.assign_stable_ids), so a cached score can never belong to
+different text. Repeated questions and follow-ups that retrieve the same
+chunks skip the model.
+
+    reranker = CrossEncoderReranker(top_n=5)
+    RAGChatEngine.from_defaults(retriever=..., node_postprocessors=[reranker])
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+from rag import tracing
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_RERANK_CANDIDATES = 20
+DEFAULT_SCORE_CACHE_SIZE = 10_000
+
+
+class CrossEncoderReranker(BaseNodePostprocessor):
+    """
+    Node postprocessor that reorders retrieved nodes by cross-encoder score
+    and keeps the top_n.
+
+    Per-call timings go on the active "rerank" tracing span (the
+    instance is shared by concurrent sessions); totals via stats().
+    """
+
+    model_name: str = Field(default=DEFAULT_RERANK_MODEL, description="sentence-transformers CrossEncoder.")
+    top_n: int = Field(default=5, description="Nodes kept after reranking.")
+    batch_size: int = Field(default=32, description="Pairs per forward pass.")
+    cache_size: int = Field(default=DEFAULT_SCORE_CACHE_SIZE, description="Cached (query, node) scores.")
+
+    _model: Any = PrivateAttr()
+    _scores: OrderedDict = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr()
+    _totals: dict = PrivateAttr()
+
+    def __init__(self, model: Any = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self._totals = {"calls": 0, "hits": 0, "misses": 0, "seconds": 0.0}
+        if model is not None:
+            self._model = model
+            return
+        from sentence_transformers import CrossEncoder   # imports torch — only when reranking
+
+        print(f"Loading reranker: {self.model_name}")
+        self._model = CrossEncoder(self.model_name, device="cpu", max_length=512)
+        print("✓ Reranker loaded")
+
+    def with_top_n(self, top_n: int) -> "CrossEncoderReranker":
+        """
+        A reranker keeping top_n nodes that shares this one's loaded model
+        and score cache (scores do not depend on top_n).
+        """
+        other = CrossEncoderReranker(
+            model=self._model,
+            model_name=self.model_name,
+            top_n=top_n,
+            batch_size=self.batch_size,
+            cache_size=self.cache_size,
+        )
+        other._scores, other._lock, other._totals = self._scores, self._lock, self._totals
+        return other
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CrossEncoderReranker"
+
+    def _postprocess_nodes(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None = None,
+    ) -> list[NodeWithScore]:
+        if query_bundle is None or not nodes:
+            return nodes[:self.top_n]
+        with tracing.span("rerank") as span:
+            reranked, timings = self._rerank(nodes, query_bundle)
+            span.update(timings)
+        return reranked
+
+    def _rerank(
+        self, nodes: list[NodeWithScore], query_bundle: QueryBundle
+    ) -> tuple[list[NodeWithScore], dict]:
+        """Top_n nodes plus {candidates, cached, scored, model_ms, total_ms} of this call."""
+        start = time.perf_counter()
+        query = query_bundle.query_str
+        keys = [(query, n.node.node_id) for n in nodes]
+        with self._lock:
+            scores = {k: self._scores[k] for k in keys if k in self._scores}
+            for key in scores:
+                self._scores.move_to_end(key)
+        missing = [(k, n) for k, n in zip(keys, nodes) if k not in scores]
+
+        model_start = time.perf_counter()
+        if missing:
+            pairs = [(query, n.node.get_content(metadata_mode=MetadataMode.NONE)) for _, n in missing]
+            predicted = self._model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            new = {k: float(s) for (k, _), s in zip(missing, predicted)}
+            scores.update(new)
+            with self._lock:
+                self._scores.update(new)
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+        model_seconds = time.perf_counter() - model_start
+
+        for key, node in zip(keys, nodes):
+            node.score = scores[key]
+        reranked = sorted(nodes, key=lambda n: n.score, reverse=True)[:self.top_n]
+
+        elapsed = time.perf_counter() - start
+        timings = {
+            "candidates": len(nodes),
+            "cached": len(nodes) - len(missing),
+            "scored": len(missing),
+            "model_ms": round(model_seconds * 1000, 1),
+            "total_ms": round(elapsed * 1000, 1),
+        }
+        with self._lock:
+            self._totals["calls"] += 1
+            self._totals["hits"] += len(nodes) - len(missing)
+            self._totals["misses"] += len(missing)
+            self._totals["seconds"] += elapsed
+        return reranked, timings
+
+    def stats(self) -> dict:
+        """Score-cache hit/miss counters, size and average rerank time."""
+        with self._lock:
+            totals = dict(self._totals)
+            entries = len(self._scores)
+        pairs = totals["hits"] + totals["misses"]
+        return {
+            "hits": totals["hits"],
+            "misses": totals["misses"],
+            "hit_rate": totals["hits"] / pairs if pairs else 0.0,
+            "entries": entries,
+            "avg_ms": 1000 * totals["seconds"] / totals["calls"] if totals["calls"] else 0.0,
+        }
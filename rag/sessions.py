@@ -0,0 +1,398 @@
+"""
+sessions.py
+-----------
+Multi-session serving on top of one shared index.
+
+The expensive parts of the pipeline — vector index, retriever, embedding
+model, LLM client, answer cache — are created once. Each user/tab only gets
+a ChatSession: a ChatMemoryBuffer plus a chat engine that points at the
+shared retriever and LLM (a few KB per session).
+
+    manager = SessionManager(retriever, llm, max_sessions=200)
+    manager.get("alice").ask("What is in the report?")
+    manager.get("bob").ask("Summarise the contract")   ← separate memory
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Iterator
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.llms import LLM, ChatMessage, MessageRole
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore
+
+from rag import tracing
+from rag.answer_cache import AnswerCache
+from rag.batching import estimate_tokens
+from rag.chat_engine import RAGChatEngine
+from rag.compress import take_compression_stats
+
+DEFAULT_TOKEN_LIMIT = 4096
+
+
+def format_sources(nodes: list[NodeWithScore]) -> list[dict]:
+    """Turn retrieved nodes into the {file, page, preview} dicts shown to users."""
+    sources = []
+    for node in nodes:
+        sources.append({
+            "file": node.metadata.get("file_name", "unknown"),
+            "page": node.metadata.get("page_label", node.metadata.get("page", "?")),
+            "preview": node.get_content().replace("\n", " ")[:120],
+        })
+    return sources
+
+
+class ChatSession:
+    """
+    One conversation: its own memory and chat engine over a shared
+    retriever and LLM.
+
+    With an answer_cache (and the embed_model to key it), each question is
+    condensed first and looked up by similarity; a hit skips retrieval and
+    generation entirely and is still recorded in this session's memory.
+
+    Self-contained follow-ups skip the condense rewrite (adaptive_condense),
+    and the rewrite itself can run on a smaller condense_llm. Every result
+    reports how many LLM calls the turn made (`llm_calls`).
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        retriever: BaseRetriever,
+        llm: LLM,
+        token_limit: int = DEFAULT_TOKEN_LIMIT,
+        embed_model: BaseEmbedding | None = None,
+        answer_cache: AnswerCache | None = None,
+        index_version: str | None = None,
+        adaptive_condense: bool = True,
+        condense_llm: LLM | None = None,
+        node_postprocessors: list[BaseNodePostprocessor] | None = None,
+    ):
+        self.session_id = session_id
+        self.last_used = time.monotonic()
+        self.embed_model = embed_model
+        self.answer_cache = answer_cache if embed_model is not None else None
+        self.index_version = index_version
+        self.memory = ChatMemoryBuffer.from_defaults(token_limit=token_limit)
+        self.chat_engine = RAGChatEngine.from_defaults(
+            retriever=retriever,
+            memory=self.memory,
+            llm=llm,
+            node_postprocessors=node_postprocessors,
+            verbose=False,
+        )
+        self.chat_engine.adaptive_condense = adaptive_condense
+        self.chat_engine.condense_llm = condense_llm
+
+    def ask(self, question: str) -> dict:
+        """
+        Ask a question. Returns a dict with answer + sources.
+
+        Returns:
+            {
+                "answer": str,
+                "sources": [{"file": str, "page": str, "preview": str}, ...],
+                "cached": bool,      ← True if served from the answer cache
+                "llm_calls": int,    ← condense + generation calls this turn
+                "tokens_saved": int, ← context tokens cut by compression
+                "timings": dict      ← ms per stage, see tracing.Trace.timings
+            }
+        """
+        self._begin_turn()
+        with tracing.trace("ask", session=self.session_id) as turn:
+            cached, embedding = self._cache_lookup(question)
+            if cached is None:
+                with tracing.span("generate") as span:
+                    response = self.chat_engine.chat(question)
+                    span["tokens_out"] = estimate_tokens(str(response))
+
+                raw_sources = response.source_nodes if hasattr(response, "source_nodes") else []
+                result = {
+                    "answer": str(response),
+                    "sources": format_sources(raw_sources),
+                    "cached": False,
+                    "llm_calls": self.chat_engine.llm_calls + 1,
+                    "tokens_saved": _tokens_saved(),
+                }
+                self._cache_store(embedding, question, result)
+            else:
+                result = cached
+            _annotate_turn(result)
+        result["timings"] = turn.timings()
+        return result
+
+    def ask_stream(self, question: str) -> Iterator[dict]:
+        """
+        Ask a question and stream the answer as it is generated.
+
+        Retrieval finishes before the first token, so the sources are
+        emitted up front. Memory is updated once the stream is consumed.
+        A cached answer arrives as a single token.
+
+        Yields:
+            {"type": "sources", "sources": [...]}   ← once, first
+            {"type": "token",   "text": str}        ← one per generated delta
+            {"type": "done",    "answer": str,
+             "llm_calls": int, "tokens_saved": int,
+             "timings": dict}                       ← once, full answer
+        """
+        self._begin_turn()
+        outer = tracing.current()   # the consumer's spans stay outside this turn
+        with tracing.trace("ask", session=self.session_id, stream=True) as turn:
+            cached, embedding = self._cache_lookup(question)
+            if cached is not None:
+                _annotate_turn(cached)
+            else:
+                with tracing.span("generate") as span:
+                    response = self.chat_engine.stream_chat(question)
+                    started = time.perf_counter()
+                    tokens_saved = _tokens_saved()
+                    sources = format_sources(response.source_nodes)
+                    with tracing.outside(outer):
+                        yield {"type": "sources", "sources": sources}
+
+                    answer = ""
+                    for token in response.response_gen:
+                        if not answer:
+                            span["first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                        answer += token
+                        with tracing.outside(outer):
+                            yield {"type": "token", "text": token}
+                    span["tokens_out"] = estimate_tokens(answer)
+                self._cache_store(embedding, question, {"answer": answer, "sources": sources})
+                done = {"type": "done", "answer": answer,
+                        "llm_calls": self.chat_engine.llm_calls + 1, "tokens_saved": tokens_saved}
+                _annotate_turn({**done, "cached": False})
+        if cached is not None:
+            yield from _replay({**cached, "timings": turn.timings()})
+        else:
+            yield {**done, "timings": turn.timings()}
+
+    async def aask(self, question: str) -> dict:
+        """
+        Async version of ask(): uses the chat engine's achat, so condense,
+        retrieval and generation await I/O instead of blocking the event loop.
+        """
+        self._begin_turn()
+        with tracing.trace("ask", session=self.session_id) as turn:
+            cached, embedding = await self._acache_lookup(question)
+            if cached is None:
+                with tracing.span("generate") as span:
+                    response = await self.chat_engine.achat(question)
+                    span["tokens_out"] = estimate_tokens(str(response))
+
+                raw_sources = response.source_nodes if hasattr(response, "source_nodes") else []
+                result = {
+                    "answer": str(response),
+                    "sources": format_sources(raw_sources),
+                    "cached": False,
+                    "llm_calls": self.chat_engine.llm_calls + 1,
+                    "tokens_saved": _tokens_saved(),
+                }
+                self._cache_store(embedding, question, result)
+            else:
+                result = cached
+            _annotate_turn(result)
+        result["timings"] = turn.timings()
+        return result
+
+    async def aask_stream(self, question: str) -> AsyncIterator[dict]:
+        """Async version of ask_stream(); yields the same events."""
+        self._begin_turn()
+        outer = tracing.current()
+        with tracing.trace("ask", session=self.session_id, stream=True) as turn:
+            cached, embedding = await self._acache_lookup(question)
+            if cached is not None:
+                _annotate_turn(cached)
+            else:
+                with tracing.span("generate") as span:
+                    response = await self.chat_engine.astream_chat(question)
+                    started = time.perf_counter()
+                    tokens_saved = _tokens_saved()
+                    sources = format_sources(response.source_nodes)
+                    with tracing.outside(outer):
+                        yield {"type": "sources", "sources": sources}
+
+                    answer = ""
+                    async for token in response.async_response_gen():
+                        if not answer:
+                            span["first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                        answer += token
+                        with tracing.outside(outer):
+                            yield {"type": "token", "text": token}
+                    span["tokens_out"] = estimate_tokens(answer)
+                self._cache_store(embedding, question, {"answer": answer, "sources": sources})
+                done = {"type": "done", "answer": answer,
+                        "llm_calls": self.chat_engine.llm_calls + 1, "tokens_saved": tokens_saved}
+                _annotate_turn({**done, "cached": False})
+        if cached is not None:
+            for event in _replay({**cached, "timings": turn.timings()}):
+                yield event
+        else:
+            yield {**done, "timings": turn.timings()}
+
+    def clear_memory(self) -> None:
+        """Reset conversation history."""
+        self.memory.reset()
+
+    def get_history(self) -> list[ChatMessage]:
+        """Return the full conversation history."""
+        return self.memory.get_all()
+
+    def _begin_turn(self) -> None:
+        self.chat_engine.begin_turn()
+        take_compression_stats()  # discard numbers left by an earlier turn
+
+    # ── Answer cache ─────────────────────────────────────────────────
+
+    def _cache_lookup(self, question: str) -> tuple[dict | None, list[float] | None]:
+        """Condense + embed the question; return (cached result or None, embedding)."""
+        if self.answer_cache is None:
+            return None, None
+        condensed = self.chat_engine.condense(question)
+        # Same string the retriever will embed, so the embedding cache serves it twice
+        with tracing.span("embed", kind="query"):
+            embedding = self.embed_model.get_query_embedding(condensed)
+        return self._cache_hit(question, embedding), embedding
+
+    async def _acache_lookup(self, question: str) -> tuple[dict | None, list[float] | None]:
+        if self.answer_cache is None:
+            return None, None
+        condensed = await self.chat_engine.acondense(question)
+        with tracing.span("embed", kind="query"):
+            embedding = await self.embed_model.aget_query_embedding(condensed)
+        return self._cache_hit(question, embedding), embedding
+
+    def _cache_hit(self, question: str, embedding: list[float]) -> dict | None:
+        hit = self.answer_cache.lookup(embedding, self.index_version)
+        if hit is None:
+            return None
+        self.chat_engine.clear_condensed()
+        self.memory.put(ChatMessage(role=MessageRole.USER, content=question))
+        self.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=hit["answer"]))
+        return {
+            "answer": hit["answer"],
+            "sources": hit["sources"],
+            "cached": True,
+            "llm_calls": self.chat_engine.llm_calls,
+            "tokens_saved": 0,
+        }
+
+    def _cache_store(self, embedding: list[float] | None, question: str, result: dict) -> None:
+        if self.answer_cache is not None and embedding is not None and result["answer"]:
+            self.answer_cache.store(embedding, self.index_version, question, result)
+
+
+def _replay(result: dict) -> Iterator[dict]:
+    """Stream events for an already complete (cached) answer."""
+    yield {"type": "sources", "sources": result["sources"]}
+    yield {"type": "token", "text": result["answer"]}
+    yield {"type": "done", "answer": result["answer"], "llm_calls": result["llm_calls"],
+           "tokens_saved": result["tokens_saved"], "timings": result["timings"]}
+
+
+def _annotate_turn(result: dict) -> None:
+    """Put the turn's outcome on its root "ask" span."""
+    tracing.annotate(
+        cached=result["cached"],
+        llm_calls=result["llm_calls"],
+        tokens_saved=result["tokens_saved"],
+    )
+
+
+def _tokens_saved() -> int:
+    stats = take_compression_stats()
+    return stats["tokens_saved"] if stats else 0
+
+
+class SessionManager:
+    """
+    Creates ChatSessions on demand and evicts idle ones.
+
+    Sessions are kept in LRU order: when more than max_sessions exist the
+    least recently used is dropped, and sessions idle for longer than
+    idle_timeout seconds are dropped on the next get().
+
+    Thread-safe, so one manager can back a multi-threaded server or all
+    Streamlit tabs of a process.
+    """
+
+    def __init__(
+        self,
+        retriever: BaseRetriever,
+        llm: LLM,
+        max_sessions: int = 100,
+        idle_timeout: float | None = 3600.0,
+        token_limit: int = DEFAULT_TOKEN_LIMIT,
+        embed_model: BaseEmbedding | None = None,
+        answer_cache: AnswerCache | None = None,
+        index_version: str | None = None,
+        adaptive_condense: bool = True,
+        condense_llm: LLM | None = None,
+        node_postprocessors: list[BaseNodePostprocessor] | None = None,
+    ):
+        self.retriever = retriever
+        self.llm = llm
+        self.adaptive_condense = adaptive_condense
+        self.condense_llm = condense_llm
+        self.node_postprocessors = node_postprocessors
+        self.embed_model = embed_model
+        self.answer_cache = answer_cache
+        self.index_version = index_version
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.token_limit = token_limit
+        self._sessions: OrderedDict[str, ChatSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> ChatSession:
+        """Return the session for session_id, creating it if needed."""
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = ChatSession(
+                    session_id,
+                    self.retriever,
+                    self.llm,
+                    self.token_limit,
+                    embed_model=self.embed_model,
+                    answer_cache=self.answer_cache,
+                    index_version=self.index_version,
+                    adaptive_condense=self.adaptive_condense,
+                    condense_llm=self.condense_llm,
+                    node_postprocessors=self.node_postprocessors,
+                )
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            return session
+
+    def drop(self, session_id: str) -> None:
+        """Forget a session and its memory."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict_idle(self) -> None:
+        if self.idle_timeout is None:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_used >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -10,6 +10,14 @@ from llama_index.core.node_parser import SentenceSplitter
 from llama_index.core.schema import BaseNode
 
 
+def get_splitter(chunk_size: int = 1000, overlap: int = 150) -> SentenceSplitter:
+    """Return the SentenceSplitter used for every chunking path."""
+    return SentenceSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=overlap,
+    )
+
+
 def split_documents(
     docs: list[Document],
     chunk_size: int = 1000,
@@ -30,10 +38,7 @@ def split_documents(
     Returns:
         List of BaseNode objects (chunks) with original metadata preserved.
     """
-    splitter = SentenceSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=overlap,
-    )
+    splitter = get_splitter(chunk_size=chunk_size, overlap=overlap)
 
     nodes = splitter.get_nodes_from_documents(docs)
     print(f"✓ Split into {len(nodes)} chunks  "
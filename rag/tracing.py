@@ -0,0 +1,260 @@
+"""
+tracing.py
+----------
+Per-stage timing spans for ingestion and question answering.
+
+Every stage of the pipeline runs inside a span:
+
+    ingest    load → split → embed → upsert           (per file / batch)
+    ask       condense → embed → retrieve → rerank → compress → generate
+
+A span records its wall time, its self time (minus the spans nested in
+it) and stage attributes — token counts, cache hits, node counts. Spans
+opened inside a trace() share its trace_id, and the trace sums its spans
+per stage, which is what ChatSession puts in the `timings` field of every
+ask() result:
+
+    {"condense_ms": 410.2, "embed_ms": 3.1, "retrieve_ms": 8.4,
+     "generate_ms": 1830.5, "total_ms": 2252.7}
+
+Finished spans go to the registered hooks — any callable taking the span
+dict — so they can be logged, exported or aggregated:
+
+    from rag import tracing
+    tracing.add_hook(tracing.JSONLExporter("traces.jsonl"))
+    tracing.add_hook(lambda span: print(span["stage"], span["ms"]))
+
+The current span/trace lives in a ContextVar (like compress.py's turn
+stats), so concurrent sessions on threads or asyncio tasks never mix
+their spans. A generator runs in its consumer's context, so one that
+keeps spans open across yields wraps each yield in outside():
+
+    outer = tracing.current()
+    with tracing.trace("ask"):
+        ...
+        with tracing.outside(outer):
+            yield event          ← consumer code is not part of this trace
+"""
+
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+STAGES = ("load", "split", "embed", "upsert", "condense", "retrieve", "rerank", "compress", "generate")
+
+Hook = Callable[[dict], None]
+
+_hooks: list[Hook] = []
+_hooks_lock = threading.Lock()
+_current: ContextVar[dict | None] = ContextVar("trace_span", default=None)
+
+
+def add_hook(hook: Hook) -> Hook:
+    """Call hook(span) for every finished span. Returns hook (usable as a decorator)."""
+    with _hooks_lock:
+        _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook: Hook) -> None:
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def _emit(record: dict) -> None:
+    with _hooks_lock:
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(record)
+        except Exception as e:   # a broken exporter must never fail a request
+            print(f"[Trace] hook {getattr(hook, '__name__', hook)!r} failed: {e}")
+
+
+def _open(stage: str, attrs: dict, trace_id: str | None = None) -> dict:
+    parent = _current.get()
+    return {
+        "stage": stage,
+        "trace_id": trace_id or (parent["trace_id"] if parent else None),
+        "parent": parent["stage"] if parent else None,
+        "start": time.time(),
+        "attrs": dict(attrs),
+        "_t0": time.perf_counter(),
+        "_child_ms": 0.0,
+        "_parent": parent,
+        "_spans": None,
+    }
+
+
+def _close(span: dict, error: BaseException | None = None) -> dict:
+    ms = (time.perf_counter() - span["_t0"]) * 1000
+    parent = span["_parent"]
+    if parent is not None:
+        parent["_child_ms"] += ms
+    record = {
+        "trace_id": span["trace_id"],
+        "stage": span["stage"],
+        "parent": span["parent"],
+        "start": round(span["start"], 6),
+        "ms": round(ms, 3),
+        "self_ms": round(ms - span["_child_ms"], 3),
+        **span["attrs"],
+    }
+    if error is not None:
+        record["error"] = f"{type(error).__name__}: {error}"
+    # Collect into the enclosing trace, if any
+    owner = parent
+    while owner is not None and owner["_spans"] is None:
+        owner = owner["_parent"]
+    if owner is not None:
+        owner["_spans"].append(record)
+    _emit(record)
+    return record
+
+
+@contextmanager
+def span(stage: str, **attrs) -> Iterator[dict]:
+    """
+    Time a block as one pipeline stage.
+
+    Yields the span's attribute dict; anything set on it ends up in the
+    span record (e.g. `s["chunks"] = len(nodes)`).
+    """
+    current = _open(stage, attrs)
+    previous = _current.get()
+    _current.set(current)
+    error = None
+    try:
+        yield current["attrs"]
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current.set(previous)
+        _close(current, error)
+
+
+def record(stage: str, ms: float, **attrs) -> None:
+    """Emit a span for work that was timed elsewhere (e.g. in a worker process)."""
+    current = _open(stage, attrs)
+    current["_t0"] = time.perf_counter() - ms / 1000
+    current["start"] -= ms / 1000
+    _close(current)
+
+
+def current() -> dict | None:
+    """The innermost open span (opaque; hand it to outside() later)."""
+    return _current.get()
+
+
+@contextmanager
+def outside(span: dict | None) -> Iterator[None]:
+    """
+    Make span (from current()) the current one again for the block, e.g.
+    around a generator's yield. Time spent in the block does not count
+    towards the self time of the span that was current.
+    """
+    inner = _current.get()
+    _current.set(span)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current.set(inner)
+        if inner is not None:
+            inner["_child_ms"] += (time.perf_counter() - t0) * 1000
+
+
+def annotate(**attrs) -> None:
+    """Add attributes to the innermost open span (no-op outside a span)."""
+    current = _current.get()
+    if current is not None:
+        current["attrs"].update(attrs)
+
+
+class Trace:
+    """The spans of one ask() turn or ingestion run, summed per stage."""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: list[dict] = []
+        self.total_ms = 0.0
+
+    def timings(self) -> dict:
+        """{"<stage>_ms": self time summed over the stage's spans, ..., "total_ms"}."""
+        totals: dict[str, float] = {}
+        for s in self.spans:
+            if s["stage"] in STAGES:
+                key = f"{s['stage']}_ms"
+                totals[key] = totals.get(key, 0.0) + s["self_ms"]
+        ordered = {f"{stage}_ms": round(totals[f"{stage}_ms"], 1)
+                   for stage in STAGES if f"{stage}_ms" in totals}
+        ordered["total_ms"] = round(self.total_ms, 1)
+        return ordered
+
+
+@contextmanager
+def trace(name: str, **attrs) -> Iterator[Trace]:
+    """
+    Root span with a fresh trace_id; collects every span opened inside it.
+
+    The root itself is emitted last, with stage=name and the whole
+    duration in ms.
+    """
+    result = Trace(uuid.uuid4().hex[:16])
+    current = _open(name, attrs, trace_id=result.trace_id)
+    current["parent"] = None
+    current["_parent"] = None
+    current["_spans"] = result.spans
+    previous = _current.get()
+    _current.set(current)
+    error = None
+    try:
+        yield result
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current.set(previous)
+        result.total_ms = _close(current, error)["ms"]
+
+
+def format_timings(timings: dict) -> str:
+    """Compact one-line readout: 'condense 0.4s · retrieve 8 ms · generate 1.8s · total 2.3s'."""
+    def fmt(ms: float) -> str:
+        return f"{ms / 1000:.1f}s" if ms >= 1000 else f"{ms:.0f} ms"
+
+    parts = [f"{key[:-3]} {fmt(ms)}" for key, ms in timings.items()
+             if key != "total_ms" and ms >= 0.5]
+    if "total_ms" in timings:
+        parts.append(f"total {fmt(timings['total_ms'])}")
+    return " · ".join(parts)
+
+
+class JSONLExporter:
+    """
+    Hook that appends each span as one JSON line.
+
+        tracing.add_hook(JSONLExporter("traces.jsonl"))
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, span: dict) -> None:
+        line = json.dumps(span, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line)
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
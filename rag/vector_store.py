@@ -1,118 +1,754 @@
 """
 vector_store.py
 ---------------
-Builds and manages a ChromaDB vector store via LlamaIndex.
+Builds and manages the vector store via LlamaIndex: ChromaDB, or the
+built-in NativeVectorStore (native_store.py).
 Compatible with llama-index-vector-stores-chroma >= 0.1.x and chromadb >= 0.5.0
 
+Indexing is incremental: a manifest (see manifest.py) records the content
+hash and node ids of every indexed page, so only new or changed pages are
+embedded and vectors for removed files are deleted. IndexWriter applies
+those changes file by file in bounded batches and checkpoints as it goes.
+The BM25 keyword index (bm25.py) is updated in the same batches, so hybrid
+retrieval (hybrid.py) always sees the same chunks as the vector search.
+
+Backends are pluggable: IndexWriter, BM25Index.sync and HybridRetriever
+only use the VectorBackend interface below. "chroma" (the default) keeps
+float32 vectors in a Chroma collection; "native" keeps them in
+memory-mapped NumPy files searched in-process (brute force or HNSW), as
+float32, float16 or PQ codes (vector_format).
+
 Windows note: Instead of deleting chroma_db between runs (which causes
-WinError 32 file-locking errors), we use a fresh EphemeralClient in memory
-when re-initialising, and only persist to disk on first load.
+WinError 32 file-locking errors), we fall back to an in-memory
+EphemeralClient when the persistent store cannot be opened.
 """
 
 import os
-import chromadb
-from chromadb.config import Settings
+from typing import Iterator, Protocol
 
-from llama_index.core import VectorStoreIndex, StorageContext
-from llama_index.core.schema import BaseNode
+from llama_index.core import VectorStoreIndex
+from llama_index.core.schema import BaseNode, MetadataMode, NodeWithScore, QueryBundle
 from llama_index.core.indices.vector_store import VectorStoreIndex
-from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.callbacks import CallbackManager
 from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+from rag import tracing
+from rag.batching import estimate_tokens
+from rag.bm25 import BM25_NAME, BM25Index
+from rag.embed_cache import CachedEmbedding
+from rag.hybrid import HybridRetriever
+from rag.manifest import (
+    append_journal,
+    assign_stable_ids,
+    clear_journal,
+    file_changed,
+    file_fingerprint,
+    file_key,
+    group_nodes_by_page,
+    hash_page,
+    load_manifest,
+    manifest_node_count,
+    manifest_version,
+    new_manifest,
+    read_journal,
+    save_manifest,
+)
+from rag.native_store import NATIVE_FORMATS, NativeVectorStore
 
 CHROMA_DIR = "chroma_db"
 COLLECTION_NAME = "rag_collection"
+DELETE_BATCH_SIZE = 5000
+DEFAULT_BATCH_SIZE = 256           # nodes embedded + upserted per batch
+DEFAULT_CHECKPOINT_EVERY = 2048    # new nodes between manifest checkpoints
+RETRIEVAL_MODES = ("vector", "hybrid")
+VECTOR_BACKENDS = ("chroma", "native")
+VECTOR_FORMATS = NATIVE_FORMATS    # "float32" is the only one Chroma supports
+
+
+class VectorBackend(Protocol):
+    """
+    What the indexing and retrieval code needs from a vector store.
+
+    label:        Name used in progress messages.
+    durable:      True if add() / delete_ids() are on disk when they return.
+                  Otherwise rows only become durable at commit(), and
+                  IndexWriter journals batches as committed only then.
+    persistent:   False for in-memory stores (no manifest, no BM25 file).
+    vector_store: The LlamaIndex vector store IndexWriter adds nodes to.
+    """
+
+    label: str
+    durable: bool
+    persistent: bool
+
+    @property
+    def vector_store(self) -> BasePydanticVectorStore: ...
+
+    def count(self) -> int:
+        """Number of stored vectors."""
+
+    def delete_ids(self, node_ids: list[str]) -> None:
+        """Delete nodes by id (unknown ids are ignored)."""
+
+    def clear(self) -> None:
+        """Delete everything."""
+
+    def iter_texts(self, batch_size: int = 2000) -> Iterator[tuple[list[str], list[str]]]:
+        """Yield (ids, texts) of every stored node, batch by batch."""
+
+    def get_nodes(self, node_ids: list[str]) -> list[BaseNode]:
+        """Load nodes (text + metadata) by id."""
+
+    def commit(self, complete: bool = False) -> None:
+        """Make writes durable; complete=True at the end of a build."""
+
+
+class ChromaBackend:
+    """
+    VectorBackend over a Chroma collection.
+
+    Chroma commits every add and delete itself, so the backend is durable
+    and commit() has nothing to do.
+    """
+
+    label = "Chroma"
+    durable = True
+
+    def __init__(self, collection, client=None, persistent: bool = True):
+        self.client = client
+        self.collection = collection
+        self.persistent = persistent
+        self.vector_store = self._wrap(collection)
+
+    @staticmethod
+    def _wrap(collection) -> BasePydanticVectorStore:
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        return ChromaVectorStore(chroma_collection=collection)
+
+    @staticmethod
+    def _client(persist_dir: str):
+        # chromadb is imported here, so the native backend never loads it
+        import chromadb
+        from chromadb.config import Settings
+
+        return chromadb.PersistentClient(
+            path=persist_dir,
+            settings=Settings(anonymized_telemetry=False),
+        )
+
+    @classmethod
+    def open(cls, persist_dir: str = CHROMA_DIR) -> "ChromaBackend":
+        try:
+            client = cls._client(persist_dir)
+            persistent = True
+        except Exception:
+            import chromadb
+
+            # Fallback: pure in-memory (no persistence, but no lock errors)
+            print("[Chroma] Persistent client unavailable, using in-memory store...")
+            client = chromadb.EphemeralClient()
+            persistent = False
+        return cls(client.get_or_create_collection(COLLECTION_NAME), client, persistent)
+
+    @classmethod
+    def stored_count(cls, persist_dir: str) -> int | None:
+        try:
+            return cls._client(persist_dir).get_or_create_collection(COLLECTION_NAME).count()
+        except Exception:
+            return None
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def delete_ids(self, node_ids: list[str]) -> None:
+        for start in range(0, len(node_ids), DELETE_BATCH_SIZE):
+            self.collection.delete(ids=node_ids[start:start + DELETE_BATCH_SIZE])
+
+    def clear(self) -> None:
+        self.client.delete_collection(COLLECTION_NAME)
+        self.collection = self.client.create_collection(COLLECTION_NAME)
+        self.vector_store = self._wrap(self.collection)
+
+    def iter_texts(self, batch_size: int = 2000) -> Iterator[tuple[list[str], list[str]]]:
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield page["ids"], [doc or "" for doc in page["documents"]]
+            offset += len(page["ids"])
+
+    def get_nodes(self, node_ids: list[str]) -> list[BaseNode]:
+        if not node_ids:
+            return []
+        result = self.collection.get(ids=node_ids, include=["documents", "metadatas"])
+        nodes = []
+        for text, metadata in zip(result["documents"], result["metadatas"]):
+            node = metadata_dict_to_node(metadata)
+            node.set_content(text or "")
+            nodes.append(node)
+        return nodes
+
+    def commit(self, complete: bool = False) -> None:
+        pass
+
+
+def open_backend(
+    backend: str = "chroma",
+    persist_dir: str = CHROMA_DIR,
+    vector_format: str = "float32",
+) -> VectorBackend:
+    """
+    Open (or create) the vector store in persist_dir.
+
+    Args:
+        backend:       "chroma" or "native".
+        persist_dir:   Index folder.
+        vector_format: "float32", or "float16" / "pq" (native backend only).
+    """
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend '{backend}'. Use one of {VECTOR_BACKENDS}.")
+    if vector_format not in VECTOR_FORMATS:
+        raise ValueError(f"Unknown vector format '{vector_format}'. Use one of {VECTOR_FORMATS}.")
+    if backend == "chroma":
+        if vector_format != "float32":
+            raise ValueError("Chroma stores float32 vectors only; use the native backend "
+                             f"for vector_format='{vector_format}'")
+        return ChromaBackend.open(persist_dir)
+    os.makedirs(persist_dir, exist_ok=True)
+    return NativeVectorStore(persist_dir, vector_format)
+
+
+def stored_count(backend: str, persist_dir: str) -> int | None:
+    """Vectors in a persisted store, without opening more of it than needed."""
+    if backend == "native":
+        return NativeVectorStore.stored_count(persist_dir)
+    return ChromaBackend.stored_count(persist_dir)
+
+
+def backend_of(index: VectorStoreIndex) -> VectorBackend:
+    """The backend behind an index built by IndexWriter."""
+    store = index.vector_store
+    if isinstance(store, NativeVectorStore):
+        return store
+    return ChromaBackend(store.client, persistent=False)
+
+
+def stale_sources(
+    source_files: list[str],
+    embed_model_name: str,
+    chunking: dict | None = None,
+    persist_dir: str = CHROMA_DIR,
+    vector_backend: str = "chroma",
+    vector_format: str = "float32",
+) -> list[str]:
+    """
+    Return the source files that must be (re-)parsed before indexing.
+
+    Only the manifest and the collection size are inspected — no PDF is
+    opened — so a warm restart with an unchanged corpus is near-instant.
+    Every file is stale if the store is missing, was built with another
+    embedding model or chunking, or no longer matches its manifest.
+    Files left half-written by an interrupted build are stale too, so the
+    build resumes where it stopped.
+
+    Args:
+        source_files:     All PDF paths that make up the corpus.
+        embed_model_name: Name of the embedding model that will be used.
+        chunking:         {"chunk_size": ..., "overlap": ...} of the splitter.
+        persist_dir:      Folder where the index is stored.
+        vector_backend:   "chroma" or "native" (see open_backend).
+        vector_format:    "float32", "float16" or "pq".
+
+    Returns:
+        Subset of source_files that are new or changed.
+    """
+    manifest = load_manifest(persist_dir)
+    if (
+        manifest is None
+        or manifest["embed_model"] != embed_model_name
+        or manifest.get("chunking") != chunking
+        or _store_of(manifest) != (vector_backend, vector_format)
+    ):
+        return list(source_files)
+
+    interrupted = read_journal(persist_dir)
+    if not interrupted:
+        # With a journal the counts legitimately differ until it is rolled back
+        if manifest_node_count(manifest) != stored_count(vector_backend, persist_dir):
+            return list(source_files)
+
+    stale = []
+    for path in source_files:
+        key = file_key(path)
+        entry = manifest["files"].get(key)
+        if (
+            entry is None
+            or key in interrupted
+            or key in manifest.get("partial", {})
+            or file_changed(entry, path)
+        ):
+            stale.append(path)
+    return stale
+
+
+def _store_of(manifest: dict) -> tuple[str, str]:
+    """(backend, vector format) a manifest was built with (older ones: Chroma)."""
+    return manifest.get("vector_backend", "chroma"), manifest.get("vector_format", "float32")
+
+
+def build_status(persist_dir: str = CHROMA_DIR) -> dict:
+    """
+    Report whether the persisted index is fully built.
+
+    A store whose last build was interrupted (Ctrl-C, OOM, Streamlit rerun)
+    has complete=False until a new build finishes — serve it only after
+    re-running ingestion, which resumes from the last committed batch.
+
+    Returns:
+        {"exists": bool, "complete": bool, "files": int,
+         "interrupted_files": int, "vectors": int}
+    """
+    manifest = load_manifest(persist_dir)
+    if manifest is None:
+        return {"exists": False, "complete": False, "files": 0,
+                "interrupted_files": 0, "vectors": 0}
+    interrupted = set(read_journal(persist_dir)) | set(manifest.get("partial", {}))
+    return {
+        "exists": True,
+        "complete": bool(manifest.get("complete")) and not interrupted,
+        "files": len(manifest["files"]),
+        "interrupted_files": len(interrupted),
+        "vectors": manifest_node_count(manifest),
+    }
+
+
+def index_version(persist_dir: str = CHROMA_DIR) -> str | None:
+    """Content fingerprint of the last completed build (None if there is none)."""
+    manifest = load_manifest(persist_dir)
+    if manifest is None or not manifest.get("complete"):
+        return None
+    return manifest.get("index_version")
+
+
+class IndexWriter:
+    """
+    Applies page-level changes to the vector store (any VectorBackend —
+    see open_backend) and keeps the manifest in step.
+
+    Each file is diffed against the manifest: new or changed pages are
+    embedded and upserted in batches of batch_size, unchanged pages are
+    skipped, and vectors of removed pages are deleted. Only one file's
+    nodes are held at a time, so memory stays flat however large the
+    corpus is.
+
+    Checkpointing: node ids are derived from (file, page, position, page
+    hash), so re-parsing a page yields the same ids. Before touching the
+    store for a file, the ids about to be deleted/added are appended to
+    the journal, and every upserted batch is journaled as committed (for
+    Chroma; the native store commits its rows at each checkpoint instead).
+    Every checkpoint_every new nodes the manifest is saved and the journal
+    cleared. When a writer opens a store with a leftover journal it
+    deletes only the uncommitted ids and records the committed ones as
+    "partial"; re-indexing that file then skips them, so the build resumes
+    from the last committed batch. The manifest's "complete" flag stays
+    false until finish(), so an interrupted build is never mistaken for a
+    finished one (see build_status).
+
+    Usage:
+        writer = IndexWriter(embed_model, "chroma_db", chunking)
+        writer.remove_missing(current_file_keys)
+        for key, pages in ...:
+            writer.write_file(key, pages)
+        index = writer.finish()
+    """
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        persist_dir: str = CHROMA_DIR,
+        chunking: dict | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+        vector_backend: str = "chroma",
+        vector_format: str = "float32",
+    ):
+        self.embed_model = embed_model
+        self.persist_dir = persist_dir
+        self.chunking = chunking
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.vector_backend = vector_backend
+        self.vector_format = vector_format
+        self.added = 0
+        self.unchanged = 0
+        self.resumed = 0
+        self.deleted = 0
+        self._since_checkpoint = 0
+
+        model_name = embed_model.model_name
+        self.backend = open_backend(vector_backend, persist_dir, vector_format)
+        self.persistent = self.backend.persistent
+        self._tag = f"[{self.backend.label}]"
+
+        # In-memory stores get their keyword index from get_retriever() instead
+        self.bm25 = BM25Index(os.path.join(persist_dir, BM25_NAME)) if self.persistent else None
+        manifest = load_manifest(persist_dir) if self.persistent else None
+        if manifest is not None:
+            self._roll_back(manifest)
+
+        # ── Check the store still matches its manifest ───────────────
+        self.reset = (
+            manifest is None
+            or manifest["embed_model"] != model_name
+            or _store_of(manifest) != (vector_backend, vector_format)
+            or manifest_node_count(manifest) != self.backend.count()
+        )
+        if self.reset:
+            if self.backend.count() > 0:
+                print(f"{self._tag} Existing store does not match its manifest, rebuilding...")
+            self.backend.clear()
+            self.backend.commit()
+            manifest = new_manifest(model_name)
+            manifest["vector_backend"] = vector_backend
+            manifest["vector_format"] = vector_format
+            if self.persistent:
+                save_manifest(persist_dir, manifest)
+                clear_journal(persist_dir)
+                self.bm25.clear()
+        else:
+            print(f"{self._tag} Found existing store in '{persist_dir}'  "
+                  f"({self.backend.count()} vectors)")
+            self.bm25.sync(self.backend)
+
+        manifest.setdefault("partial", {})
+        self.manifest = manifest
+        self.vector_store = self.backend.vector_store
+
+    def _roll_back(self, manifest: dict) -> None:
+        """Recover from an interrupted writer, keeping its committed batches."""
+        interrupted = read_journal(self.persist_dir)
+        if not interrupted:
+            return
+        manifest.setdefault("partial", {})
+        to_delete: set[str] = set()
+        kept = 0
+        for key, record in interrupted.items():
+            uncommitted = record["intent"] - record["committed"]
+            ids = set(manifest["partial"].get(key, [])) | record["committed"]
+            entry = manifest["files"].pop(key, None)
+            if entry is not None:
+                ids.update(i for page in entry["pages"].values() for i in page["node_ids"])
+            to_delete |= uncommitted
+            manifest["partial"][key] = sorted(ids - uncommitted)
+            kept += len(manifest["partial"][key])
+        print(f"{self._tag} Resuming interrupted build: {len(interrupted)} file(s) affected, "
+              f"{kept} committed chunks kept, {len(to_delete)} uncommitted discarded")
+        self._delete(list(to_delete))
+        self.backend.commit()
+        manifest["complete"] = False
+        save_manifest(self.persist_dir, manifest)
+        clear_journal(self.persist_dir)
+
+    # ── Writing ──────────────────────────────────────────────────────
+
+    def remove_missing(self, current_keys: set[str]) -> int:
+        """Delete vectors of every file not in current_keys. Returns the count."""
+        partial = self.manifest["partial"]
+        removed = [key for key in {*self.manifest["files"], *partial} if key not in current_keys]
+        for key in removed:
+            entry = self.manifest["files"].pop(key, {"pages": {}})
+            ids = [i for page in entry["pages"].values() for i in page["node_ids"]]
+            ids.extend(partial.pop(key, []))
+            self._journal(key, ids)
+            self._delete(ids)
+        if removed:
+            print(f"{self._tag} Removed {len(removed)} file(s) no longer in the corpus")
+        return len(removed)
+
+    def write_file(self, key: str, pages: dict[str, list[BaseNode]]) -> tuple[int, int]:
+        """
+        Bring one file's vectors up to date.
+
+        Args:
+            key:   file_key() of the source file.
+            pages: { page_label: [node, ...] } — all current chunks of the file.
+
+        Returns:
+            (chunks embedded, chunks skipped as unchanged)
+        """
+        old_entry = self.manifest["files"].get(key)
+        old_pages = old_entry["pages"] if old_entry else {}
+        # Chunks committed by an interrupted build of this file
+        resumable = set(self.manifest["partial"].get(key, []))
+
+        delete_ids: list[str] = []
+        new_nodes: list[BaseNode] = []
+        page_entries: dict[str, dict] = {}
+
+        for label, page in old_pages.items():
+            if label not in pages:
+                delete_ids.extend(page["node_ids"])
+
+        for label, page_nodes in pages.items():
+            page_hash = hash_page(page_nodes)
+            old = old_pages.get(label)
+            if old is not None and old["hash"] == page_hash:
+                page_entries[label] = old
+                continue
+            if old is not None:
+                delete_ids.extend(old["node_ids"])
+            assign_stable_ids(key, label, page_nodes, page_hash)
+            new_nodes.extend(page_nodes)
+            page_entries[label] = {
+                "hash": page_hash,
+                "node_ids": [node.node_id for node in page_nodes],
+            }
+
+        to_embed = [node for node in new_nodes if node.node_id not in resumable]
+        resumed = len(new_nodes) - len(to_embed)
+        # Partial chunks the current pages no longer contain (file changed mid-build)
+        delete_ids.extend(resumable - {node.node_id for node in new_nodes})
+
+        if delete_ids or to_embed:
+            self._journal(key, delete_ids + [node.node_id for node in to_embed])
+            self._delete(delete_ids)
+            self._embed_and_add(key, to_embed)
+        self.manifest["partial"].pop(key, None)
+
+        if old_entry is not None and not file_changed(old_entry, key):
+            # Same content — refresh size/mtime so the hash isn't recomputed next time
+            stat = os.stat(key)
+            entry = {"size": stat.st_size, "mtime": stat.st_mtime,
+                     "sha256": old_entry["sha256"]}
+        elif os.path.exists(key):
+            entry = file_fingerprint(key)
+        else:
+            entry = {}
+        entry["pages"] = page_entries
+        self.manifest["files"][key] = entry
+
+        skipped = sum(len(nodes) for nodes in pages.values()) - len(to_embed)
+        self.added += len(to_embed)
+        self.unchanged += skipped
+        self.resumed += resumed
+        self._since_checkpoint += len(to_embed)
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+        return len(to_embed), skipped
+
+    def checkpoint(self, complete: bool = False) -> None:
+        """Persist the manifest and clear the journal."""
+        self.manifest["chunking"] = self.chunking
+        self.manifest["complete"] = complete
+        self.manifest["vector_backend"] = self.vector_backend
+        self.manifest["vector_format"] = self.vector_format
+        if complete:
+            self.manifest["index_version"] = manifest_version(self.manifest)
+        self.backend.commit(complete)   # rows must be on disk before the manifest lists them
+        if self.persistent:
+            save_manifest(self.persist_dir, self.manifest)
+            clear_journal(self.persist_dir)
+        self._since_checkpoint = 0
+
+    def finish(self) -> VectorStoreIndex:
+        """Mark the build complete and return a VectorStoreIndex over the store."""
+        self.checkpoint(complete=True)
+        print(f"{self._tag} {self.added} chunks embedded, {self.unchanged} unchanged "
+              f"({self.resumed} resumed from an interrupted build), "
+              f"{self.deleted} stale vectors deleted")
+        if isinstance(self.embed_model, CachedEmbedding):
+            stats = self.embed_model.stats()
+            print(f"[Embed] cache hits: {stats['hits']}, misses: {stats['misses']}  "
+                  f"(hit rate {stats['hit_rate']:.0%})")
+
+        index = VectorStoreIndex.from_vector_store(
+            vector_store=self.vector_store,
+            embed_model=self.embed_model,
+        )
+        print(f"✓ {self.backend.label} store ready in '{self.persist_dir}'  "
+              f"({self.backend.count()} vectors)")
+        if isinstance(self.backend, NativeVectorStore):
+            size = self.backend.footprint()
+            print(f"[Native] {size['format']}: {size['resident_bytes'] / 2**20:.1f} MiB searched in RAM, "
+                  f"{size['disk_bytes'] / 2**20:.1f} MiB on disk  "
+                  f"(float32 vectors alone: {size['float32_bytes'] / 2**20:.1f} MiB)")
+        return index
+
+    # ── Helpers ──────────────────────────────────────────────────────
+
+    def _journal(self, key: str, node_ids: list[str]) -> None:
+        if self.persistent and node_ids:
+            if self.manifest.get("complete"):
+                # First change since the last finished build: flag it in progress
+                self.manifest["complete"] = False
+                save_manifest(self.persist_dir, self.manifest)
+            append_journal(self.persist_dir, key, node_ids=node_ids)
+
+    def _delete(self, ids: list[str]) -> None:
+        self.backend.delete_ids(ids)
+        if self.bm25 is not None:
+            self.bm25.delete(ids)
+        self.deleted += len(ids)
+
+    def _embed_and_add(self, key: str, nodes: list[BaseNode]) -> None:
+        """Embed and upsert nodes in batches of batch_size, journaling each commit."""
+        for start in range(0, len(nodes), self.batch_size):
+            batch = nodes[start:start + self.batch_size]
+            texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+            with tracing.span("embed", chunks=len(texts),
+                              tokens=sum(estimate_tokens(t) for t in texts)):
+                embeddings = self.embed_model.get_text_embedding_batch(texts)
+            for node, embedding in zip(batch, embeddings):
+                node.embedding = embedding
+            with tracing.span("upsert", nodes=len(batch), store=self.backend.label):
+                self.vector_store.add(batch)
+                if self.bm25 is not None:
+                    self.bm25.add(
+                        [node.node_id for node in batch],
+                        [node.get_content(metadata_mode=MetadataMode.NONE) for node in batch],
+                    )
+                if self.persistent and self.backend.durable:
+                    append_journal(self.persist_dir, key,
+                                   committed=[node.node_id for node in batch])
 
 
 def build_vector_store(
     nodes: list[BaseNode],
     embed_model: BaseEmbedding,
     persist_dir: str = CHROMA_DIR,
+    source_files: list[str] | None = None,
+    chunking: dict | None = None,
+    vector_backend: str = "chroma",
+    vector_format: str = "float32",
 ) -> VectorStoreIndex:
     """
-    Build or load a LlamaIndex VectorStoreIndex backed by ChromaDB.
+    Build, update or load a LlamaIndex VectorStoreIndex backed by ChromaDB
+    (or the native store, see open_backend).
 
     Strategy:
-    - If chroma_db exists AND has vectors → load from disk (fast, no re-embedding)
-    - Otherwise → build fresh in memory (avoids Windows WinError 32 file locks)
+    - Each page's chunks are hashed and compared with the manifest.
+    - New or changed pages → embedded and upserted
+    - Unchanged pages      → skipped (no re-embedding)
+    - Removed files/pages  → their vectors are deleted
+    - Store built with another embedding model, or out of sync with the
+      manifest → rebuilt from scratch
+    - Persistent store unavailable → build fresh in memory
+      (avoids Windows WinError 32 file locks)
+
+    For corpora too large to hold as one node list, see ingest.ingest_pdfs,
+    which feeds the same IndexWriter file by file.
 
     Args:
-        nodes:       List of chunked BaseNode objects.
-        embed_model: LlamaIndex embedding model.
-        persist_dir: Folder where Chroma stores its data.
+        nodes:        List of chunked BaseNode objects.
+        embed_model:  LlamaIndex embedding model.
+        persist_dir:  Folder where Chroma stores its data.
+        source_files: Every PDF in the corpus. When given, files without
+                      nodes in `nodes` are treated as unchanged (see
+                      stale_sources) instead of removed.
+        chunking:     Splitter settings, recorded in the manifest.
+        vector_backend: "chroma" or "native".
+        vector_format: "float32", "float16" or "pq" (float16 / pq: native only).
 
     Returns:
-        LlamaIndex VectorStoreIndex wrapping the Chroma collection.
+        LlamaIndex VectorStoreIndex wrapping the vector store.
     """
-    # ── Try loading existing store first ──────────────────────────────
-    if os.path.exists(persist_dir) and os.listdir(persist_dir):
-        try:
-            chroma_client = chromadb.PersistentClient(
-                path=persist_dir,
-                settings=Settings(anonymized_telemetry=False),
-            )
-            collection = chroma_client.get_or_create_collection(COLLECTION_NAME)
-            if collection.count() > 0:
-                print(f"[Chroma] Loading existing store from '{persist_dir}'  "
-                      f"({collection.count()} vectors)...")
-                vector_store = ChromaVectorStore(chroma_collection=collection)
-                index = VectorStoreIndex.from_vector_store(
-                    vector_store=vector_store,
-                    embed_model=embed_model,
-                )
-                print("✓ Chroma store loaded from disk")
-                return index
-        except Exception as e:
-            print(f"[Chroma] Could not load existing store ({e}), rebuilding...")
-
-    # ── Build fresh store ─────────────────────────────────────────────
-    # Use EphemeralClient (in-memory) to avoid Windows file-lock issues
-    # when re-initialising. Falls back to persistent if possible.
-    print(f"[Chroma] Building new store...")
-    try:
-        chroma_client = chromadb.PersistentClient(
-            path=persist_dir,
-            settings=Settings(anonymized_telemetry=False),
-        )
-    except Exception:
-        # Fallback: pure in-memory (no persistence, but no lock errors)
-        print("[Chroma] Persistent client unavailable, using in-memory store...")
-        chroma_client = chromadb.EphemeralClient()
-
-    # Delete old collection if it exists (fresh start)
-    try:
-        chroma_client.delete_collection(COLLECTION_NAME)
-    except Exception:
-        pass
+    writer = IndexWriter(
+        embed_model,
+        persist_dir,
+        chunking,
+        vector_backend=vector_backend,
+        vector_format=vector_format,
+    )
+    groups = group_nodes_by_page(nodes)
 
-    collection = chroma_client.create_collection(COLLECTION_NAME)
-    vector_store = ChromaVectorStore(chroma_collection=collection)
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    if source_files is None:
+        current = set(groups)
+    else:
+        current = {file_key(p) for p in source_files}
+        if writer.reset and current - set(groups):
+            print(f"{writer._tag} Warning: {len(current - set(groups))} file(s) were not parsed "
+                  f"and will be missing until the next full rebuild")
 
-    index = VectorStoreIndex(
-        nodes=nodes,
-        storage_context=storage_context,
-        embed_model=embed_model,
-        show_progress=True,
-    )
-    print(f"✓ Chroma store built and saved to '{persist_dir}'")
-    return index
+    writer.remove_missing(current)
+    for key, pages in groups.items():
+        writer.write_file(key, pages)
+    return writer.finish()
+
+
+class TracedRetriever(BaseRetriever):
+    """
+    Runs another retriever inside a "retrieve" tracing span.
+
+    The inner retriever is called through its public retrieve(), so its
+    callback events fire as usual; the wrapper has no handlers of its own,
+    so they are not reported twice.
+    """
+
+    def __init__(self, retriever: BaseRetriever, mode: str = "vector"):
+        super().__init__(callback_manager=CallbackManager([]))
+        self.inner = retriever
+        self.mode = mode
 
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        with tracing.span("retrieve", mode=self.mode) as span:
+            nodes = self.inner.retrieve(query_bundle)
+            span["nodes"] = len(nodes)
+        return nodes
 
-def get_retriever(index: VectorStoreIndex, top_k: int = 5) -> VectorIndexRetriever:
+    async def _aretrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        with tracing.span("retrieve", mode=self.mode) as span:
+            nodes = await self.inner.aretrieve(query_bundle)
+            span["nodes"] = len(nodes)
+        return nodes
+
+
+def open_bm25(index: VectorStoreIndex, persist_dir: str = CHROMA_DIR) -> BM25Index:
+    """Open the BM25 index in persist_dir, synced with the index's vector store."""
+    os.makedirs(persist_dir, exist_ok=True)
+    bm25 = BM25Index(os.path.join(persist_dir, BM25_NAME))
+    bm25.sync(backend_of(index))
+    return bm25
+
+
+def get_retriever(
+    index: VectorStoreIndex,
+    top_k: int = 5,
+    mode: str = "vector",
+    persist_dir: str = CHROMA_DIR,
+    bm25: BM25Index | None = None,
+) -> BaseRetriever:
     """
     Create a retriever from the VectorStoreIndex.
 
     Args:
-        index: LlamaIndex VectorStoreIndex.
-        top_k: Number of nodes to retrieve per query.
+        index:       LlamaIndex VectorStoreIndex.
+        top_k:       Number of nodes to retrieve per query.
+        mode:        "vector" (dense only) or "hybrid" (dense + BM25, fused
+                     with reciprocal-rank fusion — finds exact identifiers).
+        persist_dir: Folder holding the BM25 index (hybrid mode).
+        bm25:        Already-open BM25 index to share (see open_bm25);
+                     opened from persist_dir when omitted.
 
     Returns:
-        LlamaIndex VectorIndexRetriever.
+        VectorIndexRetriever, or HybridRetriever in hybrid mode, wrapped in
+        a TracedRetriever.
     """
-    retriever = VectorIndexRetriever(
-        index=index,
-        similarity_top_k=top_k,
-    )
-    print(f"✓ Retriever ready  (top_k={top_k})")
-    return retriever
\ No newline at end of file
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}'. Use one of {RETRIEVAL_MODES}.")
+
+    if mode == "hybrid":
+        bm25 = bm25 or open_bm25(index, persist_dir)
+        retriever = HybridRetriever(index, bm25, backend_of(index), top_k=top_k)
+    else:
+        retriever = VectorIndexRetriever(
+            index=index,
+            similarity_top_k=top_k,
+        )
+    print(f"✓ Retriever ready  (mode={mode}, top_k={top_k})")
+    return TracedRetriever(retriever, mode)